@@ -4,7 +4,7 @@ from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
 from django.contrib.auth.admin import GroupAdmin as BaseGroupAdmin
 from django.utils.translation import gettext_lazy as _
 
-from .models import User
+from .models import OutboxEmail, User
 
 
 class Group(DjangoGroup):
@@ -88,6 +88,13 @@ class UserAdmin(BaseUserAdmin):
     search_fields = ["first_name", "first_name", "email", "name"]
 
 
+class OutboxEmailAdmin(admin.ModelAdmin):
+    list_display = ("subject", "to", "status", "attempts", "created_at", "sent_at")
+    list_filter = ("status", "created_at")
+    search_fields = ["to"]
+
+
 admin.site.register(User, UserAdmin)
+admin.site.register(OutboxEmail, OutboxEmailAdmin)
 admin.site.register(Group, GroupAdmin)
 admin.site.unregister(DjangoGroup)
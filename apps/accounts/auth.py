@@ -1,11 +1,105 @@
 from django.conf import settings
+from django.core.cache import cache
 from apps.accounts.models import Jwt
+from apps.common.metrics import CACHE_LOOKUPS
+from collections import OrderedDict, defaultdict
 from datetime import datetime, timedelta
-import jwt, random, string
+import copy, jwt, random, string, threading, time
 
 ALGORITHM = "HS256"
 
 
+class TokenCache:
+    """
+    Bounded LRU cache of validated access tokens -> user, with a ttl.
+    Entries live in this process, so each records the user's revocation version,
+    kept in the default cache. Logout, login and refresh bump that version, so the
+    tokens they revoke stop being served by every worker sharing the cache backend.
+    With a per-process backend (LocMemCache) the ttl bounds how long other workers
+    keep accepting them.
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: int = 60):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._user_tokens = defaultdict(set)
+        self._lock = threading.Lock()
+
+    def revocation_key(self, user_id):
+        return f"token:revoked:{user_id}"
+
+    async def get_revocation(self, user_id):
+        return await cache.aget(self.revocation_key(user_id), 0)
+
+    def get(self, token: str, revocation: int):
+        with self._lock:
+            entry = self._entries.get(token)
+            if not entry or entry[0] < time.monotonic() or entry[2] != revocation:
+                if entry:
+                    self._remove(token)
+                self.misses += 1
+                CACHE_LOOKUPS.labels("token", "miss").inc()
+                return None
+            self._entries.move_to_end(token)
+            self.hits += 1
+            CACHE_LOOKUPS.labels("token", "hit").inc()
+        # Hand out a copy so a request mutating its user can't leak into others
+        return copy.copy(entry[1])
+
+    def set(self, token: str, user, exp: int, revocation: int):
+        # Never outlive the token itself
+        ttl = min(self.ttl, exp - time.time())
+        if ttl <= 0:
+            return
+        with self._lock:
+            if token in self._entries:
+                self._remove(token)
+            self._entries[token] = (time.monotonic() + ttl, user, revocation)
+            self._user_tokens[user.id].add(token)
+            while len(self._entries) > self.maxsize:
+                self._remove(next(iter(self._entries)))
+
+    async def invalidate_user(self, user_id):
+        with self._lock:
+            for token in list(self._user_tokens.get(user_id, ())):
+                self._remove(token)
+        key = self.revocation_key(user_id)
+        try:
+            await cache.aincr(key)
+        except ValueError:
+            # Kept until every access token issued before the bump has expired
+            await cache.aset(
+                key, 1, int(settings.ACCESS_TOKEN_EXPIRE_MINUTES) * 60 + self.ttl
+            )
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._user_tokens.clear()
+            self.hits = self.misses = 0
+
+    def stats(self):
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "size": len(self._entries),
+            "maxsize": self.maxsize,
+        }
+
+    def _remove(self, token: str):
+        _, user, _ = self._entries.pop(token)
+        tokens = self._user_tokens[user.id]
+        tokens.discard(token)
+        if not tokens:
+            del self._user_tokens[user.id]
+
+
+token_cache = TokenCache()
+
+
 class Authentication:
     # generate random string
     def get_random(length: int):
@@ -43,9 +137,15 @@ class Authentication:
         decoded = Authentication.decode_jwt(token)
         if not decoded:
             return None
+        # Read before the lookup, so a revocation racing with it isn't cached over
+        revocation = await token_cache.get_revocation(decoded["user_id"])
+        user = token_cache.get(token, revocation)
+        if user:
+            return user
         jwt_obj = await Jwt.objects.select_related("user", "user__avatar").get_or_none(
             user_id=decoded["user_id"]
         )
         if not jwt_obj:
             return None
+        token_cache.set(token, jwt_obj.user, decoded["exp"], revocation)
         return jwt_obj.user
@@ -1,29 +1,22 @@
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+from django.db.models import Q
 from django.template.loader import render_to_string
-from django.core.mail import EmailMessage
+from django.utils import timezone
 from . import models as accounts_models
-import random, threading
+from datetime import timedelta
+import random, time
 
-
-class EmailThread(threading.Thread):
-    def __init__(self, email):
-        self.email = email
-        threading.Thread.__init__(self)
-
-    def run(self):
-        self.email.send()
+MAX_ATTEMPTS = 5
+BACKOFF_SECONDS = 30
+# Emails claimed by a worker that died while sending are picked up again after this
+CLAIM_SECONDS = 300
 
 
 class Util:
     async def send_activation_otp(user):
         subject = "Verify your email"
         code = random.randint(100000, 999999)
-        message = render_to_string(
-            "email-activation.html",
-            {
-                "name": user.full_name,
-                "otp": code,
-            },
-        )
         otp = await accounts_models.Otp.objects.get_or_none(user=user)
         if not otp:
             await accounts_models.Otp.objects.acreate(user=user, code=code)
@@ -31,20 +24,16 @@ class Util:
             otp.code = code
             await otp.asave()
 
-        email_message = EmailMessage(subject=subject, body=message, to=[user.email])
-        email_message.content_subtype = "html"
-        EmailThread(email_message).start()
+        await Outbox.queue(
+            subject=subject,
+            to=user.email,
+            template="email-activation.html",
+            context={"name": user.full_name, "otp": code},
+        )
 
     async def send_password_change_otp(user):
         subject = "Your account password reset email"
         code = random.randint(100000, 999999)
-        message = render_to_string(
-            "password-reset.html",
-            {
-                "name": user.full_name,
-                "otp": code,
-            },
-        )
         otp = await accounts_models.Otp.objects.get_or_none(user=user)
         if not otp:
             await accounts_models.Otp.objects.acreate(user=user, code=code)
@@ -52,32 +41,118 @@ class Util:
             otp.code = code
             await otp.asave()
 
-        email_message = EmailMessage(subject=subject, body=message, to=[user.email])
-        email_message.content_subtype = "html"
-
-        EmailThread(email_message).start()
+        await Outbox.queue(
+            subject=subject,
+            to=user.email,
+            template="password-reset.html",
+            context={"name": user.full_name, "otp": code},
+        )
 
-    def password_reset_confirmation(user):
+    async def password_reset_confirmation(user):
         subject = "Password Reset Successful!"
-        message = render_to_string(
-            "password-reset-success.html",
-            {
-                "name": user.full_name,
-            },
+        await Outbox.queue(
+            subject=subject,
+            to=user.email,
+            template="password-reset-success.html",
+            context={"name": user.full_name},
         )
-        email_message = EmailMessage(subject=subject, body=message, to=[user.email])
-        email_message.content_subtype = "html"
-        EmailThread(email_message).start()
 
-    @staticmethod
-    def welcome_email(user):
+    async def welcome_email(user):
         subject = "Account verified!"
-        message = render_to_string(
-            "welcome.html",
-            {
-                "name": user.full_name,
-            },
+        await Outbox.queue(
+            subject=subject,
+            to=user.email,
+            template="welcome.html",
+            context={"name": user.full_name},
+        )
+
+
+class Outbox:
+    """
+    Emails are stored first and delivered later by the send_emails worker,
+    so requests never wait on SMTP and nothing is lost on restart.
+    """
+
+    async def queue(subject: str, to: str, template: str, context: dict):
+        return await accounts_models.OutboxEmail.objects.acreate(
+            subject=subject, to=to, template=template, context=context
         )
-        email_message = EmailMessage(subject=subject, body=message, to=[user.email])
-        email_message.content_subtype = "html"
-        EmailThread(email_message).start()
+
+    def queue_depth():
+        return accounts_models.OutboxEmail.objects.filter(
+            status__in=[
+                accounts_models.OutboxEmail.PENDING,
+                accounts_models.OutboxEmail.SENDING,
+            ]
+        ).count()
+
+    def drain(batch_size: int = 100):
+        """
+        Sends one batch of due emails over a single SMTP connection.
+        Failed emails are retried with exponential backoff until MAX_ATTEMPTS.
+        """
+        OutboxEmail = accounts_models.OutboxEmail
+        now = timezone.now()
+        stats = {"sent": 0, "failed": 0, "latencies": [], "duration": 0}
+        started = time.monotonic()
+        # Rows are claimed in a short transaction so several workers never pick
+        # the same email, and no row stays locked while waiting on SMTP
+        with transaction.atomic():
+            emails = list(
+                OutboxEmail.objects.select_for_update(skip_locked=True)
+                .filter(
+                    Q(status=OutboxEmail.PENDING) | Q(status=OutboxEmail.SENDING),
+                    next_attempt_at__lte=now,
+                )
+                .order_by("next_attempt_at")[:batch_size]
+            )
+            if not emails:
+                return stats
+            # Claimed until CLAIM_SECONDS, then retried if this worker never returns
+            OutboxEmail.objects.filter(id__in=[email.id for email in emails]).update(
+                status=OutboxEmail.SENDING,
+                next_attempt_at=now + timedelta(seconds=CLAIM_SECONDS),
+            )
+
+        with get_connection() as connection:
+            for email in emails:
+                Outbox._send(email, connection, stats)
+
+        OutboxEmail.objects.bulk_update(
+            emails,
+            ["status", "attempts", "next_attempt_at", "sent_at", "last_error"],
+        )
+        stats["duration"] = time.monotonic() - started
+        return stats
+
+    def _send(email, connection, stats):
+        email.attempts += 1
+        try:
+            # Rendered inside the try, so a broken template fails this email alone
+            # rather than the batch
+            message = EmailMessage(
+                subject=email.subject,
+                body=render_to_string(email.template, email.context),
+                to=[email.to],
+                connection=connection,
+            )
+            message.content_subtype = "html"
+            message.send()
+        except Exception as e:
+            email.last_error = str(e)
+            email.status = (
+                accounts_models.OutboxEmail.FAILED
+                if email.attempts >= MAX_ATTEMPTS
+                else accounts_models.OutboxEmail.PENDING
+            )
+            email.next_attempt_at = timezone.now() + timedelta(
+                seconds=BACKOFF_SECONDS * 2 ** (email.attempts - 1)
+            )
+            stats["failed"] += 1
+        else:
+            email.status = accounts_models.OutboxEmail.SENT
+            email.sent_at = timezone.now()
+            stats["sent"] += 1
+            stats["latencies"].append(
+                (email.sent_at - email.created_at).total_seconds()
+            )
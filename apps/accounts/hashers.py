@@ -0,0 +1,63 @@
+from django.contrib.auth.hashers import check_password, make_password
+from apps.common.exceptions import RequestError
+from apps.common.metrics import PASSWORD_HASHES_PENDING
+from concurrent.futures import ThreadPoolExecutor
+import asyncio, os
+
+
+class PasswordHasherPool:
+    """
+    Runs password hashing in a small dedicated thread pool so PBKDF2 never blocks
+    the event loop. Once max_pending hashes are queued or running, new ones are
+    rejected with a 429 instead of piling up. max_workers=0 hashes inline.
+    """
+
+    def __init__(self, max_workers: int, max_pending: int):
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.pending = 0
+        self.rejected = 0
+        self.executor = (
+            ThreadPoolExecutor(max_workers, thread_name_prefix="password-hasher")
+            if max_workers
+            else None
+        )
+
+    async def run(self, func, *args):
+        if not self.executor:
+            return func(*args)
+        if self.pending >= self.max_pending:
+            self.rejected += 1
+            raise RequestError(
+                err_msg="Server is busy, try again later", status_code=429
+            )
+        self.pending += 1
+        PASSWORD_HASHES_PENDING.inc()
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self.executor, func, *args)
+        finally:
+            self.pending -= 1
+            PASSWORD_HASHES_PENDING.dec()
+
+    async def check_password(self, user, raw_password: str):
+        # No setter: outdated hashes get upgraded on the next password change
+        # rather than saving from the hasher threads
+        return await self.run(check_password, raw_password, user.password)
+
+    async def set_password(self, user, raw_password: str):
+        user.password = await self.run(make_password, raw_password)
+        user._password = raw_password
+
+    def stats(self):
+        return {
+            "workers": self.max_workers,
+            "pending": self.pending,
+            "max_pending": self.max_pending,
+            "rejected": self.rejected,
+        }
+
+
+hasher_pool = PasswordHasherPool(
+    max_workers=min(4, os.cpu_count() or 1), max_pending=64
+)
@@ -0,0 +1,79 @@
+from django.core.management.base import BaseCommand
+from django.contrib.auth.hashers import make_password
+from apps.accounts.hashers import PasswordHasherPool
+from apps.accounts.models import User
+from apps.common.exceptions import RequestError
+import asyncio, logging, time
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+PROBE_INTERVAL = 0.005
+
+
+async def probe(latencies, stop):
+    # Stands in for an unrelated request: measures how late the event loop wakes it
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(PROBE_INTERVAL)
+        latencies.append(time.perf_counter() - started - PROBE_INTERVAL)
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))] if values else 0
+
+
+async def login_storm(pool, user, logins):
+    async def login():
+        try:
+            await pool.check_password(user, "password")
+        except RequestError:
+            pass
+
+    await asyncio.gather(*[login() for _ in range(logins)])
+
+
+async def run(pool, user, logins):
+    latencies, stop = [], asyncio.Event()
+    probe_task = asyncio.create_task(probe(latencies, stop))
+    started = time.perf_counter()
+    await login_storm(pool, user, logins)
+    elapsed = time.perf_counter() - started
+    stop.set()
+    await probe_task
+    return {
+        "elapsed": elapsed,
+        "probes": len(latencies),
+        "p50": percentile(latencies, 0.5),
+        "p99": percentile(latencies, 0.99),
+        "rejected": pool.rejected,
+    }
+
+
+class Command(BaseCommand):
+    help = "Measures event loop latency during a login storm, inline vs pooled hashing"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--logins", type=int, default=20)
+        parser.add_argument("--workers", type=int, default=4)
+        parser.add_argument("--max-pending", type=int, default=64)
+
+    def handle(self, **options) -> None:
+        user = User(password=make_password("password"))
+        for name, pool in (
+            ("inline", PasswordHasherPool(max_workers=0, max_pending=0)),
+            (
+                "pooled",
+                PasswordHasherPool(
+                    max_workers=options["workers"], max_pending=options["max_pending"]
+                ),
+            ),
+        ):
+            result = asyncio.run(run(pool, user, options["logins"]))
+            logger.info(
+                f"{name}: {options['logins']} logins in {result['elapsed']:.2f}s | "
+                f"unrelated latency p50: {result['p50'] * 1000:.1f}ms "
+                f"p99: {result['p99'] * 1000:.1f}ms ({result['probes']} probes) | "
+                f"rejected: {result['rejected']}"
+            )
@@ -0,0 +1,44 @@
+from django.core.management.base import BaseCommand
+from apps.accounts.emails import Outbox
+import logging, time
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = "Delivers queued emails from the outbox in batches"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=100)
+        parser.add_argument(
+            "--interval", type=float, default=5, help="Seconds to wait when idle"
+        )
+        parser.add_argument(
+            "--once", action="store_true", help="Drain the queue once and exit"
+        )
+
+    def handle(self, **options) -> None:
+        logger.info("Email worker started")
+        while True:
+            try:
+                stats = Outbox.drain(batch_size=options["batch_size"])
+            except Exception as e:
+                # SMTP or database unavailable, pending emails stay queued
+                logger.error(f"Email batch failed: {e}")
+                stats = {"sent": 0, "failed": 0}
+
+            if stats["sent"] or stats["failed"]:
+                latencies = stats["latencies"]
+                logger.info(
+                    f"Sent {stats['sent']}, failed {stats['failed']} in {stats['duration']:.2f}s | "
+                    f"queue depth: {Outbox.queue_depth()} | "
+                    f"max send latency: {max(latencies, default=0):.2f}s"
+                )
+                if stats["sent"] + stats["failed"] >= options["batch_size"]:
+                    # More emails may be due, keep draining
+                    continue
+
+            if options["once"]:
+                break
+            time.sleep(options["interval"])
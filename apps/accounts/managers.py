@@ -2,6 +2,7 @@ from django.contrib.auth.base_user import BaseUserManager
 from django.core.exceptions import ValidationError
 from django.core.validators import validate_email
 from django.utils.translation import gettext_lazy as _
+from .hashers import hasher_pool
 
 
 class CustomUserManager(BaseUserManager):
@@ -25,7 +26,7 @@ class CustomUserManager(BaseUserManager):
             first_name=first_name, last_name=last_name, email=email, **extra_fields
         )
 
-        user.set_password(password)
+        await hasher_pool.set_password(user, password)
         extra_fields.setdefault("is_staff", False)
         extra_fields.setdefault("is_superuser", False)
         await user.asave(using=self._db)
@@ -1,11 +1,21 @@
-from django.test import TestCase
-from django.test.client import AsyncClient
-
-from apps.accounts.auth import Authentication
-from apps.accounts.models import Otp
-
-from apps.common.utils import TestUtil
-from unittest import mock
+from django.core import mail
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.client import AsyncClient, Client
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from apps.accounts.auth import Authentication, TokenCache, token_cache
+from apps.accounts.emails import Outbox
+from apps.accounts.hashers import hasher_pool
+from apps.accounts.models import Otp, OutboxEmail
+
+from apps.common.models import GuestUser
+from apps.common.utils import GuestToken, TestUtil
+from apps.listings.models import Category, Listing, WatchList
+from unittest import mock, skipUnless
+from datetime import timedelta
 
 
 class TestAccounts(TestCase):
@@ -17,6 +27,7 @@ class TestAccounts(TestCase):
     login_url = "/api/v5/auth/login/"
     refresh_url = "/api/v5/auth/refresh/"
     logout_url = "/api/v5/auth/logout/"
+    profile_url = "/api/v5/auctioneer/"
 
     def setUp(self):
         self.client = AsyncClient()
@@ -335,3 +346,196 @@ class TestAccounts(TestCase):
             response.json(),
             {"status": "failure", "message": "Auth Token is Invalid or Expired!"},
         )
+
+    async def test_auth_token_cache(self):
+        token_cache.clear()
+        bearer = {"Authorization": f"Bearer {self.auth_token}"}
+
+        # Verify that repeated requests with a token are served from the cache
+        for _ in range(2):
+            response = await self.client.get(
+                self.profile_url, content_type=self.content_type, **bearer
+            )
+            self.assertEqual(response.status_code, 200)
+        self.assertEqual(token_cache.stats()["misses"], 1)
+        self.assertEqual(token_cache.stats()["hits"], 1)
+
+        # Verify that a revocation made by another worker is seen on the next hit
+        await TokenCache().invalidate_user(self.verified_user.id)
+        response = await self.client.get(
+            self.profile_url, content_type=self.content_type, **bearer
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(token_cache.stats()["misses"], 2)
+
+        # Verify that logging out evicts the token
+        response = await self.client.get(
+            self.logout_url, content_type=self.content_type, **bearer
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(token_cache.stats()["size"], 0)
+        response = await self.client.get(
+            self.profile_url, content_type=self.content_type, **bearer
+        )
+        self.assertEqual(response.status_code, 401)
+
+    def test_email_outbox(self):
+        # Verify that emails are queued instead of sent during the request
+        response = Client().post(
+            self.resend_verification_email_url,
+            {"email": self.new_user.email},
+            content_type=self.content_type,
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(mail.outbox), 0)
+        self.assertEqual(Outbox.queue_depth(), 1)
+
+        # Verify that a failed delivery is retried later with backoff
+        with mock.patch(
+            "django.core.mail.EmailMessage.send", side_effect=Exception("SMTP down")
+        ):
+            stats = Outbox.drain()
+        self.assertEqual(stats["failed"], 1)
+        email = OutboxEmail.objects.get()
+        self.assertEqual(email.attempts, 1)
+        self.assertEqual(email.status, OutboxEmail.PENDING)
+        self.assertGreater(email.next_attempt_at, timezone.now())
+
+        # Verify that the worker drains due emails
+        OutboxEmail.objects.update(next_attempt_at=timezone.now())
+        stats = Outbox.drain()
+        self.assertEqual(stats["sent"], 1)
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, [self.new_user.email])
+        self.assertEqual(OutboxEmail.objects.get().status, OutboxEmail.SENT)
+        self.assertEqual(Outbox.queue_depth(), 0)
+
+        # Verify that an email failing to render doesn't hold back later ones
+        broken = OutboxEmail.objects.create(
+            subject="Broken", to=self.new_user.email, template="missing.html"
+        )
+        OutboxEmail.objects.create(
+            subject="Welcome",
+            to=self.new_user.email,
+            template="welcome.html",
+            context={"name": self.new_user.full_name},
+        )
+        stats = Outbox.drain()
+        self.assertEqual((stats["sent"], stats["failed"]), (1, 1))
+        broken.refresh_from_db()
+        self.assertEqual(broken.status, OutboxEmail.PENDING)
+        self.assertIn("missing.html", broken.last_error)
+
+        # Verify that emails claimed by a worker that died are sent again later
+        OutboxEmail.objects.filter(id=broken.id).update(
+            status=OutboxEmail.SENDING,
+            template="welcome.html",
+            next_attempt_at=timezone.now(),
+        )
+        stats = Outbox.drain()
+        self.assertEqual(stats["sent"], 1)
+        self.assertEqual(Outbox.queue_depth(), 0)
+
+    async def test_login_rejected_when_hasher_pool_saturated(self):
+        # Verify that logins are turned away once the hasher queue is full
+        with mock.patch.object(hasher_pool, "pending", hasher_pool.max_pending):
+            response = await self.client.post(
+                self.login_url,
+                {"email": self.verified_user.email, "password": "testpassword"},
+                content_type=self.content_type,
+            )
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(
+            response.json(),
+            {"status": "failure", "message": "Server is busy, try again later"},
+        )
+
+        # Verify that logins go through again once it drains
+        response = await self.client.post(
+            self.login_url,
+            {"email": self.verified_user.email, "password": "testpassword"},
+            content_type=self.content_type,
+        )
+        self.assertEqual(response.status_code, 201)
+
+    def guest_watching(self, count: int, watched_by_user: int):
+        # A guest watching count listings, the first of them also watched by the user
+        category = Category.objects.create(name="TestCategory")
+        closing_date = timezone.now() + timedelta(days=1)
+        listings = Listing.objects.bulk_create(
+            [
+                Listing(
+                    auctioneer=self.new_user,
+                    name=f"Listing {i}",
+                    desc="Description",
+                    category=category,
+                    price=1000.00,
+                    closing_date=closing_date,
+                )
+                for i in range(count)
+            ]
+        )
+        guest = GuestUser.objects.create()
+        WatchList.objects.bulk_create(
+            [WatchList(guest=guest, listing=listing) for listing in listings]
+            + [
+                WatchList(user=self.verified_user, listing=listing)
+                for listing in listings[:watched_by_user]
+            ]
+        )
+        return guest
+
+    def login_as_guest(self, guest):
+        return Client().post(
+            self.login_url,
+            {"email": self.verified_user.email, "password": "testpassword"},
+            content_type=self.content_type,
+            HTTP_GUESTUSERID=GuestToken.create(guest.id),
+        )
+
+    def test_login_merges_large_guest_watchlists(self):
+        guest = self.guest_watching(1000, watched_by_user=10)
+
+        response = self.login_as_guest(guest)
+        self.assertEqual(response.status_code, 201)
+        # Verify that every listing is watched by the user once, and the guest is gone
+        self.assertEqual(
+            WatchList.objects.filter(user=self.verified_user)
+            .values("listing_id")
+            .distinct()
+            .count(),
+            1000,
+        )
+        self.assertEqual(WatchList.objects.count(), 1000)
+        self.assertFalse(GuestUser.objects.filter(id=guest.id).exists())
+
+        # Verify that merging the same guest again, e.g a concurrent login, is a no-op
+        WatchList.objects.merge_guest(guest.id, self.verified_user.id)
+        self.assertEqual(WatchList.objects.count(), 1000)
+
+    @skipUnless(connection.vendor == "postgresql", "Single statement on PostgreSQL")
+    def test_guest_watchlist_merge_is_one_statement(self):
+        for count in (1, 1000):
+            guest = self.guest_watching(count, watched_by_user=1)
+            with CaptureQueriesContext(connection) as queries:
+                WatchList.objects.merge_guest(guest.id, self.verified_user.id)
+            merges = [q for q in queries if "INSERT" in q["sql"]]
+            self.assertEqual(len(merges), 1)
+            WatchList.objects.all().delete()
+            Listing.objects.all().delete()
+            Category.objects.all().delete()
+
+    @override_settings(WATCHLIST_MERGE_DEFERRED=True)
+    def test_deferred_guest_watchlist_merge(self):
+        guest = self.guest_watching(5, watched_by_user=2)
+
+        # Verify that login only marks the guest for the worker
+        response = self.login_as_guest(guest)
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(WatchList.objects.filter(user=self.verified_user).count(), 2)
+        guest.refresh_from_db()
+        self.assertEqual(guest.merge_into_id, self.verified_user.id)
+
+        call_command("merge_watchlists", once=True)
+        self.assertEqual(WatchList.objects.filter(user=self.verified_user).count(), 5)
+        self.assertFalse(GuestUser.objects.filter(id=guest.id).exists())
@@ -1,5 +1,6 @@
+from django.conf import settings
 from ninja import Router
-from apps.common.utils import AuthUser, GuestClient, is_uuid
+from apps.common.utils import AuthUser, GuestClient
 
 from apps.common.schemas import ResponseSchema
 from .schemas import (
@@ -13,15 +14,15 @@ from .schemas import (
     VerifyOtpSchema,
 )
 
-from .auth import Authentication
+from .auth import Authentication, token_cache
 from .emails import Util
+from .hashers import hasher_pool
 
 from .models import Jwt, Otp, User
 from apps.common.models import GuestUser
 from apps.listings.models import WatchList
 
 from apps.common.exceptions import RequestError
-from asgiref.sync import sync_to_async
 
 auth_router = Router(tags=["Auth"])
 
@@ -83,7 +84,7 @@ async def verify_email(request, data: VerifyOtpSchema):
     await otp.adelete()
 
     # Send welcome email
-    Util.welcome_email(user)
+    await Util.welcome_email(user)
     return {
         "message": "Account verification successful",
     }
@@ -148,11 +149,11 @@ async def set_new_password(request, data: SetNewPasswordSchema):
     if otp.check_expiration():
         raise RequestError(err_msg="Expired Otp")
 
-    user.set_password(password)
+    await hasher_pool.set_password(user, password)
     await user.asave()
 
     # Send password reset success email
-    Util.password_reset_confirmation(user)
+    await Util.password_reset_confirmation(user)
     return {"message": "Password reset successful"}
 
 
@@ -168,12 +169,13 @@ async def login(request, data: LoginUserSchema):
     password = data.password
 
     user = await User.objects.get_or_none(email=email)
-    if not user or not user.check_password(password):
+    if not user or not await hasher_pool.check_password(user, password):
         raise RequestError(err_msg="Invalid credentials", status_code=401)
 
     if not user.is_email_verified:
         raise RequestError(err_msg="Verify your email first", status_code=401)
     await Jwt.objects.filter(user_id=user.id).adelete()
+    await token_cache.invalidate_user(user.id)
 
     # Create tokens and store in jwt model
     access = Authentication.create_access_token({"user_id": str(user.id)})
@@ -181,25 +183,11 @@ async def login(request, data: LoginUserSchema):
     await Jwt.objects.acreate(user_id=user.id, access=access, refresh=refresh)
 
     # Move all guest user watchlists to the authenticated user watchlists
-    guest_id = is_uuid((await request.auth))
-    if guest_id:
-        guest_user_watchlists_ids = await sync_to_async(list)(
-            WatchList.objects.filter(guest_id=guest_id)
-            .exclude(
-                listing_id__in=WatchList.objects.filter(user=user)
-                .select_related("user", "guest")
-                .values_list("listing_id", flat=True)
-            )
-            .select_related("user", "listing")
-            .values_list("listing_id", flat=True)
-        )
-        if len(guest_user_watchlists_ids) > 0:
-            data_to_create = [
-                WatchList(user_id=user.id, listing_id=listing_id)
-                for listing_id in guest_user_watchlists_ids
-            ]
-            await WatchList.objects.abulk_create(data_to_create)
-            await GuestUser.objects.filter(id=guest_id).adelete()
+    guest = await request.auth
+    if guest and settings.WATCHLIST_MERGE_DEFERRED:
+        await GuestUser.objects.filter(id=guest.id).aupdate(merge_into=user)
+    elif guest:
+        await WatchList.objects.amerge_guest(guest.id, user.id)
 
     return {
         "message": "Login successful",
@@ -230,6 +218,7 @@ async def refresh(request, data: RefreshTokensSchema):
     jwt.access = access
     jwt.refresh = refresh
     await jwt.asave()
+    await token_cache.invalidate_user(jwt.user_id)
 
     return {
         "message": "Tokens refresh successful",
@@ -245,5 +234,7 @@ async def refresh(request, data: RefreshTokensSchema):
     auth=AuthUser(),
 )
 async def logout(request):
-    await Jwt.objects.filter(user_id=(await request.auth).id).adelete()
+    user = await request.auth
+    await Jwt.objects.filter(user_id=user.id).adelete()
+    await token_cache.invalidate_user(user.id)
     return {"message": "Logout successful"}
@@ -3,6 +3,8 @@ from ninja import NinjaAPI
 from ninja.responses import Response
 from ninja.errors import ValidationError, AuthenticationError
 from apps.common.exceptions import RequestError, request_errors, validation_errors
+from apps.common.metrics import REQUEST_ERRORS, route_label
+from apps.common.renderers import renderer
 from apps.general.views import general_router
 from apps.accounts.views import auth_router
 from apps.listings.views import listings_router
@@ -13,6 +15,7 @@ api = NinjaAPI(
     description="A simple bidding API built with Django Ninja Rest Framework",
     version="5.0.0",
     docs_url="/",
+    renderer=renderer,
 )
 
 api.add_router("/api/v5/general/", general_router)
@@ -38,6 +41,7 @@ def validation_exc_handler(request, exc):
 
 @api.exception_handler(RequestError)
 def request_exc_handler(request, exc):
+    REQUEST_ERRORS.labels(route_label(request), exc.status_code.value).inc()
     return request_errors(exc)
 
 
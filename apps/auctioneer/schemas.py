@@ -117,14 +117,7 @@ class CreateListingResponseDataSchema(BaseModel):
 
     @validator("auctioneer", pre=True)
     def show_auctioneer(cls, v):
-        avatar = None
-        if v.avatar_id:
-            avatar = FileProcessor.generate_file_url(
-                key=v.avatar_id,
-                folder="avatars",
-                content_type=v.avatar.resource_type,
-            )
-        return {"name": v.full_name, "avatar": avatar}
+        return {"name": v.full_name, "avatar": v.get_avatar}
 
     @validator("category", pre=True)
     def show_category(cls, v):
@@ -2,8 +2,10 @@ from django.utils import timezone
 from django.test import TestCase
 from django.test.client import AsyncClient
 from apps.accounts.auth import Authentication
-from apps.accounts.models import Jwt
+from apps.accounts.models import Jwt, User
 
+from apps.common.cache import ResponseCache
+from apps.common.models import File
 from apps.common.utils import TestUtil
 from apps.listings.models import Bid, Category
 from unittest import mock
@@ -27,9 +29,10 @@ class TestAuctioneer(TestCase):
 
     async def test_profile_view(self):
         verified_user = self.verified_user
-        response = await self.client.get(
-            self.profile_url, content_type=self.content_type, **self.bearer
-        )
+        with TestUtil.query_budget(self, 1):
+            response = await self.client.get(
+                self.profile_url, content_type=self.content_type, **self.bearer
+            )
         self.assertEqual(response.status_code, 200)
         self.assertEqual(
             response.json(),
@@ -50,6 +53,7 @@ class TestAuctioneer(TestCase):
             "last_name": "Update",
             "file_type": "image/jpeg",
         }
+        version = await ResponseCache.get_version("listings")
         response = await self.client.put(
             self.profile_url, user_dict, content_type=self.content_type, **self.bearer
         )
@@ -67,11 +71,15 @@ class TestAuctioneer(TestCase):
             },
         )
 
+        # Verify that cached listings embedding the user's name are invalidated
+        self.assertGreater(await ResponseCache.get_version("listings"), version)
+
     async def test_auctioneer_retrieve_listings(self):
         # Verify that all listings by a particular auctioneer is fetched
-        response = await self.client.get(
-            self.listings_url, content_type=self.content_type, **self.bearer
-        )
+        with TestUtil.query_budget(self, 2):
+            response = await self.client.get(
+                self.listings_url, content_type=self.content_type, **self.bearer
+            )
         self.assertEqual(response.status_code, 200)
         result = response.json()
         self.assertEqual(result["status"], "success")
@@ -218,17 +226,36 @@ class TestAuctioneer(TestCase):
         listing = self.listing
         another_verified_user = self.another_verified_user
 
-        # Create Bid
+        # Create Bids, enough for one query per bidder to show up as an N+1
         await Bid.objects.acreate(
             user=another_verified_user, listing=listing, amount=5000.00
         )
+        avatar = await File.objects.acreate(resource_type="image/jpeg")
+        bidders = await User.objects.abulk_create(
+            [
+                User(
+                    first_name="Bidder",
+                    last_name=str(i),
+                    email=f"b{i}@example.com",
+                    avatar=avatar,
+                )
+                for i in range(3)
+            ]
+        )
+        await Bid.objects.abulk_create(
+            [
+                Bid(user=bidder, listing=listing, amount=6000 + i)
+                for i, bidder in enumerate(bidders)
+            ]
+        )
 
         # Verify that auctioneer listing bids retrieval succeeds with a valid slug and owner
-        response = await self.client.get(
-            f"{self.listings_url}{listing.slug}/bids/",
-            content_type=self.content_type,
-            **self.bearer,
-        )
+        with TestUtil.query_budget(self, 3):
+            response = await self.client.get(
+                f"{self.listings_url}{listing.slug}/bids/",
+                content_type=self.content_type,
+                **self.bearer,
+            )
         self.assertEqual(response.status_code, 200)
         result = response.json()
         self.assertEqual(result["status"], "success")
@@ -7,10 +7,14 @@ from .schemas import (
     UpdateProfileResponseSchema,
     UpdateProfileSchema,
 )
+from apps.accounts.auth import token_cache
+from apps.common.cache import ResponseCache
+from apps.common.db.routers import ReadYourWrites, use_replica
 from apps.common.exceptions import RequestError
 from apps.common.models import File
+from apps.common.renderers import trusted_response
 from apps.common.utils import AuthUser
-from apps.listings.models import Category, Listing
+from apps.listings.models import Bid, Category, Listing
 from asgiref.sync import sync_to_async
 
 from apps.listings.schemas import BidsResponseSchema, ListingsResponseSchema
@@ -52,6 +56,10 @@ async def update_profile(request, data: UpdateProfileSchema):
     for attr, value in data.items():
         setattr(user, attr, value)
     await user.asave()
+    await token_cache.invalidate_user(user.id)
+    # Listings, bids and reviews embed the user's name and avatar
+    await ResponseCache.abump("listings", "reviews")
+    await ReadYourWrites.pin(request)
     return {"message": "User updated!", "data": user}
 
 
@@ -61,6 +69,7 @@ async def update_profile(request, data: UpdateProfileSchema):
     description="This endpoint retrieves all listings by the current user",
     response=ListingsResponseSchema,
 )
+@use_replica
 async def retrieve_listings(request, quantity: int = None):
     user = await request.auth
     listings = await sync_to_async(list)(
@@ -72,7 +81,10 @@ async def retrieve_listings(request, quantity: int = None):
         # Retrieve based on amount
         listings = listings[:quantity]
 
-    return {"message": "Auctioneer Listings fetched", "data": listings}
+    return trusted_response(
+        ListingsResponseSchema,
+        {"message": "Auctioneer Listings fetched", "data": listings},
+    )
 
 
 @auctioneer_router.post(
@@ -110,6 +122,7 @@ async def create_listing(request, data: CreateListingSchema):
     data.update({"image": file})
     data.pop("file_type")
     listing = await Listing.objects.acreate(**data)
+    await ReadYourWrites.pin(request)
 
     return {
         "message": "Listing created successfully",
@@ -169,6 +182,7 @@ async def update_listing(request, slug: str, data: UpdateListingSchema):
     for attr, value in data.items():
         setattr(listing, attr, value)
     await listing.asave()
+    await ReadYourWrites.pin(request)
     return {"message": "Listing updated successfully", "data": listing}
 
 
@@ -178,16 +192,11 @@ async def update_listing(request, slug: str, data: UpdateListingSchema):
     description="This endpoint retrieves all bids in a particular listing by the current user.",
     response=BidsResponseSchema,
 )
+@use_replica
 async def retrieve_bids(request, slug: str):
     user = await request.auth
     # Get listing by slug
-    listing = (
-        await Listing.objects.select_related(
-            "auctioneer", "auctioneer__avatar", "category", "image"
-        )
-        .prefetch_related("bids", "bids__user")
-        .get_or_none(slug=slug)
-    )
+    listing = await Listing.objects.get_or_none(slug=slug)
     if not listing:
         raise RequestError(err_msg="Listing does not exist!", status_code=404)
 
@@ -195,8 +204,11 @@ async def retrieve_bids(request, slug: str):
     if user.id != listing.auctioneer_id:
         raise RequestError(err_msg="This listing doesn't belong to you!")
 
-    bids = listing.bids.all()
+    # Each bid shows its user's avatar
+    bids = await sync_to_async(list)(
+        Bid.objects.filter(listing_id=listing.id).select_related("user", "user__avatar")
+    )
     return {
         "message": "Listing Bids fetched",
-        "data": {"listing": listing.name, "bids": list(bids)},
+        "data": {"listing": listing.name, "bids": bids},
     }
@@ -14,7 +14,7 @@ class FileAdmin(admin.ModelAdmin):
 
 
 class GuestUserAdmin(admin.ModelAdmin):
-    list_display = ("id",)
+    list_display = ("id", "updated_at")
     list_filter = ("id",)
 
 
@@ -4,3 +4,17 @@ from django.apps import AppConfig
 class CommonConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "apps.common"
+
+    def ready(self):
+        from django.conf import settings
+        from django.db.backends.signals import connection_created
+        from apps.common.cache import require_shared_cache
+        from apps.common.middleware import install_query_counter
+
+        connection_created.connect(install_query_counter)
+        # Versions bumped by one worker must invalidate every worker's responses
+        if settings.RESPONSE_CACHE:
+            require_shared_cache("RESPONSE_CACHE")
+        # A client pinned to the primary by one worker must be by all of them
+        if getattr(settings, "DATABASE_REPLICAS", []):
+            require_shared_cache("DATABASE_REPLICAS")
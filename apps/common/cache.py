@@ -0,0 +1,121 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.db import transaction
+from django.http import HttpResponse
+from apps.common.metrics import CACHE_LOOKUPS
+from apps.common.renderers import renderer
+from functools import wraps
+import json
+
+RESPONSE_CACHE_TIMEOUT = 300
+# Backends keeping entries in each process, out of other workers' sight
+PROCESS_LOCAL_CACHES = (
+    "django.core.cache.backends.locmem.LocMemCache",
+    "django.core.cache.backends.dummy.DummyCache",
+)
+
+
+def require_shared_cache(feature: str):
+    """
+    Raises ImproperlyConfigured unless the default cache is shared by every
+    process (e.g Redis, Memcached or the database), for features whose state
+    must be seen by all workers.
+    """
+    backend = settings.CACHES["default"]["BACKEND"]
+    if backend in PROCESS_LOCAL_CACHES:
+        raise ImproperlyConfigured(
+            f"{feature} needs a cache shared by every process, set CACHE_BACKEND "
+            f"to e.g django.core.cache.backends.redis.RedisCache rather than {backend}."
+        )
+
+
+class ResponseCache:
+    """
+    Caches rendered responses of public read endpoints.
+    Keys embed a per-resource version which write paths bump, so a mutation
+    makes every cached response of that resource unreachable at once.
+    """
+
+    hits = 0
+    misses = 0
+
+    def version_key(resource: str):
+        return f"version:{resource}"
+
+    async def get_version(resource: str):
+        key = ResponseCache.version_key(resource)
+        version = await cache.aget(key)
+        if version is None:
+            await cache.aadd(key, 1, timeout=None)
+            version = await cache.aget(key, 1)
+        return version
+
+    def bump(*resources: str):
+        for resource in resources:
+            key = ResponseCache.version_key(resource)
+            try:
+                cache.incr(key)
+            except ValueError:
+                cache.set(key, 2, timeout=None)
+
+    async def abump(*resources: str):
+        # For async views whose writes are already committed (autocommit)
+        for resource in resources:
+            key = ResponseCache.version_key(resource)
+            try:
+                await cache.aincr(key)
+            except ValueError:
+                await cache.aset(key, 2, timeout=None)
+
+    def bump_on_commit(*resources: str):
+        # Bumping before commit would let a reader cache the old rows again
+        transaction.on_commit(lambda: ResponseCache.bump(*resources))
+
+    def stats():
+        total = ResponseCache.hits + ResponseCache.misses
+        return {
+            "hits": ResponseCache.hits,
+            "misses": ResponseCache.misses,
+            "hit_rate": ResponseCache.hits / total if total else 0,
+        }
+
+
+def cached_response(resource: str, timeout: int = RESPONSE_CACHE_TIMEOUT, refresh=None):
+    """
+    Caches successful HttpResponses (e.g from trusted_response) of an async view,
+    when RESPONSE_CACHE is set. refresh, if given, updates the parsed body of a
+    cached response before it's served, for fields that depend on the time they
+    are served at.
+    """
+
+    def decorator(view_func):
+        @wraps(view_func)
+        async def wrapper(request, *args, **kwargs):
+            if not settings.RESPONSE_CACHE:
+                return await view_func(request, *args, **kwargs)
+            version = await ResponseCache.get_version(resource)
+            key = f"response:{resource}:{version}:{request.get_full_path()}"
+            cached = await cache.aget(key)
+            if cached:
+                ResponseCache.hits += 1
+                CACHE_LOOKUPS.labels("response", "hit").inc()
+                content, content_type = cached
+                if refresh:
+                    body = json.loads(content)
+                    refresh(body)
+                    content = renderer.render(request, body, response_status=200)
+                return HttpResponse(content, content_type=content_type)
+
+            ResponseCache.misses += 1
+            CACHE_LOOKUPS.labels("response", "miss").inc()
+            response = await view_func(request, *args, **kwargs)
+            if isinstance(response, HttpResponse) and response.status_code == 200:
+                await cache.aset(
+                    key, (response.content, response["Content-Type"]), timeout
+                )
+            return response
+
+        return wrapper
+
+    return decorator
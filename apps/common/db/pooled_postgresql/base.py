@@ -0,0 +1,112 @@
+"""
+PostgreSQL backend that checks connections out of a psycopg_pool.ConnectionPool
+instead of opening a new one for every request.
+
+Enable it with OPTIONS["pool"], a dict of ConnectionPool arguments
+(min_size, max_size, timeout, max_idle, ...). With CONN_HEALTH_CHECKS
+connections are checked on checkout. Keep CONN_MAX_AGE at 0 so connections
+go back to the pool at the end of each request.
+"""
+
+from django.core.exceptions import ImproperlyConfigured
+from django.db.backends.base.base import NO_DB_ALIAS
+from django.db.backends.postgresql import base, creation
+from psycopg import IsolationLevel
+from psycopg_pool import ConnectionPool
+import os, threading
+
+
+class DatabaseCreation(creation.DatabaseCreation):
+    def _destroy_test_db(self, test_database_name, verbosity):
+        # Pooled connections would keep the test database in use
+        self.connection.close_pools()
+        super()._destroy_test_db(test_database_name, verbosity)
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    creation_class = DatabaseCreation
+    # Pools are per process (workers are forked) and shared by all threads
+    pools = {}
+    pools_lock = threading.Lock()
+
+    @property
+    def pool(self):
+        pool_options = self.settings_dict["OPTIONS"].get("pool")
+        # The connection used to create the test database isn't pooled
+        if self.alias == NO_DB_ALIAS or not pool_options:
+            return None
+
+        key = (os.getpid(), self.alias, self.settings_dict["NAME"])
+        with self.pools_lock:
+            if key not in self.pools:
+                kwargs = self.get_connection_params()
+                # Django sets autocommit itself once a connection is checked out
+                kwargs["autocommit"] = True
+                check = None
+                if self.settings_dict["CONN_HEALTH_CHECKS"]:
+                    check = ConnectionPool.check_connection
+                self.pools[key] = ConnectionPool(
+                    kwargs=kwargs,
+                    name=self.alias,
+                    check=check,
+                    reset=self.reset_connection,
+                    open=True,
+                    **pool_options,
+                )
+            return self.pools[key]
+
+    @staticmethod
+    def reset_connection(connection):
+        # Session locks (e.g the auction scheduler's leader lock) must end with
+        # the checkout that took them, not follow the connection to its next user
+        connection.autocommit = True
+        connection.execute("SELECT pg_advisory_unlock_all()")
+
+    def close_pools(self):
+        with self.pools_lock:
+            for key in [key for key in self.pools if key[1] == self.alias]:
+                self.pools.pop(key).close()
+
+    def get_connection_params(self):
+        conn_params = super().get_connection_params()
+        conn_params.pop("pool", None)
+        return conn_params
+
+    def get_new_connection(self, conn_params):
+        pool = self.pool
+        if not pool:
+            return super().get_new_connection(conn_params)
+
+        options = self.settings_dict["OPTIONS"]
+        try:
+            self.isolation_level = IsolationLevel(
+                options.get("isolation_level", IsolationLevel.READ_COMMITTED)
+            )
+        except ValueError:
+            raise ImproperlyConfigured(
+                f"Invalid transaction isolation level {options['isolation_level']} "
+                f"specified. Use one of the psycopg.IsolationLevel values."
+            )
+        connection = pool.getconn()
+        if "isolation_level" in options:
+            connection.isolation_level = self.isolation_level
+        return connection
+
+    def _close(self):
+        pool = self.pool
+        if self.connection is None or not pool:
+            return super()._close()
+        with self.wrap_database_errors:
+            pool.putconn(self.connection)
+        # The connection now belongs to the pool
+        self.connection = None
+
+
+def pool_stats():
+    """Size and wait time metrics of this process' pools, by database alias"""
+    pid = os.getpid()
+    return {
+        alias: pool.get_stats()
+        for (pool_pid, alias, _), pool in DatabaseWrapper.pools.items()
+        if pool_pid == pid
+    }
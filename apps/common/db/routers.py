@@ -0,0 +1,120 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections
+from contextvars import ContextVar
+from functools import wraps
+import hashlib, itertools, logging, time
+
+logger = logging.getLogger(__name__)
+
+HEALTH_CHECK_SECONDS = 5
+# How long a replica that failed its health check is left out
+REPLICA_RETRY_SECONDS = 30
+
+# Set while a view marked with use_replica runs. sync_to_async copies it
+# into the thread running the ORM calls.
+replica_route = ContextVar("replica_route", default=False)
+
+
+class ReplicaRouter:
+    """
+    Sends reads of views marked with use_replica to the DATABASE_REPLICAS in turn,
+    skipping replicas that fail a health check. Everything else uses the primary.
+    """
+
+    def __init__(self):
+        self.counter = itertools.count()
+        self.checked_at = {}
+        self.down_until = {}
+
+    def db_for_read(self, model, **hints):
+        replicas = getattr(settings, "DATABASE_REPLICAS", [])
+        if replica_route.get():
+            for _ in range(len(replicas)):
+                alias = replicas[next(self.counter) % len(replicas)]
+                if self.is_healthy(alias):
+                    return alias
+        return DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        # Explicit, or instances read from a replica would be saved back to it
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same rows as the primary
+        return True
+
+    def allow_migrate(self, db, app_label, **hints):
+        # Replicas get the schema through replication
+        return db not in getattr(settings, "DATABASE_REPLICAS", [])
+
+    def is_healthy(self, alias: str):
+        now = time.monotonic()
+        if self.down_until.get(alias, 0) > now:
+            return False
+        if now - self.checked_at.get(alias, 0) < HEALTH_CHECK_SECONDS:
+            return True
+        try:
+            self.check(alias)
+        except Exception:
+            logger.warning(f"Replica {alias} failed its health check", exc_info=True)
+            self.down_until[alias] = now + REPLICA_RETRY_SECONDS
+            return False
+        self.checked_at[alias] = now
+        return True
+
+    def check(self, alias: str):
+        connection = connections[alias]
+        connection.ensure_connection()
+        if not connection.is_usable():
+            connection.close()
+            raise ConnectionError(f"{alias} is not usable")
+
+
+class ReadYourWrites:
+    """
+    Keeps a client on the primary for REPLICA_PIN_SECONDS after it writes,
+    so it never reads its own changes back from a replica that lags behind.
+    Clients are told apart by their Authorization or GuestUserId header. Pins are
+    kept in the default cache, which must be shared by every worker (checked on
+    startup when DATABASE_REPLICAS are set).
+    """
+
+    def key(request):
+        client = request.headers.get("Authorization") or request.headers.get(
+            "GuestUserId"
+        )
+        if not client:
+            return None
+        return f"replica:pin:{hashlib.sha256(client.encode()).hexdigest()}"
+
+    async def pin(request):
+        key = ReadYourWrites.key(request)
+        if key:
+            await cache.aset(key, True, settings.REPLICA_PIN_SECONDS)
+
+    async def is_pinned(request):
+        key = ReadYourWrites.key(request)
+        return bool(key and await cache.aget(key))
+
+
+def use_replica(view_func):
+    """
+    Marks a read-only async view whose queries may be served by a replica.
+    Views behind cached_response stay on the primary: a response read from
+    a lagging replica right after a write would be cached as the new version.
+    """
+
+    @wraps(view_func)
+    async def wrapper(request, *args, **kwargs):
+        if not getattr(settings, "DATABASE_REPLICAS", []):
+            return await view_func(request, *args, **kwargs)
+        if await ReadYourWrites.is_pinned(request):
+            return await view_func(request, *args, **kwargs)
+        token = replica_route.set(True)
+        try:
+            return await view_func(request, *args, **kwargs)
+        finally:
+            replica_route.reset(token)
+
+    return wrapper
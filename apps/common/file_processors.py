@@ -1,4 +1,5 @@
 from django.conf import settings
+from functools import lru_cache
 import time
 import cloudinary
 import cloudinary.uploader
@@ -32,16 +33,24 @@ class FileProcessor:
             print(e)
             pass
 
+    @staticmethod
     def generate_file_url(key, folder, content_type):
-        file_extension = mimetypes.guess_extension(content_type)
-        key = f"{BASE_FOLDER}{folder}/{key}{file_extension}"
-
         try:
-            return cloudinary.utils.cloudinary_url(key, secure=True)[0]
+            return FileProcessor._file_url(key, folder, content_type)
         except Exception as e:
             print(e)
             pass
 
+    @staticmethod
+    @lru_cache(maxsize=4096)
+    def _file_url(key, folder, content_type):
+        # File urls are a pure function of these arguments, so they're memoized
+        # rather than rebuilt for every item of every serialized page. Failures
+        # raise through the cache, so they're retried on the next call
+        file_extension = mimetypes.guess_extension(content_type)
+        key = f"{BASE_FOLDER}{folder}/{key}{file_extension}"
+        return cloudinary.utils.cloudinary_url(key, secure=True)[0]
+
     def upload_file(file, key, folder):
         key = f"{BASE_FOLDER}{folder}/{key}"
         try:
@@ -0,0 +1,449 @@
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+from django.test import override_settings
+from django.test.client import AsyncClient
+from django.utils import timezone
+from apps.accounts.auth import Authentication
+from apps.accounts.models import Jwt, Otp, User
+from apps.common.middleware import count_queries
+from apps.common.models import File
+from apps.common.utils import GuestToken
+from apps.listings.models import Category, Listing
+from .data_generator import PASSWORD, SyntheticData
+from .data_script import CreateData
+
+from datetime import timedelta
+from pathlib import Path
+import asyncio, itertools, json, logging, statistics, time, tracemalloc
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Compared against the baseline, tail latencies are recorded but too noisy on
+# shared hosts to gate on
+GATED_METRICS = ("p50_ms", "queries", "alloc_kb", "bytes")
+# Differences below these never count as regressions, whatever the threshold
+MIN_DELTAS = {"p50_ms": 2, "queries": 0, "alloc_kb": 16, "bytes": 0}
+BENCHMARK_LISTING = "Benchmark listing"
+OTP = 123456
+
+
+def endpoints(fixtures: dict):
+    """
+    (name, method, path, data, headers) of every route worth timing. Writes
+    that can't be repeated as is pass a function as data instead, awaited
+    before each request, untimed, for that request's (data, headers).
+    """
+    slug, category, email = fixtures["slug"], fixtures["category"], fixtures["email"]
+    bearer = {"Authorization": f"Bearer {fixtures['access']}"}
+    guest = {"GuestUserId": fixtures["guest"]}
+    sequence = fixtures["sequence"]
+    listing_data = {
+        "name": BENCHMARK_LISTING,
+        "desc": "Benchmark description",
+        "category": category,
+        "price": 1000.00,
+        "closing_date": timezone.now() + timedelta(days=30),
+        "file_type": "image/jpeg",
+    }
+
+    async def new_bid():
+        # Each bid outbids the last, on a listing of another user
+        return {"amount": next(sequence)}, bearer
+
+    async def new_user():
+        return {
+            "first_name": "Benchmark",
+            "last_name": "User",
+            "email": f"register{next(sequence)}@example.com",
+            "password": PASSWORD,
+            "terms_agreement": True,
+        }, {}
+
+    async def unverified_user():
+        user = await User.objects.acreate(
+            first_name="Benchmark",
+            last_name="User",
+            email=f"verify{next(sequence)}@example.com",
+        )
+        await Otp.objects.acreate(user=user, code=OTP)
+        return {"email": user.email, "otp": OTP}, {}
+
+    async def refresh_token():
+        # Every refresh replaces the token
+        jwt = await Jwt.objects.aget(user_id=fixtures["refresh_user"])
+        return {"refresh": jwt.refresh}, {}
+
+    async def logged_in():
+        user_id = fixtures["logout_user"]
+        jwt = await Jwt.objects.acreate(
+            user_id=user_id,
+            access=Authentication.create_access_token({"user_id": str(user_id)}),
+            refresh=Authentication.create_refresh_token(),
+        )
+        return None, {"Authorization": f"Bearer {jwt.access}"}
+
+    async def new_subscriber():
+        return {"email": f"subscriber{next(sequence)}@example.com"}, {}
+
+    async def new_listing():
+        # The listing made by the previous call goes, so the data stays the same
+        await Listing.objects.filter(name=BENCHMARK_LISTING).adelete()
+        return listing_data, bearer
+
+    return [
+        ("general.site_detail", "get", "/api/v5/general/site-detail/", None, {}),
+        ("general.reviews", "get", "/api/v5/general/reviews/", None, {}),
+        ("general.subscribe", "post", "/api/v5/general/subscribe/", new_subscriber, {}),
+        ("listings.list", "get", "/api/v5/listings/?quantity=50", None, {}),
+        (
+            "listings.list_filtered",
+            "get",
+            "/api/v5/listings/?quantity=50&sort=price&min_price=100&facets=true",
+            None,
+            {},
+        ),
+        # About 7% of the listings, read to the end
+        ("listings.stream", "get", "/api/v5/listings/stream/?max_price=20", None, {}),
+        (
+            "listings.search",
+            "get",
+            "/api/v5/listings/search/?q=vintage+watch",
+            None,
+            {},
+        ),
+        ("listings.detail", "get", f"/api/v5/listings/detail/{slug}/", None, {}),
+        ("listings.bids", "get", f"/api/v5/listings/detail/{slug}/bids/", None, {}),
+        # Up to the first frame, the stream itself lasts minutes
+        (
+            "listings.bids_stream",
+            "get",
+            f"/api/v5/listings/detail/{slug}/bids/stream/",
+            None,
+            {},
+        ),
+        (
+            "listings.create_bid",
+            "post",
+            f"/api/v5/listings/detail/{fixtures['bid_slug']}/bids/",
+            new_bid,
+            {},
+        ),
+        ("listings.watchlist", "get", "/api/v5/listings/watchlist/", None, bearer),
+        ("listings.guest_watchlist", "get", "/api/v5/listings/watchlist/", None, guest),
+        # Adds and removes in turn, so the data stays the same
+        (
+            "listings.toggle_watchlist",
+            "post",
+            "/api/v5/listings/watchlist/",
+            {"slug": slug},
+            guest,
+        ),
+        ("listings.categories", "get", "/api/v5/listings/categories/", None, {}),
+        (
+            "listings.category",
+            "get",
+            f"/api/v5/listings/categories/{category}/",
+            None,
+            {},
+        ),
+        ("auth.register", "post", "/api/v5/auth/register/", new_user, {}),
+        (
+            "auth.verify_email",
+            "post",
+            "/api/v5/auth/verify-email/",
+            unverified_user,
+            {},
+        ),
+        (
+            "auth.login",
+            "post",
+            "/api/v5/auth/login/",
+            {"email": email, "password": PASSWORD},
+            {},
+        ),
+        ("auth.refresh", "post", "/api/v5/auth/refresh/", refresh_token, {}),
+        ("auth.logout", "get", "/api/v5/auth/logout/", logged_in, {}),
+        ("auctioneer.profile", "get", "/api/v5/auctioneer/", None, bearer),
+        ("auctioneer.listings", "get", "/api/v5/auctioneer/listings/", None, bearer),
+        (
+            "auctioneer.create_listing",
+            "post",
+            "/api/v5/auctioneer/listings/",
+            new_listing,
+            {},
+        ),
+        # The same data every time, so the listing stays the same
+        (
+            "auctioneer.update_listing",
+            "patch",
+            f"/api/v5/auctioneer/listings/{fixtures['update_slug']}/",
+            {"desc": "Benchmark description"},
+            bearer,
+        ),
+        (
+            "auctioneer.bids",
+            "get",
+            f"/api/v5/auctioneer/listings/{slug}/bids/",
+            None,
+            bearer,
+        ),
+    ]
+
+
+def percentile(values: list, fraction: float) -> float:
+    values = sorted(values)
+    return values[min(int(len(values) * fraction), len(values) - 1)]
+
+
+def caller(client, endpoint):
+    """
+    Returns prepare, which sets up a request and returns it to be timed. The
+    request returns its status code and the size of its body.
+    """
+    _, method, path, data, headers = endpoint
+
+    async def prepare():
+        body, request_headers = await data() if callable(data) else (data, headers)
+
+        async def call():
+            if body is None:
+                response = await getattr(client, method)(path, **request_headers)
+            else:
+                response = await getattr(client, method)(
+                    path, body, content_type="application/json", **request_headers
+                )
+            if not response.streaming:
+                return response.status_code, len(response.content)
+            frames, size = response.streaming_content, 0
+            async for frame in frames:
+                size += len(frame)
+                if response["Content-Type"] == "text/event-stream":
+                    await frames.aclose()
+                    break
+            return response.status_code, size
+
+        return call
+
+    return prepare
+
+
+async def measure(endpoints: list, options: dict) -> dict:
+    """
+    Times every endpoint in turn, for several rounds. Each latency percentile
+    is the best of its rounds, so a burst of noise on the host spoils one round
+    rather than the result.
+    """
+    client = AsyncClient()
+    calls = {endpoint[0]: caller(client, endpoint) for endpoint in endpoints}
+    samples = {name: {"latencies": [], "queries": []} for name in calls}
+
+    # Warm up, e.g cached responses and the token cache
+    for name, prepare in calls.items():
+        status_code, size = await (await prepare())()
+        if status_code >= 400:
+            raise CommandError(f"{name} failed with {status_code}")
+        samples[name]["bytes"] = size
+
+    for _ in range(options["rounds"]):
+        for name, prepare in calls.items():
+            latencies = []
+            for _ in range(options["requests"]):
+                call = await prepare()
+                with count_queries() as counter:
+                    started = time.perf_counter()
+                    await call()
+                    latencies.append(time.perf_counter() - started)
+                samples[name]["queries"].append(counter.count)
+            samples[name]["latencies"].append(latencies)
+
+    # Separately, tracing allocations slows requests down
+    tracemalloc.start()
+    for name, prepare in calls.items():
+        allocations = []
+        for _ in range(options["memory_requests"]):
+            call = await prepare()
+            tracemalloc.reset_peak()
+            before = tracemalloc.get_traced_memory()[0]
+            await call()
+            allocations.append(tracemalloc.get_traced_memory()[1] - before)
+        samples[name]["alloc"] = statistics.median(allocations)
+    tracemalloc.stop()
+    # The connections of sync_to_async's thread would keep the test database in use
+    await sync_to_async(connections.close_all)()
+
+    def best(latencies, fraction):
+        return round(min(percentile(r, fraction) for r in latencies) * 1000, 2)
+
+    return {
+        name: {
+            "p50_ms": best(sample["latencies"], 0.5),
+            "p95_ms": best(sample["latencies"], 0.95),
+            "p99_ms": best(sample["latencies"], 0.99),
+            "queries": round(statistics.mean(sample["queries"]), 2),
+            "alloc_kb": round(sample["alloc"] / 1024, 1),
+            "bytes": sample["bytes"],
+        }
+        for name, sample in samples.items()
+    }
+
+
+def regressions(results: dict, baseline: dict, threshold: float) -> list:
+    found = []
+    for size, routes in results.items():
+        for name, metrics in routes.items():
+            base = baseline.get(size, {}).get(name)
+            if not base:
+                continue
+            for metric in GATED_METRICS:
+                old, new = base.get(metric), metrics[metric]
+                if old is None or new - old <= MIN_DELTAS[metric]:
+                    continue
+                if new > old * (1 + threshold):
+                    found.append(f"{size} {name} {metric}: {old} -> {new}")
+    return found
+
+
+class Command(BaseCommand):
+    help = (
+        "Times every API route against seeded data of several sizes in a test "
+        "database, and fails on regressions from a saved baseline"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--sizes", default="1000,10000", help="Listings seeded, comma separated"
+        )
+        parser.add_argument(
+            "--requests", type=int, default=20, help="Requests per endpoint per round"
+        )
+        parser.add_argument("--rounds", type=int, default=5)
+        parser.add_argument("--memory-requests", type=int, default=5)
+        parser.add_argument("--baseline", default="benchmarks/baseline.json")
+        parser.add_argument(
+            "--threshold",
+            type=float,
+            default=0.2,
+            help="Allowed regression, 0.2 = 20%%",
+        )
+        parser.add_argument(
+            "--update-baseline",
+            "--save-baseline",
+            action="store_true",
+            help="Save the results as baseline, needed when there is none yet",
+        )
+        parser.add_argument("--output", help="Also write the results to this file")
+
+    def handle(self, **options) -> None:
+        sizes = [int(size) for size in options["sizes"].split(",")]
+        baseline_path = Path(options["baseline"])
+        # Checked first, a run without anything to compare against gates nothing
+        if not options["update_baseline"] and not baseline_path.exists():
+            raise CommandError(
+                f"No baseline at {baseline_path}, save one with --update-baseline"
+            )
+        old_name = connection.settings_dict["NAME"]
+        # Never seeded into the configured database
+        connection.creation.create_test_db(
+            verbosity=0, autoclobber=True, serialize=False
+        )
+        try:
+            # Replicas would still point at the configured database
+            with override_settings(DATABASE_REPLICAS=[]):
+                results = self.run(sizes, options)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+        if options["output"]:
+            self.save(options["output"], results)
+        if options["update_baseline"]:
+            self.save(baseline_path, results)
+            logger.info(f"Baseline saved to {baseline_path}")
+        else:
+            baseline = json.loads(baseline_path.read_text())
+            found = regressions(results, baseline, options["threshold"])
+            if found:
+                raise CommandError(
+                    f"{len(found)} regressions over {options['threshold']:.0%}:\n"
+                    + "\n".join(found)
+                )
+            logger.info(f"No regression over {options['threshold']:.0%} from baseline")
+
+    def save(self, path, results: dict) -> None:
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps(results, indent=2) + "\n")
+
+    def run(self, sizes: list, options: dict) -> dict:
+        asyncio.run(CreateData().initialize(listings=False))
+        results = {}
+        seeded = 0
+        for seed, size in enumerate(sorted(sizes)):
+            # Each size adds onto the previous one, under its own seed
+            synthetic_data = SyntheticData(
+                users=max((size - seeded) // 4, 10),
+                listings=size - seeded,
+                bids_per_listing=5,
+                guests=max((size - seeded) // 40, 1),
+                watchlists_per_guest=3,
+                seed=seed,
+            )
+            synthetic_data.generate()
+            seeded = size
+            if seed == 0:
+                fixtures = self.fixtures(synthetic_data)
+
+            cache.clear()
+            routes = asyncio.run(measure(endpoints(fixtures), options))
+            for name, metrics in routes.items():
+                logger.info(f"{size} listings | {name}: {metrics}")
+            results[str(size)] = routes
+        return results
+
+    def fixtures(self, synthetic_data: SyntheticData) -> dict:
+        # The first user and listing are the most active, i.e the worst case.
+        # Logins, refreshes and logouts replace the user's tokens, so each is
+        # another user's.
+        user = User.objects.get(id=synthetic_data.uid("user", 0))
+        listing = Listing.objects.filter(auctioneer=user).order_by("-bids_count")[0]
+        jwt = self.jwt(user.id)
+        other_user = User.objects.get(id=synthetic_data.uid("user", 1))
+        # Updates regenerate the slug, which stays the same only if it was
+        # generated from the name in the first place
+        update_listing = self.listing(user, "Benchmark update")
+        bid_listing = self.listing(other_user, "Benchmark bids")
+        refresh_user = synthetic_data.uid("user", 2)
+        self.jwt(refresh_user)
+        return {
+            "slug": listing.slug,
+            "update_slug": update_listing.slug,
+            "category": Category.objects.first().slug,
+            "email": other_user.email,
+            "access": jwt.access,
+            "guest": GuestToken.create(synthetic_data.uid("guest", 0)),
+            "bid_slug": bid_listing.slug,
+            "refresh_user": refresh_user,
+            "logout_user": synthetic_data.uid("user", 3),
+            # Unique emails and ever higher bids, across sizes
+            "sequence": itertools.count(2),
+        }
+
+    def listing(self, user: User, name: str) -> Listing:
+        # Open for the whole run, whatever the seeded closing dates
+        return Listing.objects.create(
+            auctioneer=user,
+            name=name,
+            desc="Benchmark description",
+            price=1,
+            closing_date=timezone.now() + timedelta(days=90),
+            image=File.objects.create(resource_type="image/jpeg"),
+        )
+
+    def jwt(self, user_id) -> Jwt:
+        return Jwt.objects.create(
+            user_id=user_id,
+            access=Authentication.create_access_token({"user_id": str(user_id)}),
+            refresh=Authentication.create_refresh_token(),
+        )
@@ -0,0 +1,54 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.test import override_settings
+from django.test.client import AsyncClient
+import asyncio, logging, time
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+DISPATCHER = "apps.common.middleware.PathDispatchMiddleware"
+
+
+def full_stack_middleware():
+    """MIDDLEWARE with FULL_STACK_MIDDLEWARE run for every path again"""
+    middleware = []
+    for path in settings.MIDDLEWARE:
+        middleware += settings.FULL_STACK_MIDDLEWARE if path == DISPATCHER else [path]
+    return middleware
+
+
+async def time_requests(path: str, requests: int):
+    # In process, so only the handler and middleware are measured
+    client = AsyncClient()
+    await client.get(path)
+    started = time.perf_counter()
+    for _ in range(requests):
+        await client.get(path)
+    return (time.perf_counter() - started) / requests
+
+
+class Command(BaseCommand):
+    help = "Measures the per-request cost of the middleware stack on an API path"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--path", default="/api/v5/healthcheck/")
+        parser.add_argument("--requests", type=int, default=2000)
+
+    def handle(self, **options) -> None:
+        timings = {}
+        for name, middleware in (
+            ("full stack", full_stack_middleware()),
+            ("path dispatch", settings.MIDDLEWARE),
+        ):
+            with override_settings(MIDDLEWARE=middleware):
+                timings[name] = asyncio.run(
+                    time_requests(options["path"], options["requests"])
+                )
+            logger.info(f"{name}: {timings[name] * 1e6:.0f}us per request")
+
+        saved = timings["full stack"] - timings["path dispatch"]
+        logger.info(
+            f"Saved {saved * 1e6:.0f}us per request "
+            f"({saved / timings['full stack']:.0%}) on {options['path']}"
+        )
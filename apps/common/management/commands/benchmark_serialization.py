@@ -0,0 +1,90 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from ninja.renderers import JSONRenderer
+from apps.accounts.models import User
+from apps.common.models import File
+from apps.common.renderers import ORJSONRenderer
+from apps.listings.models import Category, Listing
+from apps.listings.schemas import ListingsResponseSchema
+from datetime import timedelta
+from decimal import Decimal
+import json, logging, time
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def build_listings(size):
+    # Unsaved instances with their relations set, like a select_related page
+    auctioneer = User(first_name="John", last_name="Doe", email="johndoe@example.com")
+    auctioneer.avatar = File(resource_type="image/png")
+    category = Category(name="Category")
+    closing_date = timezone.now() + timedelta(days=1)
+    listings = []
+    for i in range(size):
+        listing = Listing(
+            auctioneer=auctioneer,
+            name=f"Listing {i}",
+            slug=f"listing-{i}",
+            desc="Listing description",
+            category=category,
+            price=Decimal(1000 + i),
+            highest_bid=Decimal("0.00"),
+            closing_date=closing_date,
+            image=File(resource_type="image/jpeg"),
+        )
+        listing.watchlist = False
+        listings.append(listing)
+    return listings
+
+
+def validated_path(data):
+    # What ninja does by default: validate through the schema, then json.dumps
+    result = ListingsResponseSchema(**data).dict()
+    return JSONRenderer().render(None, result, response_status=200)
+
+
+def trusted_path(data):
+    result = ListingsResponseSchema.trusted_dict(data)
+    return ORJSONRenderer().render(None, result, response_status=200)
+
+
+def comparable(content):
+    # time_left_seconds ticks between the two runs
+    result = json.loads(content)
+    for item in result["data"]:
+        item.pop("time_left_seconds")
+    return result
+
+
+class Command(BaseCommand):
+    help = "Compares the validated and trusted serialization paths for listings"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000])
+        parser.add_argument("--repeat", type=int, default=3)
+
+    def handle(self, **options) -> None:
+        for size in options["sizes"]:
+            data = {"message": "Listings fetched", "data": build_listings(size)}
+            if comparable(validated_path(data)) != comparable(trusted_path(data)):
+                raise AssertionError("Serialization paths produced different output")
+
+            timings = {}
+            for name, path in (
+                ("validated", validated_path),
+                ("trusted", trusted_path),
+            ):
+                best = None
+                for _ in range(options["repeat"]):
+                    started = time.perf_counter()
+                    path(data)
+                    elapsed = time.perf_counter() - started
+                    best = elapsed if best is None else min(best, elapsed)
+                timings[name] = best
+
+            logger.info(
+                f"{size} listings | validated + json: {timings['validated'] * 1000:.1f}ms | "
+                f"trusted + orjson: {timings['trusted'] * 1000:.1f}ms | "
+                f"speedup: {timings['validated'] / timings['trusted']:.1f}x"
+            )
@@ -0,0 +1,82 @@
+from django.core.management.base import BaseCommand
+from urllib.parse import urlsplit
+import asyncio, logging, statistics, time
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+async def client(host, port, request, deadline, stats):
+    """Sends requests one after another over a keep-alive connection"""
+    reader = writer = None
+    while time.monotonic() < deadline:
+        try:
+            if not writer:
+                reader, writer = await asyncio.open_connection(host, port)
+            started = time.perf_counter()
+            writer.write(request)
+            await writer.drain()
+            status = int((await reader.readline()).split()[1])
+            headers = {}
+            while (line := await reader.readline()) not in (b"\r\n", b""):
+                name, _, value = line.decode().partition(":")
+                headers[name.strip().lower()] = value.strip()
+            await reader.readexactly(int(headers.get("content-length", 0)))
+            stats["latencies"].append(time.perf_counter() - started)
+            if status >= 400:
+                stats["errors"] += 1
+            if headers.get("connection") == "close":
+                writer.close()
+                writer = None
+        except (OSError, ValueError, IndexError, asyncio.IncompleteReadError):
+            stats["errors"] += 1
+            if writer:
+                writer.close()
+            writer = None
+            await asyncio.sleep(0.01)
+    if writer:
+        writer.close()
+
+
+class Command(BaseCommand):
+    help = "Measures the throughput of a running server on one endpoint"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--url", default="http://127.0.0.1:8000/api/v5/general/site-detail/"
+        )
+        parser.add_argument("--concurrency", type=int, default=64)
+        parser.add_argument("--duration", type=float, default=10)
+
+    def handle(self, **options) -> None:
+        url = urlsplit(options["url"])
+        request = (
+            f"GET {url.path or '/'}{'?' + url.query if url.query else ''} HTTP/1.1\r\n"
+            f"Host: {url.netloc}\r\n\r\n"
+        ).encode()
+        stats = {"latencies": [], "errors": 0}
+
+        async def run():
+            deadline = time.monotonic() + options["duration"]
+            await asyncio.gather(
+                *(
+                    client(url.hostname, url.port or 80, request, deadline, stats)
+                    for _ in range(options["concurrency"])
+                )
+            )
+
+        started = time.monotonic()
+        asyncio.run(run())
+        elapsed = time.monotonic() - started
+
+        latencies = sorted(stats["latencies"])
+        if not latencies:
+            logger.info(f"No successful requests, {stats['errors']} errors")
+            return
+        p99 = latencies[int(len(latencies) * 0.99) - 1]
+        logger.info(
+            f"{len(latencies)} requests in {elapsed:.1f}s | "
+            f"{len(latencies) / elapsed:.0f} req/s | "
+            f"p50: {statistics.median(latencies) * 1000:.1f}ms | "
+            f"p99: {p99 * 1000:.1f}ms | errors: {stats['errors']}"
+        )
@@ -0,0 +1,327 @@
+from django.contrib.auth.hashers import make_password
+from django.db import connection, transaction
+from django.utils import timezone
+from django.utils.text import slugify
+from apps.accounts.models import User
+from apps.common.models import GuestUser
+from apps.listings.models import Bid, Category, Listing, WatchList
+
+from datetime import timedelta
+from decimal import Decimal
+import hashlib, logging, random, time, uuid
+
+logger = logging.getLogger(__name__)
+
+PASSWORD = "testpassword"
+# Picks are skewed towards low indexes: a random index is n * random() ** SKEW,
+# so with SKEW = 3 the first 10% of users or listings get 46% of the picks
+SKEW = 3
+# Bids of the hottest listings are capped, as every bidder must be distinct
+MAX_BIDS_PER_LISTING = 5000
+
+# Vocabulary of synthetic listings, also seeded by benchmark_search. Names are
+# NAME_WORDS picks from it, descriptions DESC_WORDS picks.
+WORDS = (
+    "vintage antique leather wooden silver golden ceramic handmade rare signed "
+    "watch lamp chair table guitar camera painting vase clock mirror bicycle "
+    "sculpture necklace ring carpet jacket record piano telescope typewriter radio"
+).split()
+NAME_WORDS = 3
+DESC_WORDS = 20
+FIRST_NAMES = (
+    "Ada Bola Chen Dara Emeka Fatima Grace Hassan Ifeoma Jonas Kemi Liam Maria "
+    "Ngozi Omar Priya Quinn Rosa Sade Tunde Uche Vera Wale Xena Yusuf Zainab"
+).split()
+LAST_NAMES = (
+    "Adeyemi Brown Cruz Diallo Eze Fischer Garcia Hughes Ibrahim Johnson Kim "
+    "Lopez Musa Nwosu Okafor Patel Quadri Rossi Smith Tanaka Umeh Vargas"
+).split()
+
+
+def listing_text(rng: random.Random) -> tuple:
+    """A synthetic listing's (name, description)"""
+    name = " ".join(rng.choice(WORDS) for _ in range(NAME_WORDS)).title()
+    desc = " ".join(rng.choice(WORDS) for _ in range(DESC_WORDS)).capitalize()
+    return name, desc
+
+
+class SyntheticData:
+    """
+    Seeds users, listings, bids, guests and guest watchlists at capacity testing
+    scale. Rows are streamed in batches of batch_size with COPY on PostgreSQL and
+    multi-row INSERTs elsewhere, skipping model saves and Cloudinary uploads.
+    The same seed always generates the same rows (timestamps are relative to now).
+
+    Activity is skewed: a few users auction and bid far more than the rest,
+    and low index listings are hot, drawing most bids and watchers.
+    """
+
+    def __init__(
+        self,
+        users: int,
+        listings: int,
+        bids_per_listing: float,
+        guests: int,
+        watchlists_per_guest: float,
+        seed: int = 0,
+        batch_size: int = 10000,
+    ) -> None:
+        self.users = users
+        self.listings = listings
+        self.bids_per_listing = bids_per_listing
+        self.guests = guests
+        self.watchlists_per_guest = watchlists_per_guest
+        self.seed = seed
+        self.batch_size = batch_size
+        self.rng = random.Random(seed)
+        self.now = timezone.now()
+        self.copy = connection.vendor == "postgresql"
+        self.counts = {}
+
+    def uid(self, kind: str, *index) -> uuid.UUID:
+        # Derived rather than stored, so a million ids need no memory
+        key = f"{self.seed}:{kind}:{':'.join(map(str, index))}".encode()
+        return uuid.UUID(bytes=hashlib.blake2b(key, digest_size=16).digest())
+
+    def skewed(self, n: int) -> int:
+        return min(int(n * self.rng.random() ** SKEW), n - 1)
+
+    def hotness(self, index: int, n: int) -> float:
+        # Density of skewed() at index, it averages 1 over all indexes
+        x = (index + 0.5) / n
+        return x ** (1 / SKEW - 1) / SKEW
+
+    def ago(self, days: float) -> timedelta:
+        return timedelta(seconds=self.rng.uniform(0, days * 86400))
+
+    def check(self) -> None:
+        """Raises ValueError if these rows can't be generated, before any is written"""
+        counts = (self.users, self.listings, self.guests)
+        if min(counts) < 0 or min(self.bids_per_listing, self.watchlists_per_guest) < 0:
+            raise ValueError("Counts can't be negative")
+        if self.batch_size < 1:
+            raise ValueError("The batch size must be at least 1")
+        if User.objects.filter(id=self.uid("user", 0)).exists():
+            raise ValueError(f"Seed {self.seed} was already generated here")
+
+    def generate(self) -> None:
+        self.check()
+        started = time.monotonic()
+        self.generate_users()
+        if self.users and self.listings:
+            self.generate_listings()
+        if self.guests:
+            self.generate_guests()
+        elapsed = time.monotonic() - started
+        total = sum(self.counts.values())
+        logger.info(
+            f"{total} rows in {elapsed:.1f}s | {total / elapsed:.0f} rows/s | "
+            + ", ".join(f"{table}: {count}" for table, count in self.counts.items())
+        )
+
+    def write(self, model, field_names, rows) -> None:
+        if not rows:
+            return
+        fields = [model._meta.get_field(name) for name in field_names]
+        table = connection.ops.quote_name(model._meta.db_table)
+        columns = ", ".join(connection.ops.quote_name(field.column) for field in fields)
+        # One transaction per batch, SQLite would otherwise commit every row
+        with transaction.atomic(), connection.cursor() as cursor:
+            if self.copy:
+                with cursor.copy(f"COPY {table} ({columns}) FROM STDIN") as copy:
+                    for row in rows:
+                        copy.write_row(row)
+            else:
+                placeholders = ", ".join(["%s"] * len(fields))
+                cursor.executemany(
+                    f"INSERT INTO {table} ({columns}) VALUES ({placeholders})",
+                    [
+                        [
+                            field.get_db_prep_save(value, connection)
+                            for field, value in zip(fields, row)
+                        ]
+                        for row in rows
+                    ],
+                )
+        table_name = model._meta.db_table
+        self.counts[table_name] = self.counts.get(table_name, 0) + len(rows)
+
+    def report(self, phase: str, rows: int, started: float) -> None:
+        elapsed = time.monotonic() - started
+        logger.info(
+            f"{phase}: {rows} rows in {elapsed:.1f}s | {rows / elapsed:.0f} rows/s"
+        )
+
+    def generate_users(self) -> None:
+        started = time.monotonic()
+        # Hashed once, every synthetic user logs in with PASSWORD
+        password = make_password(PASSWORD, salt=f"synthetic{self.seed}")
+        fields = [
+            "id",
+            "first_name",
+            "last_name",
+            "email",
+            "password",
+            "terms_agreement",
+            "is_email_verified",
+            "is_staff",
+            "is_superuser",
+            "is_active",
+            "created_at",
+            "updated_at",
+        ]
+        rows = []
+        for i in range(self.users):
+            created_at = self.now - self.ago(365)
+            rows.append(
+                (
+                    self.uid("user", i),
+                    self.rng.choice(FIRST_NAMES),
+                    self.rng.choice(LAST_NAMES),
+                    f"user{i}.seed{self.seed}@example.com",
+                    password,
+                    True,
+                    True,
+                    False,
+                    False,
+                    True,
+                    created_at,
+                    created_at,
+                )
+            )
+            if len(rows) >= self.batch_size:
+                self.write(User, fields, rows)
+                rows = []
+        self.write(User, fields, rows)
+        self.report("Users", self.users, started)
+
+    def pick_bidders(self, count: int, auctioneer: int) -> list:
+        bidders = set()
+        attempts = 0
+        while len(bidders) < count and attempts < count * 4:
+            attempts += 1
+            bidder = self.skewed(self.users)
+            if bidder != auctioneer:
+                bidders.add(bidder)
+        # Hot listings run out of distinct power bidders, the rest are anyone
+        while len(bidders) < count:
+            bidder = self.rng.randrange(self.users)
+            if bidder != auctioneer:
+                bidders.add(bidder)
+        return sorted(bidders)
+
+    def generate_listings(self) -> None:
+        started = time.monotonic()
+        category_ids = list(Category.objects.values_list("id", flat=True)) or [None]
+        listing_fields = [
+            "id",
+            "auctioneer",
+            "name",
+            "slug",
+            "desc",
+            "category",
+            "price",
+            "highest_bid",
+            "bids_count",
+            "closing_date",
+            "active",
+            "created_at",
+            "updated_at",
+        ]
+        bid_fields = ["id", "user", "listing", "amount", "created_at", "updated_at"]
+        max_bids = min(MAX_BIDS_PER_LISTING, self.users // 2)
+        listings, bids = [], []
+        bids_total = 0
+        for i in range(self.listings):
+            listing_id = self.uid("listing", i)
+            auctioneer = self.skewed(self.users)
+            name, desc = listing_text(self.rng)
+            created_at = self.now - self.ago(90)
+            closing_date = self.now + timedelta(days=self.rng.uniform(-30, 60))
+            price = Decimal(max(1, round(self.rng.lognormvariate(4.5, 1), 2))).quantize(
+                Decimal("0.01")
+            )
+
+            # Rounded at random so the mean stays bids_per_listing
+            expected = self.bids_per_listing * self.hotness(i, self.listings)
+            count = min(int(expected + self.rng.random()), max_bids)
+            step = max(Decimal("1.00"), (price / 20).quantize(Decimal("0.01")))
+            bid_window = max(
+                (min(closing_date, self.now) - created_at).total_seconds(), 1
+            )
+            amount = price
+            for j, bidder in enumerate(self.pick_bidders(count, auctioneer)):
+                amount += step
+                bid_at = created_at + timedelta(
+                    seconds=bid_window * (j + 1) / (count + 1)
+                )
+                bids.append(
+                    (
+                        self.uid("bid", i, j),
+                        self.uid("user", bidder),
+                        listing_id,
+                        amount,
+                        bid_at,
+                        bid_at,
+                    )
+                )
+            bids_total += count
+
+            listings.append(
+                (
+                    listing_id,
+                    self.uid("user", auctioneer),
+                    name,
+                    f"{slugify(name)}-{self.seed}-{i}",
+                    desc,
+                    self.rng.choice(category_ids),
+                    price,
+                    amount if count else Decimal("0.00"),
+                    count,
+                    closing_date,
+                    # Past closing dates were closed by the auction scheduler
+                    closing_date > self.now,
+                    created_at,
+                    created_at,
+                )
+            )
+            # Listings go first, their bids reference them
+            if len(listings) >= self.batch_size or len(bids) >= self.batch_size:
+                self.write(Listing, listing_fields, listings)
+                self.write(Bid, bid_fields, bids)
+                listings, bids = [], []
+        self.write(Listing, listing_fields, listings)
+        self.write(Bid, bid_fields, bids)
+        self.report("Listings and bids", self.listings + bids_total, started)
+
+    def generate_guests(self) -> None:
+        started = time.monotonic()
+        guest_fields = ["id", "created_at", "updated_at"]
+        watchlist_fields = ["id", "guest", "listing", "created_at", "updated_at"]
+        guests, watchlists = [], []
+        watchlists_total = 0
+        for g in range(self.guests):
+            guest_id = self.uid("guest", g)
+            created_at = self.now - self.ago(30)
+            guests.append((guest_id, created_at, created_at))
+            if self.listings:
+                count = round(self.rng.expovariate(1 / self.watchlists_per_guest))
+                watched = {self.skewed(self.listings) for _ in range(count)}
+                for listing in sorted(watched):
+                    watchlists.append(
+                        (
+                            self.uid("watchlist", g, listing),
+                            guest_id,
+                            self.uid("listing", listing),
+                            created_at,
+                            created_at,
+                        )
+                    )
+                watchlists_total += len(watched)
+            if len(guests) >= self.batch_size or len(watchlists) >= self.batch_size:
+                self.write(GuestUser, guest_fields, guests)
+                self.write(WatchList, watchlist_fields, watchlists)
+                guests, watchlists = [], []
+        self.write(GuestUser, guest_fields, guests)
+        self.write(WatchList, watchlist_fields, watchlists)
+        self.report("Guests and watchlists", self.guests + watchlists_total, started)
@@ -22,14 +22,15 @@ class CreateData(object):
     def __init__(self) -> None:
         pass
 
-    async def initialize(self) -> None:
+    async def initialize(self, listings: bool = True) -> None:
         await self.create_superuser()
         auctioneer = await self.create_auctioneer()
         reviewer = await self.create_reviewer()
         await self.create_sitedetail()
         await self.create_reviews(reviewer.id)
         category_ids = await self.create_categories()
-        await self.create_listings(category_ids, auctioneer.id)
+        if listings:
+            await self.create_listings(category_ids, auctioneer.id)
 
     async def create_superuser(self) -> User:
         superuser = await User.objects.get_or_none(email=settings.FIRST_SUPERUSER_EMAIL)
@@ -1,4 +1,5 @@
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
+from .data_generator import SyntheticData
 from .data_script import CreateData
 import logging, asyncio
 
@@ -6,13 +7,51 @@ logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 
-async def init() -> None:
+async def init(listings: bool = True) -> None:
     create_data = CreateData()
-    await create_data.initialize()
+    await create_data.initialize(listings=listings)
 
 
 class Command(BaseCommand):
+    help = (
+        "Creates the initial data, or synthetic data at scale with --users/--listings"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=0)
+        parser.add_argument("--listings", type=int, default=0)
+        parser.add_argument("--bids-per-listing", type=float, default=5)
+        parser.add_argument(
+            "--guests", type=int, help="Guests with watchlists, defaults to users / 10"
+        )
+        parser.add_argument("--watchlists-per-guest", type=float, default=3)
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--batch-size", type=int, default=10000)
+
     def handle(self, **options) -> None:
+        synthetic_data = None
+        # Every option is checked before anything is written
+        if options["users"] or options["listings"]:
+            if options["listings"] and not options["users"]:
+                raise CommandError("--listings needs --users to auction and bid")
+            guests = options["guests"]
+            synthetic_data = SyntheticData(
+                users=options["users"],
+                listings=options["listings"],
+                bids_per_listing=options["bids_per_listing"],
+                guests=options["users"] // 10 if guests is None else guests,
+                watchlists_per_guest=options["watchlists_per_guest"],
+                seed=options["seed"],
+                batch_size=options["batch_size"],
+            )
+            try:
+                synthetic_data.check()
+            except ValueError as e:
+                raise CommandError(str(e))
+
         logger.info("Creating initial data")
-        asyncio.run(init())
+        # The sample listings upload their images to Cloudinary, synthetic ones have none
+        asyncio.run(init(listings=not synthetic_data))
+        if synthetic_data:
+            synthetic_data.generate()
         logger.info("Initial data created")
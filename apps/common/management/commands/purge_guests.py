@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from apps.common.models import GuestUser
+from datetime import timedelta
+import logging
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = (
+        "Deletes guests without watchlist writes for --days, along with their "
+        "watchlists, in batches"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--days", type=int, default=90)
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, **options) -> None:
+        before = timezone.now() - timedelta(days=options["days"])
+        purged = 0
+        while True:
+            # Short transactions, so guests writing meanwhile are never blocked long
+            deleted = GuestUser.objects.purge_dormant(
+                before, batch_size=options["batch_size"]
+            )
+            purged += deleted
+            if deleted < options["batch_size"]:
+                break
+        logger.info(f"Purged {purged} guests dormant since {before:%Y-%m-%d}")
@@ -1,4 +1,5 @@
-from django.db import models
+from django.db import models, transaction
+from asgiref.sync import sync_to_async
 
 
 class GetOrNoneQuerySet(models.QuerySet):
@@ -19,3 +20,36 @@ class GetOrNoneManager(models.Manager):
 
     async def get_or_none(self, **kwargs):
         return await self.get_queryset().get_or_none(**kwargs)
+
+
+class GuestUserManager(GetOrNoneManager):
+    """Writes guest rows as watchlists change, and purges dormant ones"""
+
+    def touch(self, guest_id):
+        """Creates the guest's row, or marks it active again"""
+        self.bulk_create(
+            [self.model(id=guest_id)],
+            update_conflicts=True,
+            unique_fields=["id"],
+            update_fields=["updated_at"],
+        )
+
+    async def atouch(self, guest_id):
+        return await sync_to_async(self.touch)(guest_id)
+
+    def purge_dormant(self, before, batch_size: int = 1000):
+        """
+        Deletes one batch of guests without watchlist writes since before,
+        along with their watchlists, and returns how many it deleted.
+        """
+        ids = list(
+            self.filter(updated_at__lt=before)
+            .order_by("updated_at")
+            .values_list("id", flat=True)[:batch_size]
+        )
+        if not ids:
+            return 0
+        # Guests active again since they were picked are kept
+        with transaction.atomic():
+            _, deleted = self.filter(id__in=ids, updated_at__lt=before).delete()
+        return deleted.get(self.model._meta.label, 0)
@@ -0,0 +1,210 @@
+from django.conf import settings
+from django.http import HttpResponse
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+from apps.common.middleware import count_queries
+import os, time
+
+# With PROMETHEUS_MULTIPROC_DIR set (see gunicorn.conf.py) every worker writes
+# its metrics to files in that directory and /metrics sums up all of them.
+# It must be set before prometheus_client is first imported.
+
+REQUESTS = Counter(
+    "bidout_requests_total", "Requests served", ["route", "method", "status"]
+)
+REQUEST_LATENCY = Histogram(
+    "bidout_request_duration_seconds",
+    "Time to produce a response",
+    ["route", "method"],
+)
+RESPONSE_SIZE = Histogram(
+    "bidout_response_size_bytes",
+    "Size of response bodies, streams excluded",
+    ["route", "method"],
+    buckets=(256, 1024, 4096, 16384, 65536, 262144, 1048576),
+)
+REQUEST_ERRORS = Counter(
+    "bidout_request_errors_total",
+    "RequestErrors raised by views, by status code",
+    ["route", "status"],
+)
+DB_QUERIES = Counter("bidout_db_queries_total", "Queries run by requests", ["route"])
+DB_TIME = Histogram(
+    "bidout_db_duration_seconds",
+    "Time a request spent in the database",
+    ["route"],
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1),
+)
+CACHE_LOOKUPS = Counter(
+    "bidout_cache_lookups_total", "Cache lookups by outcome", ["cache", "result"]
+)
+PASSWORD_HASHES_PENDING = Gauge(
+    "bidout_password_hashes_pending",
+    "Password hashes queued or running",
+    multiprocess_mode="livesum",
+)
+STREAM_SUBSCRIBERS = Gauge(
+    "bidout_stream_subscribers",
+    "Open event stream subscriptions",
+    multiprocess_mode="livesum",
+)
+
+
+class QueueCollector:
+    """
+    Depths of the database backed queues. They are shared by every worker,
+    so they are read once per scrape rather than recorded per process.
+    """
+
+    def collect(self):
+        from apps.accounts.emails import Outbox
+        from apps.common.models import GuestUser
+
+        depth = GaugeMetricFamily(
+            "bidout_queue_depth", "Jobs waiting in a background queue", labels=["queue"]
+        )
+        depth.add_metric(["emails"], Outbox.queue_depth())
+        depth.add_metric(
+            ["watchlist_merges"],
+            GuestUser.objects.filter(merge_into__isnull=False).count(),
+        )
+        yield depth
+
+
+class PoolCollector:
+    """
+    Size and wait metrics of the database connection pools. Pools belong to a
+    worker process, so they're labelled with its pid, and a scrape reports the
+    worker serving it.
+    """
+
+    def collect(self):
+        from apps.common.db.pooled_postgresql.base import pool_stats
+
+        labels = ["alias", "pid"]
+        connections = GaugeMetricFamily(
+            "bidout_db_pool_connections",
+            "Pooled connections, open or idle",
+            labels=[*labels, "state"],
+        )
+        waiting = GaugeMetricFamily(
+            "bidout_db_pool_requests_waiting",
+            "Requests waiting for a pooled connection",
+            labels=labels,
+        )
+        requests = CounterMetricFamily(
+            "bidout_db_pool_requests",
+            "Connections requested from the pool",
+            labels=labels,
+        )
+        queued = CounterMetricFamily(
+            "bidout_db_pool_requests_queued",
+            "Connection requests that had to wait",
+            labels=labels,
+        )
+        wait_time = CounterMetricFamily(
+            "bidout_db_pool_wait_seconds",
+            "Time spent waiting for a pooled connection",
+            labels=labels,
+        )
+        errors = CounterMetricFamily(
+            "bidout_db_pool_request_errors",
+            "Connection requests that failed, e.g timed out",
+            labels=labels,
+        )
+        pid = str(os.getpid())
+        for alias, stats in pool_stats().items():
+            connections.add_metric([alias, pid, "open"], stats["pool_size"])
+            connections.add_metric([alias, pid, "idle"], stats["pool_available"])
+            waiting.add_metric([alias, pid], stats["requests_waiting"])
+            # Counters are left out of the stats until they're first incremented
+            requests.add_metric([alias, pid], stats.get("requests_num", 0))
+            queued.add_metric([alias, pid], stats.get("requests_queued", 0))
+            wait_time.add_metric([alias, pid], stats.get("requests_wait_ms", 0) / 1000)
+            errors.add_metric([alias, pid], stats.get("requests_errors", 0))
+        yield from (connections, waiting, requests, queued, wait_time, errors)
+
+
+# Collectors read at scrape time, rather than recorded by each worker
+scrape_registry = CollectorRegistry()
+scrape_registry.register(QueueCollector())
+scrape_registry.register(PoolCollector())
+
+
+def route_label(request):
+    # The URL pattern rather than the path, or every slug would be its own series
+    match = getattr(request, "resolver_match", None)
+    return f"/{match.route}" if match else "unmatched"
+
+
+def metrics_view(request):
+    token = settings.METRICS_TOKEN
+    if token and request.headers.get("Authorization") != f"Bearer {token}":
+        return HttpResponse(status=401)
+    registry = REGISTRY
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    content = generate_latest(registry) + generate_latest(scrape_registry)
+    return HttpResponse(content, content_type=CONTENT_TYPE_LATEST)
+
+
+class MetricsMiddleware:
+    """Records the count, latency, size and DB time of requests by route"""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        # The labelled metrics of each (route, method, status), looking
+        # them up on every request costs more than recording
+        self.children = {}
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        started = time.perf_counter()
+        with count_queries() as queries:
+            response = self.get_response(request)
+        self.observe(request, response, time.perf_counter() - started, queries)
+        return response
+
+    async def __acall__(self, request):
+        started = time.perf_counter()
+        with count_queries() as queries:
+            response = await self.get_response(request)
+        self.observe(request, response, time.perf_counter() - started, queries)
+        return response
+
+    def observe(self, request, response, duration: float, queries):
+        key = (route_label(request), request.method, response.status_code)
+        children = self.children.get(key)
+        if not children:
+            route, method, _ = key
+            children = self.children[key] = (
+                REQUESTS.labels(*key),
+                REQUEST_LATENCY.labels(route, method),
+                RESPONSE_SIZE.labels(route, method),
+                DB_QUERIES.labels(route),
+                DB_TIME.labels(route),
+            )
+        requests, latency, size, db_queries, db_time = children
+        requests.inc()
+        latency.observe(duration)
+        if not response.streaming:
+            size.observe(len(response.content))
+        db_queries.inc(queries.count)
+        db_time.observe(queries.duration)
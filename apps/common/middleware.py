@@ -0,0 +1,213 @@
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.core.handlers.exception import convert_exception_to_response
+from django.utils.module_loading import import_string
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+import logging, time
+
+logger = logging.getLogger(__name__)
+
+# The same query shape run this many times in one request is an N+1 suspect
+N_PLUS_ONE_THRESHOLD = 3
+# Length of the SQL shown for each suspect
+SHAPE_PREVIEW_LENGTH = 120
+
+# The QueryCounter of the running request. sync_to_async copies it into the
+# thread running the ORM calls, where count_query records into it.
+current_counter = ContextVar("current_counter", default=None)
+
+
+class QueryCounter:
+    """
+    Counts the queries and DB time of a block of code. Queries are grouped by
+    their SQL before parameters are bound, so a query repeated for every row
+    shows up as one shape with a high count. Nested counters also record
+    into the counters around them.
+    """
+
+    def __init__(self, parent=None):
+        self.parent = parent
+        self.count = 0
+        self.duration = 0.0
+        self.shapes = Counter()
+
+    def record(self, sql: str, duration: float):
+        counter = self
+        while counter:
+            counter.count += 1
+            counter.duration += duration
+            counter.shapes[sql] += 1
+            counter = counter.parent
+
+    def suspects(self):
+        return [
+            (sql, count)
+            for sql, count in self.shapes.most_common()
+            if count >= N_PLUS_ONE_THRESHOLD
+        ]
+
+    def summary(self):
+        return "; ".join(
+            f"{count}x {sql[:SHAPE_PREVIEW_LENGTH]}" for sql, count in self.suspects()
+        )
+
+
+def count_query(execute, sql, params, many, context):
+    counter = current_counter.get()
+    if counter is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        counter.record(sql, time.perf_counter() - started)
+
+
+def install_query_counter(sender, connection, **kwargs):
+    # connection_created fires on every (re)connect of the same wrapper
+    if count_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(count_query)
+
+
+@contextmanager
+def count_queries():
+    counter = QueryCounter(current_counter.get())
+    token = current_counter.set(counter)
+    try:
+        yield counter
+    finally:
+        current_counter.reset(token)
+
+
+class QueryCountMiddleware:
+    """
+    Counts the queries and DB time of every request. With DEBUG they are sent
+    back as X-DB-* response headers, otherwise only N+1 suspects are logged.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        with count_queries() as counter:
+            response = self.get_response(request)
+        return self.report(request, response, counter)
+
+    async def __acall__(self, request):
+        with count_queries() as counter:
+            response = await self.get_response(request)
+        return self.report(request, response, counter)
+
+    def report(self, request, response, counter: QueryCounter):
+        if settings.DEBUG:
+            response["X-DB-Query-Count"] = counter.count
+            response["X-DB-Time"] = f"{counter.duration * 1000:.1f}ms"
+            if counter.suspects():
+                response["X-DB-N-Plus-One"] = counter.summary()
+        elif counter.suspects():
+            logger.warning(
+                f"N+1 suspects in {request.method} {request.path} "
+                f"({counter.count} queries, {counter.duration * 1000:.1f}ms): "
+                f"{counter.summary()}"
+            )
+        return response
+
+
+class PathDispatchMiddleware:
+    """
+    Runs the FULL_STACK_MIDDLEWARE (sessions, CSRF, auth, messages...) for every
+    path except those under MINIMAL_STACK_PREFIXES. The API authenticates with
+    headers, so its requests skip them and the thread hops their sync hooks
+    cost under ASGI.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        self.prefixes = tuple(settings.MINIMAL_STACK_PREFIXES)
+        self.view_middleware = []
+        self.template_response_middleware = []
+        self.exception_middleware = []
+
+        # Built the way Django builds MIDDLEWARE, hooks are run by this class
+        handler = get_response
+        for middleware_path in reversed(settings.FULL_STACK_MIDDLEWARE):
+            middleware = import_string(middleware_path)
+            if not getattr(middleware, "sync_capable", True) or not getattr(
+                middleware, "async_capable", False
+            ):
+                raise ImproperlyConfigured(
+                    f"{middleware_path} in FULL_STACK_MIDDLEWARE must be both "
+                    "sync and async capable."
+                )
+            instance = middleware(handler)
+            if hasattr(instance, "process_view"):
+                self.view_middleware.insert(0, instance.process_view)
+            if hasattr(instance, "process_template_response"):
+                self.template_response_middleware.append(
+                    instance.process_template_response
+                )
+            if hasattr(instance, "process_exception"):
+                self.exception_middleware.append(instance.process_exception)
+            handler = convert_exception_to_response(instance)
+        self.full_stack = handler
+
+        # Django looks the hooks up on the instance and calls them in the mode of
+        # the handler, async ones avoid a thread hop on the minimal stack
+        if self.view_middleware:
+            self.process_view = self.run_hooks(self.view_middleware)
+        if self.exception_middleware:
+            self.process_exception = self.run_hooks(self.exception_middleware)
+        if self.template_response_middleware:
+            self.process_template_response = self.run_template_response_hooks
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def is_minimal(self, request):
+        return request.path_info.startswith(self.prefixes)
+
+    def __call__(self, request):
+        if self.is_minimal(request):
+            return self.get_response(request)
+        return self.full_stack(request)
+
+    def run_hooks(self, hooks):
+        # The first hook returning a response wins, like in Django's handler
+        def run(request, *args):
+            if self.is_minimal(request):
+                return None
+            for hook in hooks:
+                response = hook(request, *args)
+                if response:
+                    return response
+            return None
+
+        if not self.is_async:
+            return run
+
+        async def arun(request, *args):
+            if self.is_minimal(request):
+                return None
+            return await sync_to_async(run)(request, *args)
+
+        return arun
+
+    def run_template_response_hooks(self, request, response):
+        if self.is_minimal(request):
+            return response
+        for hook in self.template_response_middleware:
+            response = hook(request, response)
+        return response
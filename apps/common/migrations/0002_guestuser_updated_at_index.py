@@ -0,0 +1,19 @@
+# Generated by Django 4.2.2 on 2026-10-17 03:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("common", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="guestuser",
+            index=models.Index(
+                fields=["updated_at"], name="common_gues_updated_19aa7c_idx"
+            ),
+        ),
+    ]
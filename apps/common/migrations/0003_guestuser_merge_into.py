@@ -0,0 +1,27 @@
+# Generated by Django 4.2.2 on 2026-10-17 03:58
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ("common", "0002_guestuser_updated_at_index"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="guestuser",
+            name="merge_into",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="+",
+                to=settings.AUTH_USER_MODEL,
+            ),
+        ),
+    ]
@@ -1,7 +1,8 @@
 import uuid
 
+from django.conf import settings
 from django.db import models
-from .managers import GetOrNoneManager
+from .managers import GetOrNoneManager, GuestUserManager
 
 
 class BaseModel(models.Model):
@@ -30,6 +31,26 @@ class File(BaseModel):
 
 
 class GuestUser(BaseModel):
+    """
+    Storage of a guest's watchlist. Guests authenticate with a signed token
+    (GuestToken), the row is only written along with their watchlist entries
+    and its updated_at tells dormant guests apart.
+    """
+
+    # Set by logins that defer merging the watchlist into this user's
+    merge_into = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        related_name="+",
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+    )
+
+    objects = GuestUserManager()
+
+    class Meta:
+        indexes = [models.Index(fields=["updated_at"])]
+
     def __str__(self):
         return str(self.id)
 
@@ -0,0 +1,106 @@
+from django.db.models import Q
+from asgiref.sync import sync_to_async
+from apps.common.exceptions import RequestError
+from datetime import datetime
+import base64
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 100
+DEFAULT_ORDERING = ("-created_at", "-id")
+
+
+class CursorPaginator:
+    """
+    Keyset pagination over an ordering that ends in a unique field,
+    (created_at, id) newest first by default.
+    The cursor is an opaque token holding the ordering values of the last item
+    of the previous page, so every page is a single bounded LIMIT query
+    no matter how deep the client goes.
+    """
+
+    def encode_cursor(obj, ordering=DEFAULT_ORDERING):
+        values = []
+        for field in ordering:
+            value = getattr(obj, field.lstrip("-"))
+            values.append(
+                value.isoformat() if isinstance(value, datetime) else str(value)
+            )
+        return base64.urlsafe_b64encode("|".join(values).encode()).decode()
+
+    def decode_cursor(cursor: str, model, ordering=DEFAULT_ORDERING):
+        try:
+            values = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+            if len(values) != len(ordering):
+                raise ValueError
+            return [
+                model._meta.get_field(field.lstrip("-")).to_python(value)
+                for field, value in zip(ordering, values)
+            ]
+        except Exception:
+            raise RequestError(
+                err_msg="Invalid entry",
+                data={"cursor": "Invalid cursor"},
+                status_code=422,
+            )
+
+    async def paginate(
+        queryset, cursor: str = None, quantity: int = None, ordering=DEFAULT_ORDERING
+    ):
+        limit = min(max(quantity or DEFAULT_PAGE_SIZE, 1), MAX_PAGE_SIZE)
+        queryset = queryset.order_by(*ordering)
+        if cursor:
+            values = CursorPaginator.decode_cursor(cursor, queryset.model, ordering)
+            # Rows after the cursor: (a < x) or (a = x and b < y) or ...
+            after, equal = Q(), Q()
+            for field, value in zip(ordering, values):
+                name = field.lstrip("-")
+                lookup = "lt" if field.startswith("-") else "gt"
+                after |= equal & Q(**{f"{name}__{lookup}": value})
+                equal &= Q(**{name: value})
+            queryset = queryset.filter(after)
+
+        # Fetch one extra row to know whether another page exists
+        items = await sync_to_async(list)(queryset[: limit + 1])
+        has_more = len(items) > limit
+        items = items[:limit]
+        next_cursor = (
+            CursorPaginator.encode_cursor(items[-1], ordering) if has_more else None
+        )
+        return {"items": items, "next_cursor": next_cursor, "has_more": has_more}
+
+
+class OffsetPaginator:
+    """
+    Offset pagination for orderings a keyset can't follow, e.g search rank.
+    Uses the same opaque cursor and page shape as CursorPaginator.
+    """
+
+    def encode_cursor(offset: int):
+        return base64.urlsafe_b64encode(f"offset|{offset}".encode()).decode()
+
+    def decode_cursor(cursor: str):
+        try:
+            value = base64.urlsafe_b64decode(cursor.encode()).decode()
+            prefix, offset = value.split("|")
+            offset = int(offset)
+            if prefix != "offset" or offset < 0:
+                raise ValueError
+            return offset
+        except Exception:
+            raise RequestError(
+                err_msg="Invalid entry",
+                data={"cursor": "Invalid cursor"},
+                status_code=422,
+            )
+
+    async def paginate(queryset, cursor: str = None, quantity: int = None):
+        limit = min(max(quantity or DEFAULT_PAGE_SIZE, 1), MAX_PAGE_SIZE)
+        offset = OffsetPaginator.decode_cursor(cursor) if cursor else 0
+
+        items = await sync_to_async(list)(queryset[offset : offset + limit + 1])
+        has_more = len(items) > limit
+        items = items[:limit]
+        next_cursor = (
+            OffsetPaginator.encode_cursor(offset + limit) if has_more else None
+        )
+        return {"items": items, "next_cursor": next_cursor, "has_more": has_more}
@@ -0,0 +1,195 @@
+from django.conf import settings
+from django.db import connection
+from django.utils.module_loading import import_string
+from asgiref.sync import sync_to_async
+from apps.common.metrics import STREAM_SUBSCRIBERS
+from contextlib import asynccontextmanager
+from ninja.responses import NinjaJSONEncoder
+import asyncio, json, logging
+
+logger = logging.getLogger(__name__)
+
+# Messages kept for a subscriber that doesn't read fast enough
+MAX_PENDING = 100
+HEARTBEAT_SECONDS = 15
+COALESCE_SECONDS = 0.1
+# EventSource reconnects by itself, a bounded stream also frees subscribers
+# whose client left without the server noticing
+STREAM_MAX_SECONDS = 300
+RETRY_MILLISECONDS = 3000
+RECONNECT_SECONDS = 1
+
+
+class Subscription:
+    """
+    A subscriber of one channel. It holds no task of its own, only the messages
+    published since its last read, so idle subscribers are cheap.
+    """
+
+    def __init__(self, channel: str):
+        self.channel = channel
+        self.pending = []
+        self.dropped = 0
+        self.loop = asyncio.get_running_loop()
+        self.event = asyncio.Event()
+
+    def put(self, message: str):
+        self.pending.append(message)
+        if len(self.pending) > MAX_PENDING:
+            del self.pending[0]
+            self.dropped += 1
+        self.event.set()
+
+    def put_threadsafe(self, message: str):
+        try:
+            running_loop = asyncio.get_running_loop()
+        except RuntimeError:
+            running_loop = None
+        if running_loop is self.loop:
+            self.put(message)
+        else:
+            self.loop.call_soon_threadsafe(self.put, message)
+
+    async def get(self, timeout: float = None, coalesce: float = 0):
+        """
+        Returns every pending message at once, or [] after timeout.
+        With coalesce, waits that long after the first message so a burst
+        is returned together.
+        """
+        try:
+            await asyncio.wait_for(self.event.wait(), timeout)
+        except asyncio.TimeoutError:
+            return []
+        if coalesce:
+            await asyncio.sleep(coalesce)
+        messages, self.pending = self.pending, []
+        self.event.clear()
+        return messages
+
+
+class Broker:
+    """
+    In-process pub/sub. Publishing goes through the PUBSUB_BACKEND, which
+    hands messages back to deliver() in every worker that has subscribers.
+    """
+
+    def __init__(self):
+        self.channels = {}
+        self.backend = None
+
+    def get_backend(self):
+        if not self.backend:
+            self.backend = import_string(settings.PUBSUB_BACKEND)(self)
+        return self.backend
+
+    async def publish(self, channel: str, message):
+        message = json.dumps(message, cls=NinjaJSONEncoder)
+        await self.get_backend().publish(channel, message)
+
+    def deliver(self, channel: str, message: str):
+        for subscription in list(self.channels.get(channel, ())):
+            subscription.put_threadsafe(message)
+
+    @asynccontextmanager
+    async def subscribe(self, channel: str):
+        await self.get_backend().start()
+        subscription = Subscription(channel)
+        self.channels.setdefault(channel, set()).add(subscription)
+        STREAM_SUBSCRIBERS.inc()
+        try:
+            yield subscription
+        finally:
+            STREAM_SUBSCRIBERS.dec()
+            subscribers = self.channels.get(channel, set())
+            subscribers.discard(subscription)
+            if not subscribers:
+                self.channels.pop(channel, None)
+
+    def stats(self):
+        return {
+            "channels": len(self.channels),
+            "subscribers": sum(len(subs) for subs in self.channels.values()),
+        }
+
+
+class LocalBackend:
+    """Delivers in this process only, enough for a single worker"""
+
+    def __init__(self, broker: Broker):
+        self.broker = broker
+
+    async def start(self):
+        pass
+
+    async def publish(self, channel: str, message: str):
+        self.broker.deliver(channel, message)
+
+
+class PostgresBackend:
+    """
+    Relays messages to every worker through PostgreSQL LISTEN/NOTIFY.
+    Each worker holds a single listening connection, however many subscribers it has.
+    """
+
+    PG_CHANNEL = "bidout_events"
+
+    def __init__(self, broker: Broker):
+        self.broker = broker
+        self.listener = None
+
+    async def start(self):
+        if not self.listener or self.listener.done():
+            self.listener = asyncio.create_task(self.listen())
+
+    async def publish(self, channel: str, message: str):
+        await sync_to_async(self.notify)(json.dumps([channel, message]))
+
+    def notify(self, payload: str):
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT pg_notify(%s, %s)", [self.PG_CHANNEL, payload])
+
+    async def listen(self):
+        import psycopg
+
+        db = settings.DATABASES["default"]
+        while True:
+            try:
+                conn = await psycopg.AsyncConnection.connect(
+                    dbname=db["NAME"],
+                    user=db["USER"],
+                    password=db["PASSWORD"],
+                    host=db["HOST"],
+                    port=db["PORT"],
+                    autocommit=True,
+                )
+                async with conn:
+                    await conn.execute(f"LISTEN {self.PG_CHANNEL}")
+                    async for notify in conn.notifies():
+                        channel, message = json.loads(notify.payload)
+                        self.broker.deliver(channel, message)
+            except Exception:
+                logger.exception("Pub/sub listener disconnected, reconnecting")
+                await asyncio.sleep(RECONNECT_SECONDS)
+
+
+broker = Broker()
+
+
+async def event_stream(channel: str, event: str):
+    """
+    Server-Sent Events frames of a channel's messages. Messages published
+    within COALESCE_SECONDS of each other go out as one frame holding a list.
+    """
+    async with broker.subscribe(channel) as subscription:
+        yield f"retry: {RETRY_MILLISECONDS}\n\n"
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + STREAM_MAX_SECONDS
+        while loop.time() < deadline:
+            messages = await subscription.get(
+                timeout=HEARTBEAT_SECONDS, coalesce=COALESCE_SECONDS
+            )
+            if messages:
+                yield f"event: {event}\ndata: [{','.join(messages)}]\n\n"
+            else:
+                # Keeps idle connections open through proxies
+                yield ": ping\n\n"
@@ -0,0 +1,101 @@
+from django.http import HttpResponse, StreamingHttpResponse
+from ninja.renderers import BaseRenderer, JSONRenderer
+from ninja.responses import NinjaJSONEncoder
+
+from enum import Enum
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+class ORJSONRenderer(BaseRenderer):
+    """
+    Renders responses with orjson. Anything it doesn't handle natively (Decimal,
+    pydantic models, datetimes...) goes through the default encoder so the output
+    stays identical to ninja's JSONRenderer.
+    """
+
+    media_type = "application/json"
+
+    def __init__(self):
+        self.encoder = NinjaJSONEncoder()
+
+    def render(self, request, data, *, response_status):
+        return orjson.dumps(
+            data,
+            default=self.encoder.default,
+            option=orjson.OPT_PASSTHROUGH_DATETIME,
+        )
+
+
+# Fall back to the stock renderer when orjson isn't installed
+renderer = ORJSONRenderer() if orjson else JSONRenderer()
+
+
+def trusted_response(schema, data, status: int = 200):
+    """
+    Serializes trusted data with schema.trusted_dict and renders it directly,
+    skipping ninja's response validation.
+    """
+    content = renderer.render(None, schema.trusted_dict(data), response_status=status)
+    return HttpResponse(
+        content,
+        status=status,
+        content_type=f"{renderer.media_type}; charset={renderer.charset}",
+    )
+
+
+class StreamFormat(str, Enum):
+    NDJSON = "ndjson"
+    JSON = "json"
+
+
+STREAM_CONTENT_TYPES = {
+    StreamFormat.NDJSON: "application/x-ndjson",
+    StreamFormat.JSON: "application/json",
+}
+
+
+def streaming_response(
+    schema, items, envelope: dict, format=StreamFormat.NDJSON, batch_size: int = 500
+):
+    """
+    Streams the async iterable items, each serialized with schema.trusted_dict
+    as it comes, so memory stays flat however many there are.
+    NDJSON holds one item per line. JSON is the envelope with the items as
+    its "data" array, the same document a regular response would render.
+    Rendered items are sent batch_size at a time.
+    """
+    is_json = format == StreamFormat.JSON
+
+    def render(data) -> bytes:
+        content = renderer.render(None, data, response_status=200)
+        # The stock renderer returns str
+        return content.encode() if isinstance(content, str) else content
+
+    async def stream():
+        if is_json:
+            # The envelope without its closing brace, then the array
+            yield render(envelope)[:-1] + b', "data": ['
+        batch, count = [], 0
+        async for item in items:
+            content = render(schema.trusted_dict(item))
+            if not is_json:
+                batch.append(content + b"\n")
+            else:
+                batch.append(b", " + content if count else content)
+            count += 1
+            if len(batch) >= batch_size:
+                yield b"".join(batch)
+                batch = []
+        if batch:
+            yield b"".join(batch)
+        if is_json:
+            yield b"]}"
+
+    return StreamingHttpResponse(
+        stream(),
+        content_type=f"{STREAM_CONTENT_TYPES[format]}; charset={renderer.charset}",
+    )
@@ -1,6 +1,54 @@
 from pydantic import BaseModel as BaseModel
+from pydantic.fields import SHAPE_LIST
 
+SCALAR_TYPES = (int, float, str, bool)
+MISSING = object()
 
-class ResponseSchema(BaseModel):
+
+class TrustedSchema(BaseModel):
+    """
+    Schema that can also serialize trusted ORM data without re-validating it.
+    Pre and post validators still run since they shape the output,
+    but type validation is skipped (only plain scalars are coerced).
+    """
+
+    @classmethod
+    def trusted_dict(cls, obj):
+        values = {}
+        for name, field in cls.__fields__.items():
+            if isinstance(obj, dict):
+                value = obj.get(name, MISSING)
+            else:
+                value = getattr(obj, name, MISSING)
+            if value is MISSING:
+                # Like pydantic, missing values only run validators marked always
+                value = field.get_default()
+                if not field.validate_always:
+                    values[name] = value
+                    continue
+            for validator in field.pre_validators or ():
+                value = validator(cls, value, values, field, cls.__config__)
+            if value is not None:
+                value = cls._trusted_value(field, value)
+            for validator in field.post_validators or ():
+                value = validator(cls, value, values, field, cls.__config__)
+            values[name] = value
+        return values
+
+    @staticmethod
+    def _trusted_value(field, value):
+        type_ = field.type_
+        if isinstance(type_, type) and issubclass(type_, TrustedSchema):
+            if field.shape == SHAPE_LIST:
+                return [type_.trusted_dict(item) for item in value]
+            return type_.trusted_dict(value)
+        if isinstance(value, BaseModel):
+            return value.dict()
+        if type_ in SCALAR_TYPES and not isinstance(value, type_):
+            return type_(value)
+        return value
+
+
+class ResponseSchema(TrustedSchema):
     status: str = "success"
     message: str
@@ -1,3 +1,513 @@
-from django.test import TestCase
+from django.apps import apps
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import CommandError, call_command
+from django.core.signing import Signer
+from django.http import HttpResponse
+from django.db import connection
+from django.test import (
+    RequestFactory,
+    TestCase,
+    TransactionTestCase,
+    override_settings,
+)
+from django.test.client import AsyncClient, Client
+from django.utils import timezone
 
-# Create your tests here.
+from apps.common.db.routers import (
+    ReadYourWrites,
+    ReplicaRouter,
+    replica_route,
+    use_replica,
+)
+from apps.common.cache import require_shared_cache
+from apps.common.file_processors import FileProcessor
+from apps.common.management.commands.benchmark_endpoints import regressions
+from apps.common.management.commands.data_generator import SyntheticData
+from apps.common.metrics import REGISTRY
+from apps.common.models import GuestUser
+from apps.common.middleware import QueryCountMiddleware
+from apps.common.pubsub import Broker, LocalBackend
+from apps.common.utils import GuestToken, TestUtil
+from apps.accounts.models import User
+from apps.listings.models import Bid, Listing, WatchList
+from apps.listings.schemas import ListingDataSchema
+from unittest import mock, skipUnless
+from concurrent.futures import ThreadPoolExecutor
+from asgiref.sync import async_to_sync, sync_to_async
+from django.db.models import Count, Max
+from datetime import timedelta
+import asyncio, time, uuid
+
+
+class TestFileProcessor(TestCase):
+    def test_generate_file_url_is_memoized(self):
+        key = uuid.uuid4()
+        with mock.patch(
+            "cloudinary.utils.cloudinary_url", return_value=("https://image.url", {})
+        ) as cloudinary_url:
+            # Verify that the url is built once per file, folder and type
+            for _ in range(3):
+                url = FileProcessor.generate_file_url(
+                    key=key, folder="listings", content_type="image/jpeg"
+                )
+            self.assertEqual(url, "https://image.url")
+            self.assertEqual(cloudinary_url.call_count, 1)
+
+            # Verify that a changed resource type builds a new url
+            FileProcessor.generate_file_url(
+                key=key, folder="listings", content_type="image/png"
+            )
+            self.assertEqual(cloudinary_url.call_count, 2)
+
+    def test_generate_file_url_failures_are_not_memoized(self):
+        key = uuid.uuid4()
+        with mock.patch(
+            "cloudinary.utils.cloudinary_url", side_effect=Exception("Timeout")
+        ):
+            url = FileProcessor.generate_file_url(
+                key=key, folder="listings", content_type="image/jpeg"
+            )
+        self.assertIsNone(url)
+
+        # Verify that the url is built once the failure is over
+        with mock.patch(
+            "cloudinary.utils.cloudinary_url", return_value=("https://image.url", {})
+        ):
+            url = FileProcessor.generate_file_url(
+                key=key, folder="listings", content_type="image/jpeg"
+            )
+        self.assertEqual(url, "https://image.url")
+
+
+class TestTrustedSchema(TestCase):
+    def test_trusted_dict_matches_validated_output(self):
+        listing = TestUtil.create_listing(TestUtil.verified_user())["listing"]
+        listing = Listing.objects.select_related(
+            "auctioneer", "auctioneer__avatar", "category", "image"
+        ).get(id=listing.id)
+        listing.watchlist = False
+
+        # Verify that skipping validation doesn't change the serialized output
+        validated = ListingDataSchema.from_orm(listing).dict()
+        trusted = ListingDataSchema.trusted_dict(listing)
+        validated.pop("time_left_seconds")
+        self.assertIsInstance(trusted.pop("time_left_seconds"), int)
+        self.assertEqual(trusted, validated)
+
+
+class TestPubSub(TestCase):
+    def setUp(self):
+        self.broker = Broker()
+        self.broker.backend = LocalBackend(self.broker)
+
+    async def test_burst_is_coalesced(self):
+        async with self.broker.subscribe("channel") as subscription:
+            # Verify that messages published together are read together
+            for i in range(5):
+                await self.broker.publish("channel", {"amount": i})
+            messages = await subscription.get(timeout=1, coalesce=0.01)
+            self.assertEqual(messages, [f'{{"amount": {i}}}' for i in range(5)])
+
+            # Verify that a read with nothing published times out empty
+            self.assertEqual(await subscription.get(timeout=0.01), [])
+
+        # Verify that the subscription is dropped on exit
+        self.assertEqual(self.broker.stats(), {"channels": 0, "subscribers": 0})
+
+    async def test_idle_subscribers(self):
+        async def subscriber(started):
+            async with self.broker.subscribe("channel") as subscription:
+                started.release()
+                return await subscription.get(timeout=5)
+
+        # Verify that thousands of waiting subscribers all get the message
+        started = asyncio.Semaphore(0)
+        tasks = [asyncio.create_task(subscriber(started)) for _ in range(5000)]
+        for _ in tasks:
+            await started.acquire()
+        self.assertEqual(self.broker.stats()["subscribers"], 5000)
+        await self.broker.publish("channel", "bid")
+        results = await asyncio.gather(*tasks)
+        self.assertTrue(all(messages == ['"bid"'] for messages in results))
+
+
+@override_settings(DATABASE_REPLICAS=["replica_0", "replica_1"])
+class TestReplicaRouter(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.router = ReplicaRouter()
+
+    def test_reads_are_spread_over_healthy_replicas(self):
+        # Verify that reads outside use_replica views and writes use the primary
+        self.assertEqual(self.router.db_for_read(Listing), "default")
+        self.assertEqual(self.router.db_for_write(Listing), "default")
+
+        token = replica_route.set(True)
+        try:
+            with mock.patch.object(ReplicaRouter, "check"):
+                # Verify that replicas are used in turn
+                reads = [self.router.db_for_read(Listing) for _ in range(4)]
+                self.assertEqual(reads, ["replica_0", "replica_1"] * 2)
+
+            def check(router, alias):
+                if alias == "replica_1":
+                    raise ConnectionError
+
+            self.router.checked_at.clear()
+            with mock.patch.object(ReplicaRouter, "check", check):
+                # Verify that a replica failing its health check is skipped
+                reads = [self.router.db_for_read(Listing) for _ in range(4)]
+                self.assertEqual(reads, ["replica_0"] * 4)
+
+            # Verify that the primary is used when no replica is healthy
+            self.router.down_until["replica_0"] = float("inf")
+            self.assertEqual(self.router.db_for_read(Listing), "default")
+        finally:
+            replica_route.reset(token)
+
+    async def test_clients_read_their_writes_from_the_primary(self):
+        @use_replica
+        async def view(request):
+            return replica_route.get()
+
+        request = RequestFactory().get("/", HTTP_AUTHORIZATION="Bearer token")
+        other_request = RequestFactory().get("/", HTTP_AUTHORIZATION="Bearer other")
+        self.assertTrue(await view(request))
+
+        # Verify that only the client that wrote is kept on the primary
+        await ReadYourWrites.pin(request)
+        self.assertFalse(await view(request))
+        self.assertTrue(await view(other_request))
+
+        # Verify that views stay on the primary without replicas
+        with self.settings(DATABASE_REPLICAS=[]):
+            self.assertFalse(await view(other_request))
+
+
+class TestQueryCountMiddleware(TestCase):
+    def setUp(self):
+        self.listing = TestUtil.create_listing(TestUtil.verified_user())["listing"]
+
+    def get_response(self, request):
+        # One query per listing name, the usual shape of an N+1
+        for _ in range(3):
+            Listing.objects.filter(id=self.listing.id).values("name").get()
+        return HttpResponse()
+
+    @override_settings(DEBUG=True)
+    def test_counts_are_sent_as_headers_in_debug(self):
+        middleware = QueryCountMiddleware(self.get_response)
+        response = middleware(RequestFactory().get("/"))
+        self.assertEqual(response["X-DB-Query-Count"], "3")
+        self.assertTrue(response["X-DB-Time"].endswith("ms"))
+        self.assertTrue(response["X-DB-N-Plus-One"].startswith("3x SELECT"))
+
+    def test_n_plus_one_is_logged_in_production(self):
+        middleware = QueryCountMiddleware(self.get_response)
+        with self.assertLogs("apps.common.middleware", "WARNING") as logs:
+            response = middleware(RequestFactory().get("/"))
+        self.assertNotIn("X-DB-Query-Count", response)
+        self.assertIn("N+1 suspects in GET /", logs.output[0])
+
+        # Verify that the counts of an async request are kept across threads
+        async def get_response(request):
+            await sync_to_async(self.get_response)(request)
+            return HttpResponse()
+
+        middleware = QueryCountMiddleware(get_response)
+        with self.assertLogs("apps.common.middleware", "WARNING") as logs:
+            async_to_sync(middleware)(RequestFactory().get("/"))
+        self.assertIn("(3 queries", logs.output[0])
+
+
+class TestMetrics(TestCase):
+    metrics_url = "/metrics"
+    listings_url = "/api/v5/listings/"
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.listing = TestUtil.create_listing(TestUtil.verified_user())["listing"]
+
+    def sample(self, name, **labels):
+        return REGISTRY.get_sample_value(name, labels) or 0
+
+    @override_settings(RESPONSE_CACHE=True)
+    def test_requests_are_counted_by_route(self):
+        route = "/api/v5/listings/detail/<slug>/"
+        requests = self.sample(
+            "bidout_requests_total", route=route, method="GET", status="200"
+        )
+        errors = self.sample("bidout_request_errors_total", route=route, status="404")
+        queries = self.sample("bidout_db_queries_total", route=route)
+
+        self.client.get(f"{self.listings_url}detail/{self.listing.slug}/")
+        self.client.get(f"{self.listings_url}detail/invalid_slug/")
+
+        # Verify that both slugs count towards the same route
+        self.assertEqual(
+            self.sample(
+                "bidout_requests_total", route=route, method="GET", status="200"
+            ),
+            requests + 1,
+        )
+        self.assertEqual(
+            self.sample("bidout_request_errors_total", route=route, status="404"),
+            errors + 1,
+        )
+        self.assertGreater(self.sample("bidout_db_queries_total", route=route), queries)
+
+        # Verify that the latency, size, cache and queue metrics are exposed
+        response = self.client.get(self.metrics_url)
+        self.assertEqual(response.status_code, 200)
+        content = response.content.decode()
+        for line in (
+            f'bidout_request_duration_seconds_count{{method="GET",route="{route}"}}',
+            f'bidout_response_size_bytes_count{{method="GET",route="{route}"}}',
+            'bidout_cache_lookups_total{cache="response",result="miss"}',
+            'bidout_queue_depth{queue="emails"} 0.0',
+        ):
+            self.assertIn(line, content)
+
+    @override_settings(METRICS_TOKEN="secret")
+    def test_metrics_token(self):
+        response = self.client.get(self.metrics_url)
+        self.assertEqual(response.status_code, 401)
+        response = self.client.get(self.metrics_url, HTTP_AUTHORIZATION="Bearer secret")
+        self.assertEqual(response.status_code, 200)
+
+
+class TestPathDispatchMiddleware(TestCase):
+    admin_url = "/admin/"
+    healthcheck_url = "/api/v5/healthcheck/"
+
+    def setUp(self):
+        self.user = TestUtil.verified_user()
+        self.user.is_staff = self.user.is_superuser = True
+        self.user.save()
+
+    async def test_full_stack_runs_for_the_admin_only(self):
+        client = AsyncClient(enforce_csrf_checks=True)
+
+        # Verify that the admin gets sessions, auth, CSRF and frame options
+        await sync_to_async(client.force_login)(self.user)
+        response = await client.get(self.admin_url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["X-Frame-Options"], "DENY")
+        response = await client.post(f"{self.admin_url}logout/")
+        self.assertEqual(response.status_code, 403)
+
+        # Verify that the API skips them
+        response = await client.get(self.healthcheck_url)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn("X-Frame-Options", response)
+        self.assertNotIn("Cookie", response.get("Vary", ""))
+
+    def test_full_stack_in_sync_mode(self):
+        client = Client()
+        client.force_login(self.user)
+        response = client.get(self.admin_url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["X-Frame-Options"], "DENY")
+        response = client.get(self.healthcheck_url)
+        self.assertNotIn("X-Frame-Options", response)
+
+
+class TestSyntheticData(TestCase):
+    def generate(self, seed):
+        synthetic_data = SyntheticData(
+            users=50,
+            listings=40,
+            bids_per_listing=4,
+            guests=10,
+            watchlists_per_guest=2,
+            seed=seed,
+            batch_size=16,
+        )
+        synthetic_data.generate()
+        return synthetic_data
+
+    def test_rows_are_consistent_and_deterministic(self):
+        synthetic_data = self.generate(seed=1)
+        self.assertEqual(User.objects.count(), 50)
+        self.assertEqual(Listing.objects.count(), 40)
+        self.assertEqual(Bid.objects.count(), synthetic_data.counts["listings_bid"])
+        self.assertGreater(WatchList.objects.filter(guest__isnull=False).count(), 0)
+
+        # Verify that listings hold the count and highest amount of their bids
+        for listing in Listing.objects.annotate(
+            bids_total=Count("bids"), bids_max=Max("bids__amount")
+        ):
+            self.assertEqual(listing.bids_count, listing.bids_total)
+            self.assertEqual(listing.highest_bid, listing.bids_max or 0)
+
+        # Verify that the hot listings drew the most bids
+        bids_counts = [
+            Listing.objects.get(id=synthetic_data.uid("listing", i)).bids_count
+            for i in range(40)
+        ]
+        self.assertGreater(sum(bids_counts[:4]), sum(bids_counts[-4:]))
+
+        # Verify that the same seed generates the same rows again
+        rows = list(Bid.objects.order_by("id").values_list("id", "user", "amount"))
+        Bid.objects.all().delete()
+        WatchList.objects.all().delete()
+        Listing.objects.all().delete()
+        User.objects.all().delete()
+        GuestUser.objects.all().delete()
+        self.generate(seed=1)
+        self.assertEqual(
+            list(Bid.objects.order_by("id").values_list("id", "user", "amount")),
+            rows,
+        )
+        with self.assertRaises(ValueError):
+            self.generate(seed=1)
+
+    def test_invalid_options_write_nothing(self):
+        # Verify that options are rejected before the initial data is created
+        for options in ({"listings": 10}, {"users": 10, "batch_size": 0}):
+            with self.assertRaises(CommandError):
+                call_command("initial_data", **options)
+        self.assertFalse(User.objects.exists())
+
+
+class TestSharedCache(TestCase):
+    def test_process_local_cache_is_refused(self):
+        # Verify that features shared by workers refuse a per-process cache
+        with self.assertRaises(ImproperlyConfigured):
+            require_shared_cache("RESPONSE_CACHE")
+        with override_settings(
+            CACHES={
+                "default": {
+                    "BACKEND": "django.core.cache.backends.redis.RedisCache",
+                    "LOCATION": "redis://127.0.0.1:6379",
+                }
+            }
+        ):
+            require_shared_cache("RESPONSE_CACHE")
+
+        # Verify that replicas aren't used without a shared cache for the pins
+        with override_settings(DATABASE_REPLICAS=["replica_0"]):
+            with self.assertRaises(ImproperlyConfigured):
+                apps.get_app_config("common").ready()
+
+
+class TestBenchmarkEndpoints(TestCase):
+    def test_regressions_over_the_threshold(self):
+        metrics = {
+            "p50_ms": 10.5,
+            "p95_ms": 20.5,
+            "queries": 2,
+            "alloc_kb": 100,
+            "bytes": 500,
+        }
+        baseline = {"1000": {"listings.list": metrics}}
+        results = {
+            "1000": {
+                "listings.list": {
+                    **metrics,
+                    # Within the threshold
+                    "bytes": 550,
+                    # Over it, but by less than the minimum difference
+                    "alloc_kb": 110,
+                    # Not gated
+                    "p95_ms": 40.5,
+                    "queries": 3,
+                    "p50_ms": 15.5,
+                },
+                "listings.search": metrics,
+            }
+        }
+        self.assertEqual(
+            regressions(results, baseline, threshold=0.2),
+            [
+                "1000 listings.list p50_ms: 10.5 -> 15.5",
+                "1000 listings.list queries: 2 -> 3",
+            ],
+        )
+
+    def test_missing_baseline_fails(self):
+        with mock.patch.object(connection.creation, "create_test_db") as create:
+            with self.assertRaisesMessage(CommandError, "No baseline at missing.json"):
+                call_command("benchmark_endpoints", baseline="missing.json")
+        # Before seeding anything
+        create.assert_not_called()
+
+
+class TestGuestUsers(TestCase):
+    def test_guest_tokens_are_signed(self):
+        guest_id = uuid.uuid4()
+        token = GuestToken.create(guest_id)
+        self.assertEqual(GuestToken.decode(token), guest_id)
+        # Verify that forged and bare ids are rejected
+        self.assertIsNone(GuestToken.decode(f"{uuid.uuid4()}:{token.split(':')[1]}"))
+        self.assertIsNone(GuestToken.decode(str(guest_id)))
+        self.assertIsNone(GuestToken.decode(Signer().sign(str(guest_id))))
+
+    def test_dormant_guests_are_purged(self):
+        listing = TestUtil.create_listing(TestUtil.verified_user())["listing"]
+        guests = [GuestUser.objects.create() for _ in range(4)]
+        for guest in guests:
+            WatchList.objects.create(guest=guest, listing=listing)
+        GuestUser.objects.filter(id__in=[guest.id for guest in guests[:3]]).update(
+            updated_at=timezone.now() - timedelta(days=91)
+        )
+        # A watchlist write marks a guest active again
+        GuestUser.objects.touch(guests[0].id)
+
+        call_command("purge_guests", batch_size=1)
+        self.assertEqual(
+            set(GuestUser.objects.values_list("id", flat=True)),
+            {guests[0].id, guests[3].id},
+        )
+        self.assertEqual(
+            set(WatchList.objects.values_list("guest_id", flat=True)),
+            {guests[0].id, guests[3].id},
+        )
+
+
+@skipUnless(
+    connection.vendor == "postgresql"
+    and connection.settings_dict["OPTIONS"].get("pool"),
+    "Pooled PostgreSQL backend",
+)
+class TestConnectionPool(TransactionTestCase):
+    lock_id = 4242
+
+    def test_connections_are_reset_and_bounded(self):
+        pool = connection.pool
+
+        def checkout():
+            try:
+                with connection.cursor() as cursor:
+                    cursor.execute("SELECT pg_try_advisory_lock(%s)", [self.lock_id])
+                    time.sleep(0.05)
+            finally:
+                # Back to the pool, with the lock still held by the session
+                connection.close()
+
+        # Verify that more threads than connections stay within the pool's bounds
+        with ThreadPoolExecutor(max_workers=pool.max_size * 2) as executor:
+            for future in [executor.submit(checkout) for _ in range(pool.max_size * 4)]:
+                future.result()
+        stats = pool.get_stats()
+        self.assertLessEqual(stats["pool_size"], pool.max_size)
+        self.assertEqual(stats["requests_waiting"], 0)
+        # Every connection is back, but the one this thread may hold
+        held = 1 if connection.connection else 0
+        self.assertEqual(stats["pool_available"], stats["pool_size"] - held)
+
+        # Verify that returned connections gave their session locks up
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT count(*) FROM pg_locks WHERE locktype = 'advisory' "
+                "AND classid = 0 AND objid = %s",
+                [self.lock_id],
+            )
+            self.assertEqual(cursor.fetchone()[0], 0)
+
+        # Verify that the pool metrics are exposed
+        content = Client().get("/metrics").content.decode()
+        self.assertIn('bidout_db_pool_connections{alias="default"', content)
+        self.assertIn('bidout_db_pool_wait_seconds_total{alias="default"', content)
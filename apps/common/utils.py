@@ -1,3 +1,4 @@
+from django.core.signing import BadSignature, Signer
 from django.utils import timezone
 from ninja.security import HttpBearer, APIKeyHeader
 from apps.accounts.auth import Authentication
@@ -5,9 +6,11 @@ from apps.accounts.models import User, Jwt
 from apps.listings.models import Category, Listing
 from apps.common.models import File, GuestUser
 from apps.common.exceptions import RequestError
+from apps.common.middleware import count_queries
 
+from contextlib import contextmanager
 from datetime import timedelta
-from uuid import UUID
+from uuid import UUID, uuid4
 
 
 class AuthUser(HttpBearer):
@@ -23,12 +26,39 @@ class AuthUser(HttpBearer):
         return user
 
 
+class GuestToken:
+    """
+    Signed guest identities, "<guest id>:<signature>", checked without
+    the database. Ids can't be guessed or forged from another guest's.
+    """
+
+    SALT = "apps.common.GuestToken"
+
+    def create(guest_id=None):
+        return Signer(salt=GuestToken.SALT).sign(str(guest_id or uuid4()))
+
+    def decode(token: str):
+        try:
+            return UUID(Signer(salt=GuestToken.SALT).unsign(token))
+        except (BadSignature, ValueError):
+            return None
+
+
 class GuestClient(APIKeyHeader):
     param_name = "GuestUserId"
 
     async def authenticate(self, request, key):
-        guest = await GuestUser.objects.get_or_none(id=is_uuid(key))
-        return guest
+        if not key:
+            return None
+        guest_id = GuestToken.decode(key)
+        if guest_id:
+            # Unsaved, its row may not be written yet
+            return GuestUser(id=guest_id)
+        # Guests from before tokens were signed hold their bare id
+        guest_id = is_uuid(key)
+        if not guest_id:
+            return None
+        return await GuestUser.objects.get_or_none(id=guest_id)
 
 
 def is_uuid(value):
@@ -102,3 +132,13 @@ class TestUtil:
         }
         listing = Listing.objects.create(**listing_dict)
         return {"user": verified_user, "listing": listing, "category": category}
+
+    @contextmanager
+    def query_budget(testcase, budget: int):
+        # Fails the test if the block runs more than budget queries or an N+1
+        with count_queries() as counter:
+            yield counter
+        testcase.assertLessEqual(
+            counter.count, budget, f"Over the query budget: {dict(counter.shapes)}"
+        )
+        testcase.assertEqual(counter.suspects(), [], "N+1 queries")
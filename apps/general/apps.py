@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class GeneralConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "apps.general"
+
+    def ready(self):
+        from . import signals
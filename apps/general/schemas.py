@@ -1,11 +1,11 @@
 from pydantic import BaseModel, validator, Field, EmailStr
 from typing import List
 
-from apps.common.schemas import ResponseSchema
+from apps.common.schemas import ResponseSchema, TrustedSchema
 
 
 # Site Details
-class SiteDetailDataSchema(BaseModel):
+class SiteDetailDataSchema(TrustedSchema):
     name: str
     email: str
     phone: str
@@ -42,7 +42,7 @@ class SubscriberResponseSchema(ResponseSchema):
 
 
 # Reviews
-class ReviewsDataSchema(BaseModel):
+class ReviewsDataSchema(TrustedSchema):
     reviewer: dict = Field(
         ..., example={"name": "John Doe", "avatar": "https://image.url"}
     )
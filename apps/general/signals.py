@@ -0,0 +1,14 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from apps.common.cache import ResponseCache
+from .models import Review, SiteDetail
+
+
+@receiver([post_save, post_delete], sender=SiteDetail)
+def invalidate_sitedetail(sender, **kwargs):
+    ResponseCache.bump_on_commit("sitedetail")
+
+
+@receiver([post_save, post_delete], sender=Review)
+def invalidate_reviews(sender, **kwargs):
+    ResponseCache.bump_on_commit("reviews")
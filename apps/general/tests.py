@@ -1,3 +1,4 @@
+from django.core.cache import cache
 from django.test import TestCase
 from django.test.client import AsyncClient
 
@@ -12,6 +13,7 @@ class TestGeneral(TestCase):
     reviews_url = "/api/v5/general/reviews/"
 
     def setUp(self):
+        cache.clear()
         self.client = AsyncClient()
         verified_user = TestUtil.verified_user()
         review_dict = {
@@ -24,7 +26,8 @@ class TestGeneral(TestCase):
         self.headers = {"CONTENT_TYPE": "application/json"}
 
     async def test_retrieve_sitedetail(self):
-        response = await self.client.get(self.sitedetail_url)
+        with TestUtil.query_budget(self, 4):
+            response = await self.client.get(self.sitedetail_url)
         self.assertEqual(response.status_code, 200)
         result = response.json()
         self.assertEqual(result["status"], "success")
@@ -51,7 +54,8 @@ class TestGeneral(TestCase):
 
     async def test_retrieve_reviews(self):
         # Check response validity
-        response = await self.client.get(self.reviews_url)
+        with TestUtil.query_budget(self, 1):
+            response = await self.client.get(self.reviews_url)
         self.assertEqual(response.status_code, 200)
         self.assertEqual(
             response.json(),
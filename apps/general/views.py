@@ -7,6 +7,8 @@ from .schemas import (
     SubscriberSchema,
 )
 from .models import Review, SiteDetail, Subscriber
+from apps.common.cache import cached_response
+from apps.common.renderers import trusted_response
 from asgiref.sync import sync_to_async
 
 general_router = Router(tags=["General"])
@@ -18,9 +20,13 @@ general_router = Router(tags=["General"])
     summary="Retrieve site details",
     description="This endpoint retrieves few details of the site/application",
 )
+@cached_response("sitedetail")
 async def retrieve_site_details(request):
     sitedetail, created = await SiteDetail.objects.aget_or_create()
-    return {"message": "Site Details fetched", "data": sitedetail}
+    return trusted_response(
+        SiteDetailResponseSchema,
+        {"message": "Site Details fetched", "data": sitedetail},
+    )
 
 
 @general_router.post(
@@ -41,10 +47,13 @@ async def subscribe(request, data: SubscriberSchema):
     summary="Retrieve site reviews",
     description="This endpoint retrieves a few reviews of the application",
 )
+@cached_response("reviews")
 async def retrieve_reviews(request):
     reviews = (
         await sync_to_async(list)(
             Review.objects.filter(show=True).select_related("reviewer")
         )
     )[:3]
-    return {"message": "Reviews fetched", "data": reviews}
+    return trusted_response(
+        ReviewsResponseSchema, {"message": "Reviews fetched", "data": reviews}
+    )
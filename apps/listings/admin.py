@@ -17,6 +17,7 @@ class ListingAdmin(admin.ModelAdmin):
         "highest_bid",
         "closing_date",
     )
+    list_select_related = ("auctioneer", "category")
     list_filter = (
         "auctioneer",
         "name",
@@ -30,11 +31,13 @@ class ListingAdmin(admin.ModelAdmin):
 
 class BidAdmin(admin.ModelAdmin):
     list_display = ("user", "listing", "amount")
+    list_select_related = ("user", "listing")
     list_filter = ("user", "listing", "amount")
 
 
 class WatchListAdmin(admin.ModelAdmin):
     list_display = ("user", "listing", "guest")
+    list_select_related = ("user", "listing", "guest")
     list_filter = ("user", "listing", "guest")
 
 
@@ -0,0 +1,139 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Q
+from django.utils import timezone
+from apps.accounts.models import User
+from apps.common.management.commands.data_generator import (
+    DESC_WORDS,
+    NAME_WORDS,
+    WORDS,
+)
+from apps.listings.models import Listing
+from datetime import timedelta
+import logging, statistics, time
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+BENCHMARK_EMAIL = "search-benchmark@example.com"
+QUERIES = [
+    "vintage watch",
+    "leather jacket",
+    "antique clock",
+    "signed guitar",
+    "handmade ceramic vase",
+    "rare record",
+    "golden ring",
+    "wooden chair",
+]
+
+# Names and descriptions shaped like listing_text's, with words picked server side
+SEED_SQL = """
+INSERT INTO listings_listing (
+    id, created_at, updated_at, auctioneer_id, name, slug, "desc",
+    price, highest_bid, bids_count, closing_date, active
+)
+SELECT
+    gen_random_uuid(), now(), now(), %(auctioneer)s,
+    initcap((
+        SELECT string_agg(words[k], ' ') FROM (
+            SELECT 1 + floor(random() * cardinality(words))::int AS k
+            FROM generate_series(1, %(name_words)s) WHERE n IS NOT NULL
+        ) picks
+    )),
+    'search-benchmark-' || n,
+    (
+        SELECT string_agg(words[k], ' ') FROM (
+            SELECT 1 + floor(random() * cardinality(words))::int AS k
+            FROM generate_series(1, %(desc_words)s) WHERE n IS NOT NULL
+        ) picks
+    ),
+    1 + floor(random() * 10000), 0, 0, %(closing_date)s, true
+FROM generate_series(%(start)s, %(end)s) n, (SELECT %(words)s::text[] AS words) w
+"""
+
+
+class Command(BaseCommand):
+    help = "Benchmarks listing search against an unindexed substring scan"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--seed",
+            type=int,
+            default=0,
+            help="Synthetic listings to insert before benchmarking (e.g 1000000)",
+        )
+        parser.add_argument("--batch-size", type=int, default=10000)
+        parser.add_argument("--repeat", type=int, default=5)
+        parser.add_argument(
+            "--cleanup",
+            action="store_true",
+            help="Delete the synthetic listings afterwards",
+        )
+
+    def handle(self, **options) -> None:
+        if connection.vendor != "postgresql":
+            raise CommandError("Listing search is only indexed on PostgreSQL")
+
+        if options["seed"]:
+            self.seed(options["seed"], options["batch_size"])
+        logger.info(f"Catalog size: {Listing.objects.count()} listings")
+
+        for query in QUERIES:
+            search = self.measure(
+                lambda: list(Listing.objects.search(query)[:50]), options["repeat"]
+            )
+            scan = self.measure(
+                lambda: list(
+                    Listing.objects.filter(
+                        Q(name__icontains=query) | Q(desc__icontains=query)
+                    )[:50]
+                ),
+                options["repeat"],
+            )
+            logger.info(
+                f"{query!r} | ranked search: {search * 1000:.1f}ms | "
+                f"substring scan: {scan * 1000:.1f}ms"
+            )
+
+        if options["cleanup"]:
+            deleted, _ = User.objects.filter(email=BENCHMARK_EMAIL).delete()
+            logger.info(f"Deleted {deleted} benchmark rows")
+
+    def measure(self, func, repeat):
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            func()
+            timings.append(time.perf_counter() - started)
+        return statistics.median(timings)
+
+    def seed(self, size, batch_size):
+        auctioneer, _ = User.objects.get_or_create(
+            email=BENCHMARK_EMAIL,
+            defaults={"first_name": "Search", "last_name": "Benchmark"},
+        )
+        closing_date = timezone.now() + timedelta(days=30)
+        offset = Listing.objects.filter(auctioneer=auctioneer).count()
+        created = 0
+        started = time.perf_counter()
+        while created < size:
+            count = min(batch_size, size - created)
+            # Rows are generated server side: bulk_create would run AutoSlugField's
+            # uniqueness query per row. search_vector is filled in by the trigger.
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    SEED_SQL,
+                    {
+                        "auctioneer": auctioneer.id,
+                        "closing_date": closing_date,
+                        "start": offset + created + 1,
+                        "end": offset + created + count,
+                        "words": WORDS,
+                        "name_words": NAME_WORDS,
+                        "desc_words": DESC_WORDS,
+                    },
+                )
+            created += count
+            logger.info(f"Seeded {created}/{size} listings")
+        logger.info(f"Seeding took {time.perf_counter() - started:.1f}s")
@@ -0,0 +1,81 @@
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.db import connections, router
+from apps.common.cache import require_shared_cache
+from apps.listings.models import Listing
+from apps.listings.signals import listing_closed
+import logging, time, uuid, zlib
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+LOCK_KEY = "lock:close_auctions"
+# Key of the PostgreSQL advisory lock, under 2**32 so it's stored in objid alone
+LOCK_ID = zlib.crc32(LOCK_KEY.encode())
+
+
+def acquire_leadership(owner: str, timeout: float):
+    # Only one scheduler closes auctions at a time
+    connection = connections[router.db_for_write(Listing)]
+    if connection.vendor == "postgresql":
+        # Held by this session until it ends, so a dead leader's lock goes with its
+        # connection. Checked first, as taking it again would stack another hold.
+        with connection.cursor() as cursor:
+            cursor.execute(
+                """
+                SELECT CASE WHEN EXISTS (
+                    SELECT 1 FROM pg_locks
+                    WHERE locktype = 'advisory' AND pid = pg_backend_pid()
+                    AND classid = 0 AND objid = %s AND objsubid = 1
+                ) THEN true ELSE pg_try_advisory_lock(%s) END
+                """,
+                [LOCK_ID, LOCK_ID],
+            )
+            return cursor.fetchone()[0]
+
+    # Elsewhere the lock lives in the shared cache and expires on its own
+    # if the leader dies, so another one can take over
+    if cache.add(LOCK_KEY, owner, timeout):
+        return True
+    if cache.get(LOCK_KEY) == owner:
+        cache.touch(LOCK_KEY, timeout)
+        return True
+    return False
+
+
+class Command(BaseCommand):
+    help = "Closes listings whose closing date has passed, in batches"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument(
+            "--interval", type=float, default=10, help="Seconds between runs"
+        )
+        parser.add_argument(
+            "--once", action="store_true", help="Close due auctions once and exit"
+        )
+
+    def handle(self, **options) -> None:
+        if connections[router.db_for_write(Listing)].vendor != "postgresql":
+            require_shared_cache("close_auctions without PostgreSQL")
+        owner = str(uuid.uuid4())
+        logger.info("Auction scheduler started")
+        while True:
+            try:
+                if acquire_leadership(owner, options["interval"] * 3):
+                    self.close_due_auctions(options["batch_size"])
+            except Exception:
+                # Database unavailable (e.g failover), due auctions are closed next run
+                logger.exception("Closing auctions failed")
+            if options["once"]:
+                break
+            time.sleep(options["interval"])
+
+    def close_due_auctions(self, batch_size):
+        while True:
+            ids = Listing.objects.close_expired(batch_size=batch_size)
+            if ids:
+                listing_closed.send(sender=Listing, listing_ids=ids)
+                logger.info(f"Closed {len(ids)} auctions")
+            if len(ids) < batch_size:
+                break
@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand
+from apps.listings.models import WatchList
+import logging, time
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = (
+        "Merges guest watchlists into the users they logged in as, for logins "
+        "made with WATCHLIST_MERGE_DEFERRED"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=100)
+        parser.add_argument(
+            "--interval", type=float, default=2, help="Seconds to wait when idle"
+        )
+        parser.add_argument(
+            "--once", action="store_true", help="Merge pending watchlists and exit"
+        )
+
+    def handle(self, **options) -> None:
+        logger.info("Watchlist merge worker started")
+        while True:
+            started = time.monotonic()
+            merged = WatchList.objects.merge_pending(batch_size=options["batch_size"])
+            if merged:
+                logger.info(
+                    f"Merged {merged} guest watchlists in "
+                    f"{time.monotonic() - started:.2f}s"
+                )
+                if merged >= options["batch_size"]:
+                    # More may be pending, keep merging
+                    continue
+            if options["once"]:
+                break
+            time.sleep(options["interval"])
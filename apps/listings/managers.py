@@ -0,0 +1,226 @@
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.db import IntegrityError, connections, transaction
+from django.db.models import Count, Exists, F, OuterRef, Q, Value
+from django.utils import timezone
+from asgiref.sync import sync_to_async
+from apps.common.managers import GetOrNoneManager, GetOrNoneQuerySet
+from decimal import Decimal
+
+BID_RETRIES = 3
+# Must match the config the search_vector trigger is built with (migration 0005)
+SEARCH_CONFIG = "english"
+# (min, max) price ranges counted by ListingQuerySet.facet_counts, max excluded
+PRICE_BUCKETS = [
+    (Decimal("0"), Decimal("100")),
+    (Decimal("100"), Decimal("500")),
+    (Decimal("500"), Decimal("1000")),
+    (Decimal("1000"), Decimal("5000")),
+    (Decimal("5000"), None),
+]
+
+
+class BidContentionError(Exception):
+    """Raised when a bid keeps colliding with concurrent bids past BID_RETRIES"""
+
+
+class ListingQuerySet(GetOrNoneQuerySet):
+    def with_watchlist(self, client):
+        """
+        Annotates each listing with whether it is in the client's watchlist,
+        as an EXISTS subquery on the (user, listing) or (guest, listing) index.
+        """
+        if not client:
+            return self.annotate(watchlist=Value(False))
+        WatchList = self.model._meta.get_field("watchlists").related_model
+        GuestUser = WatchList._meta.get_field("guest").related_model
+        owner = "guest_id" if isinstance(client, GuestUser) else "user_id"
+        return self.annotate(
+            watchlist=Exists(
+                WatchList.objects.filter(
+                    listing_id=OuterRef("pk"), **{owner: client.id}
+                )
+            )
+        )
+
+    def facet_counts(self):
+        """
+        Listing counts per category and per price bucket, computed in one
+        GROUP BY category query with a conditional count for each bucket.
+        """
+        buckets = {}
+        for i, (low, high) in enumerate(PRICE_BUCKETS):
+            condition = Q(price__gte=low)
+            if high is not None:
+                condition &= Q(price__lt=high)
+            buckets[f"bucket_{i}"] = Count("id", filter=condition)
+
+        # order_by() drops the default ordering, which would join the GROUP BY
+        rows = (
+            self.order_by()
+            .values("category__name", "category__slug")
+            .annotate(count=Count("id"), **buckets)
+        )
+        categories = []
+        prices = [{"min": low, "max": high, "count": 0} for low, high in PRICE_BUCKETS]
+        for row in rows:
+            categories.append(
+                {
+                    # Listings without a category are listed under 'other'
+                    "name": row["category__name"] or "Other",
+                    "slug": row["category__slug"] or "other",
+                    "count": row["count"],
+                }
+            )
+            for i, price in enumerate(prices):
+                price["count"] += row[f"bucket_{i}"]
+        categories.sort(key=lambda category: category["name"])
+        return {"categories": categories, "prices": prices}
+
+
+class ListingManager(GetOrNoneManager.from_queryset(ListingQuerySet)):
+    def get_queryset(self):
+        # search_vector is only read by search, in SQL, so rows never carry it
+        return ListingQuerySet(self.model, using=self._db).defer("search_vector")
+
+    def close_expired(self, batch_size: int = 1000):
+        """
+        Closes one batch of listings whose closing date has passed
+        and returns the ids of the listings this call closed.
+        """
+        with transaction.atomic(using=self.db):
+            # Rows locked by another runner are left to it, so a listing is
+            # only ever reported closed once
+            ids = list(
+                self.select_for_update(skip_locked=True)
+                .filter(active=True, closing_date__lte=timezone.now())
+                .order_by("closing_date")
+                .values_list("id", flat=True)[:batch_size]
+            )
+            if ids:
+                self.filter(id__in=ids).update(active=False)
+        return ids
+
+    def search(self, query: str):
+        """
+        Listings matching query in their name or description, best match first.
+        The search_vector column is kept up to date by a database trigger, and
+        is matched and ranked in the query without being loaded.
+        """
+        if connections[self.db].vendor != "postgresql":
+            # No tsvector outside PostgreSQL, fall back to an unranked substring match
+            return self.filter(
+                Q(name__icontains=query) | Q(desc__icontains=query)
+            ).order_by("-created_at", "-id")
+
+        search_query = SearchQuery(query, search_type="websearch", config=SEARCH_CONFIG)
+        return (
+            self.filter(search_vector=search_query)
+            .annotate(rank=SearchRank(F("search_vector"), search_query))
+            .order_by("-rank", "-created_at", "-id")
+        )
+
+
+class BidManager(GetOrNoneManager):
+    """Places bids atomically so concurrent bidders never lose updates"""
+
+    def place_bid(self, user, listing, amount):
+        """
+        Returns the placed bid, or None if the listing was outbid or closed meanwhile.
+        Raises BidContentionError once BID_RETRIES attempts collided with other bids.
+        """
+        Listing = self.model._meta.get_field("listing").related_model
+
+        for _ in range(BID_RETRIES):
+            try:
+                with transaction.atomic():
+                    # Compare-and-set on highest_bid. The UPDATE also row-locks the listing
+                    # so the bid write below is serialized with other bidders.
+                    updated = Listing.objects.filter(
+                        id=listing.id,
+                        active=True,
+                        closing_date__gt=timezone.now(),
+                        highest_bid__lt=amount,
+                    ).update(highest_bid=amount)
+                    if not updated:
+                        return None
+
+                    bid = self.filter(user_id=user.id, listing_id=listing.id).first()
+                    if bid:
+                        # Update existing bid
+                        bid.amount = amount
+                        bid.save(update_fields=["amount", "updated_at"])
+                    else:
+                        # Create new bid
+                        bid = self.create(user=user, listing=listing, amount=amount)
+                        Listing.objects.filter(id=listing.id).update(
+                            bids_count=F("bids_count") + 1
+                        )
+                bid.user = user
+                return bid
+            except IntegrityError:
+                # A concurrent bid slipped in between, try again with fresh state
+                continue
+        raise BidContentionError
+
+    async def aplace_bid(self, user, listing, amount):
+        return await sync_to_async(self.place_bid)(user, listing, amount)
+
+
+class WatchListManager(GetOrNoneManager):
+    def merge_guest(self, guest_id, user_id):
+        """
+        Moves a guest's watchlist to a user, skipping listings the user already
+        watches, and deletes the guest. On PostgreSQL the entries are moved by
+        one INSERT ... SELECT, so concurrent logins never add them twice.
+        """
+        GuestUser = self.model._meta.get_field("guest").related_model
+        connection = connections[self.db]
+        with transaction.atomic(using=self.db):
+            if connection.vendor == "postgresql":
+                table = connection.ops.quote_name(self.model._meta.db_table)
+                with connection.cursor() as cursor:
+                    cursor.execute(
+                        f"""
+                        WITH moved AS (
+                            DELETE FROM {table} WHERE guest_id = %s
+                            RETURNING listing_id
+                        )
+                        INSERT INTO {table}
+                            (id, user_id, listing_id, created_at, updated_at)
+                        SELECT gen_random_uuid(), %s, listing_id, now(), now()
+                        FROM moved
+                        ON CONFLICT DO NOTHING
+                        """,
+                        [guest_id, user_id],
+                    )
+            else:
+                listing_ids = self.filter(guest_id=guest_id).values_list(
+                    "listing_id", flat=True
+                )
+                self.bulk_create(
+                    [
+                        self.model(user_id=user_id, listing_id=listing_id)
+                        for listing_id in listing_ids
+                    ],
+                    ignore_conflicts=True,
+                )
+                self.filter(guest_id=guest_id).delete()
+            GuestUser.objects.filter(id=guest_id).delete()
+
+    async def amerge_guest(self, guest_id, user_id):
+        return await sync_to_async(self.merge_guest)(guest_id, user_id)
+
+    def merge_pending(self, batch_size: int = 100):
+        """
+        Merges one batch of guests whose merge a login deferred (merge_into set)
+        and returns how many it merged.
+        """
+        GuestUser = self.model._meta.get_field("guest").related_model
+        guests = list(
+            GuestUser.objects.filter(merge_into__isnull=False)
+            .order_by("updated_at")
+            .values_list("id", "merge_into_id")[:batch_size]
+        )
+        for guest_id, user_id in guests:
+            self.merge_guest(guest_id, user_id)
+        return len(guests)
@@ -0,0 +1,23 @@
+# Generated by Django 4.2.2 on 2026-10-17 02:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("listings", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name="listing",
+            options={"ordering": ["-created_at"]},
+        ),
+        migrations.AddIndex(
+            model_name="listing",
+            index=models.Index(
+                fields=["-created_at", "-id"], name="listing_created_at_id_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 4.2.2 on 2026-10-17 02:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("listings", "0002_listing_created_at_id_idx"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="bid",
+            index=models.Index(
+                fields=["listing", "-updated_at"], name="bid_listing_updated_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="listing",
+            index=models.Index(
+                fields=["category", "-created_at"], name="listing_category_created_idx"
+            ),
+        ),
+    ]
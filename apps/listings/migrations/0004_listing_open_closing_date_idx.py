@@ -0,0 +1,21 @@
+# Generated by Django 4.2.2 on 2026-10-17 02:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("listings", "0003_listing_category_bid_listing_indexes"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="listing",
+            index=models.Index(
+                condition=models.Q(("active", True)),
+                fields=["closing_date"],
+                name="listing_open_closing_date_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,59 @@
+# Generated by Django 4.2.2 on 2026-10-17 09:12
+
+import django.contrib.postgres.search
+from django.db import migrations
+
+# Names carry a higher weight than descriptions when ranking
+CREATE_SEARCH_TRIGGER = """
+CREATE FUNCTION listings_listing_search_vector_update() RETURNS trigger AS $$
+BEGIN
+    NEW.search_vector :=
+        setweight(to_tsvector('english', coalesce(NEW.name, '')), 'A') ||
+        setweight(to_tsvector('english', coalesce(NEW."desc", '')), 'B');
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER listings_listing_search_vector_trigger
+BEFORE INSERT OR UPDATE OF name, "desc" ON listings_listing
+FOR EACH ROW EXECUTE FUNCTION listings_listing_search_vector_update();
+
+UPDATE listings_listing SET name = name;
+
+CREATE INDEX listing_search_vector_idx ON listings_listing USING gin (search_vector);
+"""
+
+DROP_SEARCH_TRIGGER = """
+DROP INDEX IF EXISTS listing_search_vector_idx;
+DROP TRIGGER IF EXISTS listings_listing_search_vector_trigger ON listings_listing;
+DROP FUNCTION IF EXISTS listings_listing_search_vector_update();
+"""
+
+
+def create_search_trigger(apps, schema_editor):
+    # tsvector, triggers and GIN indexes only exist on PostgreSQL
+    if schema_editor.connection.vendor == "postgresql":
+        schema_editor.execute(CREATE_SEARCH_TRIGGER, params=None)
+
+
+def drop_search_trigger(apps, schema_editor):
+    if schema_editor.connection.vendor == "postgresql":
+        schema_editor.execute(DROP_SEARCH_TRIGGER, params=None)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("listings", "0004_listing_open_closing_date_idx"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="listing",
+            name="search_vector",
+            field=django.contrib.postgres.search.SearchVectorField(
+                editable=False, null=True
+            ),
+        ),
+        migrations.RunPython(create_search_trigger, drop_search_trigger),
+    ]
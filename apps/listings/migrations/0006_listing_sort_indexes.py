@@ -0,0 +1,49 @@
+# Generated by Django 4.2.2 on 2026-10-17 02:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("listings", "0005_listing_search_vector"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="listing",
+            index=models.Index(fields=["price", "id"], name="listing_price_id_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="listing",
+            index=models.Index(
+                fields=["closing_date", "id"], name="listing_closing_date_id_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="listing",
+            index=models.Index(
+                fields=["bids_count", "id"], name="listing_bids_count_id_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="listing",
+            index=models.Index(
+                fields=["category", "price", "id"], name="listing_category_price_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="listing",
+            index=models.Index(
+                fields=["category", "closing_date", "id"],
+                name="listing_category_closing_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="listing",
+            index=models.Index(
+                fields=["category", "bids_count", "id"],
+                name="listing_category_bids_idx",
+            ),
+        ),
+    ]
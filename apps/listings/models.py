@@ -1,3 +1,4 @@
+from django.contrib.postgres.search import SearchVectorField
 from django.db import models
 from django.core.exceptions import ValidationError
 from django.utils import timezone
@@ -7,6 +8,7 @@ from apps.common.models import BaseModel, File, GuestUser
 from autoslug import AutoSlugField
 from apps.common.file_processors import FileProcessor
 from decimal import Decimal
+from .managers import BidManager, ListingManager, WatchListManager
 
 
 class Category(BaseModel):
@@ -42,6 +44,11 @@ class Listing(BaseModel):
 
     image = models.ForeignKey(File, on_delete=models.SET_NULL, null=True)
 
+    # Weighted name + desc tsvector, maintained by a trigger (see migration 0005)
+    search_vector = SearchVectorField(null=True, editable=False)
+
+    objects = ListingManager()
+
     def __str__(self):
         return self.name
 
@@ -59,6 +66,38 @@ class Listing(BaseModel):
 
     class Meta:
         ordering = ["-created_at"]
+        indexes = [
+            models.Index(
+                fields=["-created_at", "-id"], name="listing_created_at_id_idx"
+            ),
+            models.Index(
+                fields=["category", "-created_at"], name="listing_category_created_idx"
+            ),
+            # Sort orders of the listings endpoints, id breaks ties
+            models.Index(fields=["price", "id"], name="listing_price_id_idx"),
+            models.Index(
+                fields=["closing_date", "id"], name="listing_closing_date_id_idx"
+            ),
+            models.Index(fields=["bids_count", "id"], name="listing_bids_count_id_idx"),
+            # Same sort orders within a category
+            models.Index(
+                fields=["category", "price", "id"], name="listing_category_price_idx"
+            ),
+            models.Index(
+                fields=["category", "closing_date", "id"],
+                name="listing_category_closing_idx",
+            ),
+            models.Index(
+                fields=["category", "bids_count", "id"],
+                name="listing_category_bids_idx",
+            ),
+            # Only open auctions are scanned by the scheduler
+            models.Index(
+                fields=["closing_date"],
+                condition=models.Q(active=True),
+                name="listing_open_closing_date_idx",
+            ),
+        ]
 
 
 class Bid(BaseModel):
@@ -69,11 +108,18 @@ class Bid(BaseModel):
         max_digits=10, decimal_places=2, validators=[MinValueValidator(Decimal("0.01"))]
     )
 
+    objects = BidManager()
+
     def __str__(self):
         return f"{self.listing.name} - ${self.amount}"
 
     class Meta:
         ordering = ["-updated_at"]
+        indexes = [
+            models.Index(
+                fields=["listing", "-updated_at"], name="bid_listing_updated_idx"
+            ),
+        ]
         constraints = [
             models.UniqueConstraint(
                 fields=["user", "listing"],
@@ -97,8 +143,10 @@ class WatchList(BaseModel):
         GuestUser, related_name="watchlists", on_delete=models.CASCADE, null=True
     )
 
+    objects = WatchListManager()
+
     def __str__(self):
-        if self.user:
+        if self.user_id:
             return f"{self.listing.name} - {self.user.full_name}"
         return f"{self.listing.name} - {self.guest_id}"
 
@@ -1,9 +1,12 @@
 from typing import Optional, List, Any
-from uuid import UUID
 
+from django.db.models import Q
+from django.utils import timezone
+from ninja import FilterSchema
 from pydantic import BaseModel, validator, Field
 from datetime import datetime
-from apps.common.schemas import ResponseSchema
+from enum import Enum
+from apps.common.schemas import ResponseSchema, TrustedSchema
 
 from apps.common.file_processors import FileProcessor
 
@@ -17,14 +20,16 @@ class AddOrRemoveWatchlistSchema(BaseModel):
 
 
 class AddOrRemoveWatchlistResponseDataSchema(BaseModel):
-    guestuser_id: Optional[UUID]
+    guestuser_id: Optional[str] = Field(
+        None, example="d4bd4d2b-5a5b-4bb5-9b8e-4d2b4b0ec8a7:signature"
+    )
 
 
 class AddOrRemoveWatchlistResponseSchema(ResponseSchema):
     data: Optional[AddOrRemoveWatchlistResponseDataSchema]
 
 
-class ListingDataSchema(BaseModel):
+class ListingDataSchema(TrustedSchema):
     name: str
 
     auctioneer: dict = Field(
@@ -75,17 +80,11 @@ class ListingDataSchema(BaseModel):
             return file_url
         return None
 
-    @validator("watchlist", pre=True)
-    def set_watchlist(cls, v):
-        if isinstance(v, list):
-            return True if len(v) > 0 else False
-        return v
-
     class Config:
         orm_mode = True
 
 
-class ListingDetailDataSchema(BaseModel):
+class ListingDetailDataSchema(TrustedSchema):
     listing: ListingDataSchema
     related_listings: List[ListingDataSchema]
 
@@ -94,15 +93,67 @@ class ListingResponseSchema(ResponseSchema):
     data: ListingDetailDataSchema
 
 
+class ListingFilterSchema(FilterSchema):
+    min_price: Optional[Decimal] = Field(None, q="price__gte")
+    max_price: Optional[Decimal] = Field(None, q="price__lte")
+    active: Optional[bool]
+    closing_after: Optional[datetime] = Field(None, q="closing_date__gte")
+    closing_before: Optional[datetime] = Field(None, q="closing_date__lte")
+    has_bids: Optional[bool]
+
+    def filter_active(self, value):
+        # Matches ListingDataSchema.active, expired listings count as closed
+        if value is None:
+            return Q()
+        open_listings = Q(active=True, closing_date__gt=timezone.now())
+        return open_listings if value else ~open_listings
+
+    def filter_has_bids(self, value):
+        if value is None:
+            return Q()
+        return Q(bids_count__gt=0) if value else Q(bids_count=0)
+
+
+class ListingSort(str, Enum):
+    NEWEST = "-created_at"
+    OLDEST = "created_at"
+    PRICE_ASC = "price"
+    PRICE_DESC = "-price"
+    CLOSING_SOONEST = "closing_date"
+    CLOSING_LATEST = "-closing_date"
+    BIDS_COUNT_ASC = "bids_count"
+    BIDS_COUNT_DESC = "-bids_count"
+
+
+class CategoryFacetSchema(BaseModel):
+    name: str
+    slug: str
+    count: int
+
+
+class PriceFacetSchema(BaseModel):
+    min: Decimal
+    max: Optional[Decimal]
+    count: int
+
+
+class ListingFacetsSchema(BaseModel):
+    categories: List[CategoryFacetSchema]
+    prices: List[PriceFacetSchema]
+
+
 class ListingsResponseSchema(ResponseSchema):
     data: List[ListingDataSchema]
+    next_cursor: Optional[str]
+    has_more: Optional[bool]
+    facets: Optional[ListingFacetsSchema]
 
 
 # ------------------------------------------------------ #
 
 
 # CATEGORIES
-class CategoryDataSchema(BaseModel):
+class CategoryDataSchema(TrustedSchema):
     name: str
     slug: str
 
@@ -122,7 +173,7 @@ class CreateBidSchema(BaseModel):
     amount: Decimal = Field(..., example=1000.00, decimal_places=2)
 
 
-class BidDataSchema(BaseModel):
+class BidDataSchema(TrustedSchema):
     user: dict = Field(..., example={"name": "John Doe", "avatar": "https://image.url"})
     amount: Decimal = Field(..., example=1000.00, decimal_places=2)
 
@@ -138,7 +189,7 @@ class BidResponseSchema(ResponseSchema):
     data: BidDataSchema
 
 
-class BidsResponseDataSchema(BaseModel):
+class BidsResponseDataSchema(TrustedSchema):
     listing: str
     bids: List[BidDataSchema]
 
@@ -0,0 +1,25 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import Signal, receiver
+from apps.common.cache import ResponseCache
+from .models import Bid, Category, Listing
+
+# Sent with the ids of listings the auction scheduler has just closed
+listing_closed = Signal()
+
+
+@receiver([post_save, post_delete], sender=Listing)
+@receiver([post_save, post_delete], sender=Bid)
+def invalidate_listings(sender, **kwargs):
+    ResponseCache.bump_on_commit("listings")
+
+
+@receiver([post_save, post_delete], sender=Category)
+def invalidate_categories(sender, **kwargs):
+    # Listings embed their category's name
+    ResponseCache.bump_on_commit("categories", "listings")
+
+
+@receiver(listing_closed)
+def invalidate_closed_listings(sender, listing_ids, **kwargs):
+    # Closing happens through a queryset update, which doesn't send post_save
+    ResponseCache.bump("listings")
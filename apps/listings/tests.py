@@ -1,23 +1,44 @@
-from django.test import TestCase
-from django.test.client import AsyncClient
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import (
+    IntegrityError,
+    OperationalError,
+    connection,
+    router,
+    transaction,
+)
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.client import AsyncClient, Client
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
 
 from apps.accounts.auth import Authentication
-from apps.accounts.models import Jwt
+from apps.accounts.models import Jwt, User
 
-from apps.common.utils import TestUtil
-from unittest import mock
+from apps.common.cache import ResponseCache
+from apps.common.db.routers import ReplicaRouter
+from apps.common.models import GuestUser
+from apps.common.utils import GuestToken, TestUtil
+from unittest import mock, skipUnless
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+import json, os, tempfile
 
-from apps.listings.models import Bid, WatchList
+from apps.listings.models import Bid, Category, Listing, WatchList
+from apps.listings.management.commands.close_auctions import acquire_leadership
+from apps.listings.signals import listing_closed
 
 
 class TestListings(TestCase):
     listings_url = "/api/v5/listings/"
     listing_detail_url = "/api/v5/listings/detail/"
+    search_url = "/api/v5/listings/search/"
     watchlist_url = "/api/v5/listings/watchlist/"
     categories_url = "/api/v5/listings/categories/"
     maxDiff = None
 
     def setUp(self):
+        cache.clear()
         self.client = AsyncClient()
         self.content_type = "application/json"
         verified_user = TestUtil.verified_user()
@@ -28,9 +49,10 @@ class TestListings(TestCase):
 
     async def test_retrieve_all_listings(self):
         # Verify that all listings are retrieved successfully
-        response = await self.client.get(
-            self.listings_url, content_type=self.content_type
-        )
+        with TestUtil.query_budget(self, 2):
+            response = await self.client.get(
+                self.listings_url, content_type=self.content_type
+            )
         self.assertEqual(response.status_code, 200)
         result = response.json()
         self.assertEqual(result["status"], "success")
@@ -39,6 +61,250 @@ class TestListings(TestCase):
         self.assertGreater(len(data), 0)
         self.assertTrue(any(isinstance(obj["name"], str) for obj in data))
 
+    async def test_retrieve_listings_with_cursor(self):
+        listing = self.listing
+        newer_listing = await Listing.objects.acreate(
+            auctioneer_id=self.verified_user.id,
+            name="Newer Listing",
+            desc="Newer description",
+            category_id=listing.category_id,
+            price=1000.00,
+            closing_date=listing.closing_date,
+        )
+
+        # Verify that the first page holds the newest listing and points to the next
+        response = await self.client.get(
+            f"{self.listings_url}?quantity=1", content_type=self.content_type
+        )
+        self.assertEqual(response.status_code, 200)
+        result = response.json()
+        self.assertEqual(len(result["data"]), 1)
+        self.assertEqual(result["data"][0]["slug"], newer_listing.slug)
+        self.assertTrue(result["has_more"])
+
+        # Verify that the cursor continues from where the first page stopped
+        response = await self.client.get(
+            f"{self.listings_url}?quantity=1&cursor={result['next_cursor']}",
+            content_type=self.content_type,
+        )
+        self.assertEqual(response.status_code, 200)
+        result = response.json()
+        self.assertEqual(result["data"][0]["slug"], listing.slug)
+        self.assertFalse(result["has_more"])
+        self.assertEqual(result["next_cursor"], None)
+
+        # Verify that an invalid cursor fails
+        response = await self.client.get(
+            f"{self.listings_url}?cursor=invalid", content_type=self.content_type
+        )
+        self.assertEqual(response.status_code, 422)
+        self.assertEqual(
+            response.json(),
+            {
+                "status": "failure",
+                "message": "Invalid entry",
+                "data": {"cursor": "Invalid cursor"},
+            },
+        )
+
+    async def test_filter_and_sort_listings(self):
+        listing = self.listing
+        cheap_listing = await Listing.objects.acreate(
+            auctioneer_id=self.verified_user.id,
+            name="Cheap Listing",
+            desc="Cheap description",
+            price=50.00,
+            bids_count=2,
+            closing_date=listing.closing_date,
+        )
+        await Listing.objects.acreate(
+            auctioneer_id=self.verified_user.id,
+            name="Expired Listing",
+            desc="Expired description",
+            category_id=listing.category_id,
+            price=7000.00,
+            closing_date=timezone.now() - timedelta(days=1),
+        )
+
+        # Verify that listings are filtered by price, state and bids
+        response = await self.client.get(
+            f"{self.listings_url}?max_price=100", content_type=self.content_type
+        )
+        self.assertEqual(
+            [obj["slug"] for obj in response.json()["data"]], [cheap_listing.slug]
+        )
+        response = await self.client.get(
+            f"{self.listings_url}?active=true&has_bids=false",
+            content_type=self.content_type,
+        )
+        self.assertEqual(
+            [obj["slug"] for obj in response.json()["data"]], [listing.slug]
+        )
+
+        # Verify that a sorted listing is paginated in sort order
+        slugs = []
+        url = f"{self.listings_url}?sort=-price&quantity=2"
+        response = await self.client.get(url, content_type=self.content_type)
+        result = response.json()
+        slugs += [obj["slug"] for obj in result["data"]]
+        self.assertTrue(result["has_more"])
+        response = await self.client.get(
+            f"{url}&cursor={result['next_cursor']}", content_type=self.content_type
+        )
+        result = response.json()
+        slugs += [obj["slug"] for obj in result["data"]]
+        self.assertFalse(result["has_more"])
+        self.assertEqual(slugs, ["expired-listing", listing.slug, cheap_listing.slug])
+
+        # Verify that facets count listings per category and price range
+        response = await self.client.get(
+            f"{self.listings_url}?facets=true", content_type=self.content_type
+        )
+        facets = response.json()["facets"]
+        self.assertEqual(
+            facets["categories"],
+            [
+                {"name": "Other", "slug": "other", "count": 1},
+                {"name": "TestCategory", "slug": "testcategory", "count": 2},
+            ],
+        )
+        self.assertEqual(
+            [price["count"] for price in facets["prices"]], [1, 0, 0, 1, 1]
+        )
+
+        # Verify that category listings accept the same filters and sort
+        response = await self.client.get(
+            f"{self.categories_url}testcategory/?sort=price&active=false",
+            content_type=self.content_type,
+        )
+        self.assertEqual(
+            [obj["slug"] for obj in response.json()["data"]], ["expired-listing"]
+        )
+
+    async def test_stream_listings(self):
+        listing = self.listing
+        await Listing.objects.acreate(
+            auctioneer_id=self.verified_user.id,
+            name="Cheap Listing",
+            desc="Cheap description",
+            price=50.00,
+            closing_date=listing.closing_date,
+        )
+        stream_url = f"{self.listings_url}stream/?sort=-price"
+        response = await self.client.get(f"{self.listings_url}?sort=-price")
+        listings = response.json()["data"]
+        self.assertEqual(len(listings), 2)
+
+        # Verify that NDJSON holds the same listings, one per line
+        with mock.patch("apps.listings.views.STREAM_CHUNK_SIZE", 1):
+            response = await self.client.get(stream_url)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(
+                response["Content-Type"], "application/x-ndjson; charset=utf-8"
+            )
+            chunks = [chunk async for chunk in response.streaming_content]
+        # Sent a chunk of rows at a time
+        self.assertEqual(len(chunks), 2)
+        lines = b"".join(chunks).decode().splitlines()
+        self.assertEqual([json.loads(line) for line in lines], listings)
+
+        # Verify that JSON is the same document as the paginated listings
+        response = await self.client.get(f"{stream_url}&format=json")
+        self.assertEqual(response["Content-Type"], "application/json; charset=utf-8")
+        content = b"".join([chunk async for chunk in response.streaming_content])
+        self.assertEqual(
+            json.loads(content),
+            {"status": "success", "message": "Listings fetched", "data": listings},
+        )
+
+        # Verify that filters apply, and that an empty stream is still valid
+        response = await self.client.get(f"{stream_url}&format=json&max_price=100")
+        content = b"".join([chunk async for chunk in response.streaming_content])
+        self.assertEqual(json.loads(content)["data"], listings[1:])
+        response = await self.client.get(f"{stream_url}&format=json&min_price=9999")
+        content = b"".join([chunk async for chunk in response.streaming_content])
+        self.assertEqual(json.loads(content)["data"], [])
+
+    async def test_stream_listings_from_a_replica(self):
+        replica_router = next(r for r in router.routers if isinstance(r, ReplicaRouter))
+        # The primary stands in for a replica
+        with override_settings(DATABASE_REPLICAS=["default"]), mock.patch.multiple(
+            replica_router, checked_at={}, down_until={}
+        ):
+            response = await self.client.get(f"{self.listings_url}stream/")
+            content = b"".join([chunk async for chunk in response.streaming_content])
+            # Verify that the replica passed its health check, rather than
+            # being marked down for checking from the event loop
+            self.assertIn("default", replica_router.checked_at)
+            self.assertEqual(replica_router.down_until, {})
+        self.assertEqual(len(content.decode().splitlines()), 1)
+
+    def test_listing_facets_are_one_query(self):
+        with self.assertNumQueries(1):
+            Listing.objects.facet_counts()
+
+    def test_search_vector_is_not_loaded(self):
+        # Verify that listing rows leave out the search vector
+        with CaptureQueriesContext(connection) as queries:
+            listing = Listing.objects.get(id=self.listing.id)
+        self.assertNotIn("search_vector", queries[0]["sql"])
+
+        # Verify that saving such a listing still works
+        listing.name = "Renamed Listing"
+        listing.save()
+        self.assertEqual(Listing.objects.get(id=listing.id).name, "Renamed Listing")
+
+    async def test_search_listings(self):
+        listing = self.listing
+        await Listing.objects.acreate(
+            auctioneer_id=self.verified_user.id,
+            name="Vintage Watch",
+            desc="A rare watch from the sixties",
+            price=1000.00,
+            closing_date=listing.closing_date,
+        )
+
+        # Verify that a blank search term is rejected
+        response = await self.client.get(
+            f"{self.search_url}?q=%20", content_type=self.content_type
+        )
+        self.assertEqual(response.status_code, 422)
+
+        # Verify that only matching listings are returned
+        response = await self.client.get(
+            f"{self.search_url}?q=watch", content_type=self.content_type
+        )
+        self.assertEqual(response.status_code, 200)
+        result = response.json()
+        self.assertEqual(result["message"], "Listings fetched")
+        self.assertEqual([obj["name"] for obj in result["data"]], ["Vintage Watch"])
+        self.assertFalse(result["has_more"])
+
+        # Verify that results are paginated with the returned cursor
+        await Listing.objects.acreate(
+            auctioneer_id=self.verified_user.id,
+            name="Pocket Watch",
+            desc="Gold plated",
+            price=1000.00,
+            closing_date=listing.closing_date,
+        )
+        response = await self.client.get(
+            f"{self.search_url}?q=watch&quantity=1", content_type=self.content_type
+        )
+        result = response.json()
+        self.assertEqual(len(result["data"]), 1)
+        self.assertTrue(result["has_more"])
+        first_slug = result["data"][0]["slug"]
+
+        response = await self.client.get(
+            f"{self.search_url}?q=watch&quantity=1&cursor={result['next_cursor']}",
+            content_type=self.content_type,
+        )
+        result = response.json()
+        self.assertEqual(len(result["data"]), 1)
+        self.assertNotEqual(result["data"][0]["slug"], first_slug)
+        self.assertFalse(result["has_more"])
+
     async def test_retrieve_particular_listng(self):
         listing = self.listing
         # Verify that a particular listing retrieval fails with an invalid slug
@@ -85,6 +351,56 @@ class TestListings(TestCase):
             },
         )
 
+    def test_listing_detail_and_bids_fetch_constant_rows(self):
+        listing = self.listing
+        detail_url = f"{self.listing_detail_url}{listing.slug}/"
+        client = Client()
+
+        def get_counting_queries(url):
+            with CaptureQueriesContext(connection) as ctx:
+                response = client.get(url, content_type=self.content_type)
+            self.assertEqual(response.status_code, 200)
+            return response.json()["data"], ctx.captured_queries
+
+        # Fill the category and the auction well beyond the 3 items shown
+        Listing.objects.bulk_create(
+            [
+                Listing(
+                    auctioneer_id=self.verified_user.id,
+                    name=f"Related Listing {i}",
+                    slug=f"related-listing-{i}",
+                    desc="Related description",
+                    category_id=listing.category_id,
+                    price=1000.00,
+                    closing_date=listing.closing_date,
+                )
+                for i in range(20)
+            ]
+        )
+        bidders = User.objects.bulk_create(
+            [
+                User(first_name="Bidder", last_name=str(i), email=f"b{i}@example.com")
+                for i in range(20)
+            ]
+        )
+        Bid.objects.bulk_create(
+            [
+                Bid(user=bidder, listing=listing, amount=2000 + i)
+                for i, bidder in enumerate(bidders)
+            ]
+        )
+
+        # Verify that only 3 rows are selected in SQL, regardless of volume
+        data, queries = get_counting_queries(detail_url)
+        self.assertEqual(len(data["related_listings"]), 3)
+        self.assertEqual(len(queries), 2)
+        self.assertIn("LIMIT 3", queries[-1]["sql"])
+
+        data, queries = get_counting_queries(f"{detail_url}bids/")
+        self.assertEqual(len(data["bids"]), 3)
+        self.assertEqual(len(queries), 2)
+        self.assertIn("LIMIT 3", queries[-1]["sql"])
+
     async def test_get_user_watchlists_listng(self):
         listing = self.listing
         user_id = self.verified_user.id
@@ -92,9 +408,10 @@ class TestListings(TestCase):
         await WatchList.objects.acreate(user_id=user_id, listing_id=listing.id)
         bearer = {"Authorization": f"Bearer {self.auth_token}"}
 
-        response = await self.client.get(
-            self.watchlist_url, content_type=self.content_type, **bearer
-        )
+        with TestUtil.query_budget(self, 2):
+            response = await self.client.get(
+                self.watchlist_url, content_type=self.content_type, **bearer
+            )
         self.assertEqual(response.status_code, 200)
         result = response.json()
         self.assertEqual(result["status"], "success")
@@ -103,6 +420,43 @@ class TestListings(TestCase):
         self.assertGreater(len(data), 0)
         self.assertTrue(any(isinstance(obj["name"], str) for obj in data))
 
+    def test_watchlist_flag_is_annotated(self):
+        listing = self.listing
+        other_listing = Listing.objects.create(
+            auctioneer_id=self.verified_user.id,
+            name="Other Listing",
+            desc="Other description",
+            price=1000.00,
+            closing_date=listing.closing_date,
+        )
+        WatchList.objects.create(user_id=self.verified_user.id, listing_id=listing.id)
+        client = Client(HTTP_AUTHORIZATION=f"Bearer {self.auth_token}")
+
+        # Verify that the flag comes from the listings query, not a second one
+        for url in (self.listings_url, f"{self.categories_url}other/"):
+            with CaptureQueriesContext(connection) as ctx:
+                response = client.get(url, content_type=self.content_type)
+            flags = {obj["slug"]: obj["watchlist"] for obj in response.json()["data"]}
+            watchlist_queries = [
+                query["sql"]
+                for query in ctx.captured_queries
+                if "listings_watchlist" in query["sql"]
+            ]
+            self.assertEqual(len(watchlist_queries), 1)
+            self.assertIn("EXISTS", watchlist_queries[0])
+            self.assertFalse(flags[other_listing.slug])
+
+        response = client.get(self.listings_url, content_type=self.content_type)
+        flags = {obj["slug"]: obj["watchlist"] for obj in response.json()["data"]}
+        self.assertEqual(flags, {listing.slug: True, other_listing.slug: False})
+
+        # Verify that the watchlist endpoint uses the same annotation
+        response = client.get(self.watchlist_url, content_type=self.content_type)
+        data = response.json()["data"]
+        self.assertEqual(
+            [(obj["slug"], obj["watchlist"]) for obj in data], [(listing.slug, True)]
+        )
+
     async def test_create_or_remove_user_watchlists_listng(self):
         listing = self.listing
 
@@ -140,11 +494,62 @@ class TestListings(TestCase):
             },
         )
 
-    async def test_retrieve_all_categories(self):
-        # Verify that all categories are retrieved successfully
+    async def test_create_or_remove_guest_watchlists_listng(self):
+        listing = self.listing
+
+        # Verify that a new guest gets a signed token, and a row with its entry
+        response = await self.client.post(
+            self.watchlist_url, {"slug": listing.slug}, content_type=self.content_type
+        )
+        self.assertEqual(response.status_code, 201)
+        token = response.json()["data"]["guestuser_id"]
+        guest_id = GuestToken.decode(token)
+        self.assertTrue(
+            await WatchList.objects.filter(guest_id=guest_id, listing=listing).aexists()
+        )
+
+        # Verify that the token is checked without a lookup
+        with TestUtil.query_budget(self, 1):
+            response = await self.client.get(self.watchlist_url, GuestUserId=token)
+        self.assertEqual(
+            [obj["slug"] for obj in response.json()["data"]], [listing.slug]
+        )
+
+        # Verify that the guest removes it again
+        response = await self.client.post(
+            self.watchlist_url,
+            {"slug": listing.slug},
+            content_type=self.content_type,
+            GuestUserId=token,
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["data"]["guestuser_id"], token)
+        self.assertFalse(await WatchList.objects.filter(guest_id=guest_id).aexists())
+
+        # Verify that a forged token is not the guest
+        response = await self.client.get(
+            self.watchlist_url, GuestUserId=f"{guest_id}:forged"
+        )
+        self.assertEqual(response.json()["data"], [])
+
+        # Verify that guests who only read get no row
+        await self.client.get(self.watchlist_url, GuestUserId=GuestToken.create())
+        self.assertEqual(await GuestUser.objects.acount(), 1)
+
+        # Verify that bare ids handed out before signing still work
+        legacy_guest = await GuestUser.objects.acreate()
+        await WatchList.objects.acreate(guest=legacy_guest, listing=listing)
         response = await self.client.get(
-            self.categories_url, content_type=self.content_type
+            self.watchlist_url, GuestUserId=str(legacy_guest.id)
         )
+        self.assertEqual(len(response.json()["data"]), 1)
+
+    async def test_retrieve_all_categories(self):
+        # Verify that all categories are retrieved successfully
+        with TestUtil.query_budget(self, 1):
+            response = await self.client.get(
+                self.categories_url, content_type=self.content_type
+            )
         self.assertEqual(response.status_code, 200)
         result = response.json()
         self.assertEqual(result["status"], "success")
@@ -167,9 +572,10 @@ class TestListings(TestCase):
         )
 
         # Verify that all listings by a valid category slug are retrieved successfully
-        response = await self.client.get(
-            f"{self.categories_url}{slug}/", content_type=self.content_type
-        )
+        with TestUtil.query_budget(self, 3):
+            response = await self.client.get(
+                f"{self.categories_url}{slug}/", content_type=self.content_type
+            )
         self.assertEqual(response.status_code, 200)
         result = response.json()
         self.assertEqual(result["status"], "success")
@@ -275,6 +681,23 @@ class TestListings(TestCase):
             },
         )
 
+        # Verify that a bid colliding with others past the retries asks to retry
+        with mock.patch.object(Bid.objects, "create", side_effect=IntegrityError):
+            response = await self.client.post(
+                f"{self.listing_detail_url}{listing.slug}/bids/",
+                {"amount": 10000},
+                content_type=self.content_type,
+                **bearer,
+            )
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(
+            response.json(),
+            {
+                "status": "failure",
+                "message": "Too many bids at once, please retry!",
+            },
+        )
+
         # Verify that the bid was created successfully
         response = await self.client.post(
             f"{self.listing_detail_url}{listing.slug}/bids/",
@@ -296,3 +719,243 @@ class TestListings(TestCase):
         )
 
         # You can also test for other error responses.....
+
+    async def test_stream_listing_bids(self):
+        listing = self.listing
+        stream_url = f"{self.listing_detail_url}{listing.slug}/bids/stream/"
+
+        # Verify that the stream fails with an invalid slug
+        response = await self.client.get(
+            f"{self.listing_detail_url}invalid_slug/bids/stream/"
+        )
+        self.assertEqual(response.status_code, 404)
+
+        response = await self.client.get(stream_url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], "text/event-stream")
+        frames = response.streaming_content
+        self.assertTrue((await anext(frames)).startswith(b"retry:"))
+
+        # Verify that a burst of bids is pushed as a single frame
+        bidder = self.another_verified_user
+        access = Authentication.create_access_token({"user_id": str(bidder.id)})
+        refresh = Authentication.create_refresh_token()
+        await Jwt.objects.acreate(user_id=bidder.id, access=access, refresh=refresh)
+        for amount in (2000, 3000):
+            response = await self.client.post(
+                f"{self.listing_detail_url}{listing.slug}/bids/",
+                {"amount": amount},
+                content_type=self.content_type,
+                Authorization=f"Bearer {access}",
+            )
+            self.assertEqual(response.status_code, 201)
+
+        frame = (await anext(frames)).decode()
+        event, data = frame.strip().split("\n")
+        self.assertEqual(event, "event: bids")
+        bids = json.loads(data.removeprefix("data: "))
+        self.assertEqual([float(bid["amount"]) for bid in bids], [2000, 3000])
+        self.assertEqual(bids[0]["user"]["name"], bidder.full_name)
+        await frames.aclose()
+
+
+@skipUnless(connection.vendor == "postgresql", "SQLite locks the whole table on writes")
+class TestBidConcurrency(TransactionTestCase):
+    listing_detail_url = "/api/v5/listings/detail/"
+
+    def setUp(self):
+        self.listing = TestUtil.create_listing(TestUtil.verified_user())["listing"]
+
+    def test_create_bid_concurrently(self):
+        listing = self.listing
+        bidders = User.objects.bulk_create(
+            [
+                User(first_name="Bidder", last_name=str(i), email=f"b{i}@example.com")
+                for i in range(200)
+            ]
+        )
+        jwts = Jwt.objects.bulk_create(
+            [
+                Jwt(
+                    user_id=bidder.id,
+                    access=Authentication.create_access_token(
+                        {"user_id": str(bidder.id)}
+                    ),
+                    refresh=Authentication.create_refresh_token(),
+                )
+                for bidder in bidders
+            ]
+        )
+
+        def place_bid(jwt, amount):
+            try:
+                return Client().post(
+                    f"{self.listing_detail_url}{listing.slug}/bids/",
+                    {"amount": amount},
+                    content_type="application/json",
+                    HTTP_AUTHORIZATION=f"Bearer {jwt.access}",
+                )
+            finally:
+                connection.close()
+
+        # Fire every bid at the same listing at once, amounts in mixed order
+        amounts = [2000 + (i * 37) % 200 for i in range(200)]
+        with ThreadPoolExecutor(max_workers=50) as executor:
+            responses = list(executor.map(place_bid, jwts, amounts))
+
+        # Verify that each bid is either accepted or cleanly rejected as outbid
+        accepted = [resp for resp in responses if resp.status_code == 201]
+        rejected = [resp for resp in responses if resp.status_code == 400]
+        self.assertEqual(len(accepted) + len(rejected), len(responses))
+        self.assertTrue(
+            all(
+                resp.json()["message"]
+                == "Bid amount must be more than the highest bid!"
+                for resp in rejected
+            )
+        )
+
+        # Verify that no update was lost
+        listing.refresh_from_db()
+        self.assertEqual(listing.highest_bid, max(amounts))
+        self.assertEqual(listing.bids_count, len(accepted))
+        self.assertEqual(Bid.objects.filter(listing=listing).count(), len(accepted))
+
+
+@override_settings(RESPONSE_CACHE=True)
+class TestResponseCache(TestCase):
+    listing_detail_url = "/api/v5/listings/detail/"
+    categories_url = "/api/v5/listings/categories/"
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.listing = TestUtil.create_listing(TestUtil.verified_user())["listing"]
+
+    def test_cached_responses_are_invalidated_on_write(self):
+        listing = self.listing
+        detail_url = f"{self.listing_detail_url}{listing.slug}/"
+
+        # Verify that a repeated read is served from the cache
+        self.client.get(detail_url)
+        with self.assertNumQueries(0):
+            response = self.client.get(detail_url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["data"]["listing"]["name"], listing.name)
+        self.assertGreater(ResponseCache.stats()["hits"], 0)
+
+        # Verify that a write bumps the version so the next read is fresh
+        with self.captureOnCommitCallbacks(execute=True):
+            listing.desc = "Updated description"
+            listing.save()
+        response = self.client.get(detail_url)
+        self.assertEqual(
+            response.json()["data"]["listing"]["desc"], "Updated description"
+        )
+
+        # Verify that the time left is computed when a cached detail is served
+        hits = ResponseCache.stats()["hits"]
+        closed_at = listing.closing_date + timedelta(seconds=10)
+        with mock.patch("django.utils.timezone.now", return_value=closed_at):
+            response = self.client.get(detail_url)
+        self.assertEqual(ResponseCache.stats()["hits"], hits + 1)
+        data = response.json()["data"]["listing"]
+        self.assertEqual(data["time_left_seconds"], -10)
+        self.assertFalse(data["active"])
+
+        # Verify that category writes invalidate cached categories
+        self.assertEqual(len(self.client.get(self.categories_url).json()["data"]), 1)
+        with self.captureOnCommitCallbacks(execute=True):
+            Category.objects.create(name="AnotherCategory")
+        self.assertEqual(len(self.client.get(self.categories_url).json()["data"]), 2)
+
+
+class TestAuctionScheduler(TestCase):
+    # Outside PostgreSQL the leader lock lives in the cache, which must be shared
+    @override_settings(
+        CACHES={
+            "default": {
+                "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+                "LOCATION": os.path.join(tempfile.gettempdir(), "bidout_test_cache"),
+            }
+        }
+    )
+    def test_close_expired_listings(self):
+        # The file cache outlives test runs, drop a lock left by a previous one
+        cache.clear()
+        listing = TestUtil.create_listing(TestUtil.verified_user())["listing"]
+        expired = Listing.objects.bulk_create(
+            [
+                Listing(
+                    auctioneer_id=listing.auctioneer_id,
+                    name=f"Expired Listing {i}",
+                    slug=f"expired-listing-{i}",
+                    desc="Expired description",
+                    price=1000.00,
+                    closing_date=timezone.now() - timedelta(minutes=i + 1),
+                )
+                for i in range(5)
+            ]
+        )
+        closed_ids = []
+        listing_closed.connect(
+            lambda sender, listing_ids, **kwargs: closed_ids.extend(listing_ids),
+            weak=False,
+            dispatch_uid="test_close_expired_listings",
+        )
+        self.addCleanup(
+            listing_closed.disconnect, dispatch_uid="test_close_expired_listings"
+        )
+
+        # Verify that due auctions are closed in batches and announced
+        call_command("close_auctions", once=True, batch_size=2)
+        self.assertEqual(sorted(closed_ids), sorted(obj.id for obj in expired))
+        self.assertEqual(Listing.objects.filter(active=False).count(), 5)
+
+        # Verify that running auctions are left open
+        listing.refresh_from_db()
+        self.assertTrue(listing.active)
+
+        # Verify that a database error is logged rather than ending the scheduler
+        cache.clear()
+        with mock.patch.object(
+            Listing.objects, "close_expired", side_effect=OperationalError("failover")
+        ), self.assertLogs(
+            "apps.listings.management.commands.close_auctions", "ERROR"
+        ) as logs:
+            call_command("close_auctions", once=True)
+        self.assertIn("Closing auctions failed", logs.output[0])
+
+
+@skipUnless(connection.vendor == "postgresql", "Advisory and skipped locks")
+class TestAuctionSchedulerLocks(TransactionTestCase):
+    def in_other_session(self, func, *args):
+        def run():
+            try:
+                return func(*args)
+            finally:
+                connection.close()
+
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            return executor.submit(run).result()
+
+    def test_one_leader_closes_each_listing_once(self):
+        listing = TestUtil.create_listing(TestUtil.verified_user())["listing"]
+        Listing.objects.filter(id=listing.id).update(
+            closing_date=timezone.now() - timedelta(minutes=1)
+        )
+        self.addCleanup(
+            lambda: connection.cursor().execute("SELECT pg_advisory_unlock_all()")
+        )
+
+        # Verify that one scheduler session leads until it ends
+        self.assertTrue(acquire_leadership("leader", 30))
+        self.assertTrue(acquire_leadership("leader", 30))
+        self.assertFalse(self.in_other_session(acquire_leadership, "follower", 30))
+
+        # Verify that listings locked by another runner are left to it
+        with transaction.atomic():
+            Listing.objects.select_for_update().get(id=listing.id)
+            self.assertEqual(self.in_other_session(Listing.objects.close_expired), [])
+        self.assertEqual(Listing.objects.close_expired(), [listing.id])
+        self.assertEqual(Listing.objects.close_expired(), [])
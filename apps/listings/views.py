@@ -1,57 +1,176 @@
-from django.db.models import Prefetch, Q
+from django.db import router
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from ninja import Query
 from ninja.router import Router
 from ninja.responses import Response
 
 from apps.common.exceptions import RequestError
 from apps.common.models import GuestUser
+from apps.common.paginators import CursorPaginator, OffsetPaginator
+from apps.common.pubsub import broker, event_stream
+from apps.common.schemas import ResponseSchema
+from apps.common.cache import cached_response
+from apps.common.db.routers import ReadYourWrites, use_replica
+from apps.common.renderers import StreamFormat, streaming_response, trusted_response
 from apps.common.utils import (
     GuestClient,
+    GuestToken,
     AuthUser,
 )
 from .schemas import (
     BidResponseSchema,
+    BidDataSchema,
     BidsResponseSchema,
     CategoriesResponseSchema,
     CreateBidSchema,
+    ListingDataSchema,
+    ListingFilterSchema,
+    ListingSort,
     ListingsResponseSchema,
     ListingResponseSchema,
-    ListingDetailDataSchema,
     AddOrRemoveWatchlistResponseSchema,
     AddOrRemoveWatchlistSchema,
 )
 from .models import Bid, Category, Listing, WatchList
+from .managers import BidContentionError
 from asgiref.sync import sync_to_async
+from datetime import datetime
 
 listings_router = Router(tags=["Listings"])
 
+# Listings read per round trip of the stream's server-side cursor
+STREAM_CHUNK_SIZE = 1000
+
+
+def bids_channel(listing_id):
+    return f"listing:{listing_id}:bids"
+
+
+def refresh_time_left(body: dict):
+    # Cached with the listing detail, these would otherwise freeze at caching time
+    now = timezone.now()
+    data = body["data"]
+    for listing in [data["listing"], *data["related_listings"]]:
+        closing_date = datetime.fromisoformat(listing["closing_date"])
+        listing["time_left_seconds"] = int((closing_date - now).total_seconds())
+        listing["active"] = listing["active"] and listing["time_left_seconds"] > 0
+
+
+def listing_ordering(sort: ListingSort):
+    # id breaks ties in the sort's direction so both columns scan one index
+    return (sort.value, "-id" if sort.value.startswith("-") else "id")
+
 
 @listings_router.get(
     "",
     summary="Retrieve all listings",
-    description="This endpoint retrieves all listings",
+    description="This endpoint retrieves listings page by page, optionally filtered and sorted. Pass the returned next_cursor as 'cursor' to fetch the next page. Set facets to also get counts per category and price range",
     response=ListingsResponseSchema,
     auth=[AuthUser(), GuestClient()],
 )
-async def retrieve_listings(request, quantity: int = None):
+@use_replica
+async def retrieve_listings(
+    request,
+    quantity: int = None,
+    cursor: str = None,
+    sort: ListingSort = ListingSort.NEWEST,
+    facets: bool = False,
+    filters: ListingFilterSchema = Query(...),
+):
     client = await request.auth
-    listings = await sync_to_async(list)(
+    listings = filters.filter(
         Listing.objects.select_related(
             "auctioneer", "auctioneer__avatar", "category", "image"
-        ).prefetch_related(
-            Prefetch(
-                "watchlists",
-                queryset=WatchList.objects.filter(
-                    Q(user_id=client.id if client else None)
-                    | Q(guest_id=client.id if client else None)
-                ),
-                to_attr="watchlist",
-            )
+        ).with_watchlist(client)
+    )
+    # Retrieve a page based on amount, starting after the cursor
+    page = await CursorPaginator.paginate(
+        listings, cursor=cursor, quantity=quantity, ordering=listing_ordering(sort)
+    )
+    facet_counts = None
+    if facets:
+        facet_counts = await sync_to_async(
+            filters.filter(Listing.objects.all()).facet_counts
+        )()
+    return trusted_response(
+        ListingsResponseSchema,
+        {
+            "message": "Listings fetched",
+            "data": page["items"],
+            "next_cursor": page["next_cursor"],
+            "has_more": page["has_more"],
+            "facets": facet_counts,
+        },
+    )
+
+
+@listings_router.get(
+    "/stream/",
+    summary="Stream all listings",
+    description="This endpoint streams every listing, optionally filtered and sorted, for exports and syncs. Listings are read with a server-side cursor and sent as they are read. Format 'ndjson' sends one listing per line, 'json' the same document as retrieving listings, with every listing in data",
+    auth=[AuthUser(), GuestClient()],
+)
+@use_replica
+async def stream_listings(
+    request,
+    sort: ListingSort = ListingSort.NEWEST,
+    format: StreamFormat = StreamFormat.NDJSON,
+    filters: ListingFilterSchema = Query(...),
+):
+    client = await request.auth
+    listings = filters.filter(
+        Listing.objects.select_related(
+            "auctioneer", "auctioneer__avatar", "category", "image"
+        ).with_watchlist(client)
+    ).order_by(*listing_ordering(sort))
+    # The stream is read after the view returns, out of use_replica's reach,
+    # so the database is picked now. The replica health check connects, which
+    # can't be done from the event loop.
+    listings = listings.using(await sync_to_async(router.db_for_read)(Listing))
+    return streaming_response(
+        ListingDataSchema,
+        listings.aiterator(chunk_size=STREAM_CHUNK_SIZE),
+        ResponseSchema.trusted_dict({"message": "Listings fetched"}),
+        format=format,
+        batch_size=STREAM_CHUNK_SIZE,
+    )
+
+
+@listings_router.get(
+    "/search/",
+    summary="Search listings",
+    description="This endpoint searches listings by name and description, best matches first. Pass the returned next_cursor as 'cursor' to fetch the next page",
+    response=ListingsResponseSchema,
+    auth=[AuthUser(), GuestClient()],
+)
+@use_replica
+async def search_listings(request, q: str, quantity: int = None, cursor: str = None):
+    client = await request.auth
+    q = q.strip()
+    if not q:
+        raise RequestError(
+            err_msg="Invalid entry",
+            data={"q": "Enter a search term"},
+            status_code=422,
         )
+
+    listings = (
+        Listing.objects.search(q)
+        .select_related("auctioneer", "auctioneer__avatar", "category", "image")
+        .with_watchlist(client)
+    )
+    # Rank order can't be followed by a keyset, so pages are offset based
+    page = await OffsetPaginator.paginate(listings, cursor=cursor, quantity=quantity)
+    return trusted_response(
+        ListingsResponseSchema,
+        {
+            "message": "Listings fetched",
+            "data": page["items"],
+            "next_cursor": page["next_cursor"],
+            "has_more": page["has_more"],
+        },
     )
-    if quantity:
-        # Retrieve based on amount
-        listings = listings[:quantity]
-    return {"message": "Listings fetched", "data": listings}
 
 
 @listings_router.get(
@@ -60,6 +179,7 @@ async def retrieve_listings(request, quantity: int = None):
     description="This endpoint retrieves detail of a listing",
     response=ListingResponseSchema,
 )
+@cached_response("listings", refresh=refresh_time_left)
 async def retrieve_listing_detail(request, slug: str):
     listing = await Listing.objects.select_related(
         "auctioneer", "auctioneer__avatar", "category", "image"
@@ -67,16 +187,16 @@ async def retrieve_listing_detail(request, slug: str):
     if not listing:
         raise RequestError(err_msg="Listing does not exist!", status_code=404)
 
-    related_listings = (
-        await sync_to_async(list)(
-            Listing.objects.filter(category_id=listing.category_id)
-            .exclude(id=listing.id)
-            .select_related("auctioneer", "auctioneer__avatar", "category", "image")
-        )
-    )[:3]
+    related_listings = await sync_to_async(list)(
+        Listing.objects.filter(category_id=listing.category_id)
+        .exclude(id=listing.id)
+        .select_related("auctioneer", "auctioneer__avatar", "category", "image")[:3]
+    )
 
-    data = ListingDetailDataSchema(listing=listing, related_listings=related_listings)
-    return {"message": "Listing details fetched", "data": data}
+    data = {"listing": listing, "related_listings": related_listings}
+    return trusted_response(
+        ListingResponseSchema, {"message": "Listing details fetched", "data": data}
+    )
 
 
 @listings_router.get(
@@ -86,33 +206,20 @@ async def retrieve_listing_detail(request, slug: str):
     auth=[AuthUser(), GuestClient()],
     response=ListingsResponseSchema,
 )
+@use_replica
 async def retrieve_watchlist(request):
     client = await request.auth
-    watchlists = []
+    listings = []
     if client:
-        watchlists = await sync_to_async(list)(
-            WatchList.objects.filter(
-                Q(user_id=client.id) | Q(guest_id=client.id)
-            ).select_related(
-                "user",
-                "guest",
-                "listing",
-                "listing__auctioneer",
-                "listing__auctioneer__avatar",
-                "listing__category",
-                "listing__image",
-            )
+        listings = await sync_to_async(list)(
+            Listing.objects.with_watchlist(client)
+            .filter(watchlist=True)
+            .select_related("auctioneer", "auctioneer__avatar", "category", "image")
         )
-    data = [
-        {
-            "auctioneer": watchlist.listing.auctioneer,
-            "watchlist": True,
-            "time_left_seconds": watchlist.listing.time_left_seconds,
-            **watchlist.listing.dict(),
-        }
-        for watchlist in watchlists
-    ]
-    return {"message": "Watchlist Listings fetched", "data": data}
+    return trusted_response(
+        ListingsResponseSchema,
+        {"message": "Watchlist Listings fetched", "data": listings},
+    )
 
 
 @listings_router.post(
@@ -120,7 +227,7 @@ async def retrieve_watchlist(request):
     summary="Add or Remove listing from a users watchlist",
     description="""
     This endpoint adds or removes a listing from a user's watchlist, authenticated or not....
-    As a guest, ensure to store guestuser_id in localstorage and keep passing it to header 'guestuserid' in subsequent requests
+    As a guest, ensure to store guestuser_id (a signed token) in localstorage and keep passing it to header 'guestuserid' in subsequent requests
     """,
     response={201: AddOrRemoveWatchlistResponseSchema},
     auth=[AuthUser(), GuestClient()],
@@ -133,13 +240,15 @@ async def add_or_remove_watchlist_listings(request, data: AddOrRemoveWatchlistSc
         raise RequestError(err_msg="Listing does not exist!", status_code=404)
 
     if not client:
-        client = await GuestUser.objects.acreate()
+        # A new guest, whose row is written below
+        client = GuestUser()
 
     resp_message = "Listing added to user watchlist"
     status_code = 201
-    if hasattr(client, "email"):
+    if isinstance(client, GuestUser):
+        await GuestUser.objects.atouch(client.id)
         watchlist, created = await WatchList.objects.aget_or_create(
-            listing_id=listing.id, user_id=client.id
+            listing_id=listing.id, guest_id=client.id
         )
         if not created:
             await watchlist.adelete()
@@ -147,14 +256,17 @@ async def add_or_remove_watchlist_listings(request, data: AddOrRemoveWatchlistSc
             status_code = 200
     else:
         watchlist, created = await WatchList.objects.aget_or_create(
-            listing_id=listing.id, guest_id=client.id
+            listing_id=listing.id, user_id=client.id
         )
         if not created:
             await watchlist.adelete()
             resp_message = "Listing removed from user watchlist"
             status_code = 200
 
-    guestuser_id = client.id if isinstance(client, GuestUser) else None
+    await ReadYourWrites.pin(request)
+    guestuser_id = (
+        GuestToken.create(client.id) if isinstance(client, GuestUser) else None
+    )
     return Response(
         {
             "status": "success",
@@ -171,19 +283,29 @@ async def add_or_remove_watchlist_listings(request, data: AddOrRemoveWatchlistSc
     description="This endpoint retrieves all categories",
     response=CategoriesResponseSchema,
 )
+@cached_response("categories")
 async def retrieve_categories(request):
     categories = await sync_to_async(list)(Category.objects.all())
-    return {"message": "Categories fetched", "data": categories}
+    return trusted_response(
+        CategoriesResponseSchema, {"message": "Categories fetched", "data": categories}
+    )
 
 
 @listings_router.get(
     "/categories/{slug}/",
     summary="Retrieve all listings by category",
-    description="This endpoint retrieves all listings in a particular category. Use slug 'other' for category other",
+    description="This endpoint retrieves all listings in a particular category, optionally filtered and sorted. Use slug 'other' for category other",
     auth=[AuthUser(), GuestClient()],
     response=ListingsResponseSchema,
 )
-async def retrieve_category_listings(request, slug: str):
+@use_replica
+async def retrieve_category_listings(
+    request,
+    slug: str,
+    sort: ListingSort = ListingSort.NEWEST,
+    facets: bool = False,
+    filters: ListingFilterSchema = Query(...),
+):
     client = await request.auth
 
     # listings with category 'other' have category column as null
@@ -193,21 +315,25 @@ async def retrieve_category_listings(request, slug: str):
         if not category:
             raise RequestError(err_msg="Invalid category", status_code=404)
 
+    category_listings = filters.filter(Listing.objects.filter(category=category))
     listings = await sync_to_async(list)(
-        Listing.objects.filter(category=category)
-        .select_related("auctioneer", "auctioneer__avatar", "category", "image")
-        .prefetch_related(
-            Prefetch(
-                "watchlists",
-                queryset=WatchList.objects.filter(
-                    Q(user_id=client.id if client else None)
-                    | Q(guest_id=client.id if client else None)
-                ),
-                to_attr="watchlist",
-            )
+        category_listings.select_related(
+            "auctioneer", "auctioneer__avatar", "category", "image"
         )
+        .with_watchlist(client)
+        .order_by(*listing_ordering(sort))
+    )
+    facet_counts = None
+    if facets:
+        facet_counts = await sync_to_async(category_listings.facet_counts)()
+    return trusted_response(
+        ListingsResponseSchema,
+        {
+            "message": "Category Listings fetched",
+            "data": listings,
+            "facets": facet_counts,
+        },
     )
-    return {"message": "Category Listings fetched", "data": listings}
 
 
 @listings_router.get(
@@ -216,28 +342,48 @@ async def retrieve_category_listings(request, slug: str):
     description="This endpoint retrieves at most 3 bids from a particular listing.",
     response=BidsResponseSchema,
 )
+@cached_response("listings")
 async def retrieve_listing_bids(request, slug: str):
-    listing = (
-        await Listing.objects.select_related(
-            "auctioneer", "auctioneer__avatar", "category", "image"
-        )
-        .prefetch_related(
-            Prefetch(
-                "bids",
-                queryset=Bid.objects.select_related("user", "user__avatar"),
-                to_attr="all_bids",
-            )
-        )
-        .get_or_none(slug=slug)
+    listing = await Listing.objects.only("id", "name").get_or_none(slug=slug)
+    if not listing:
+        raise RequestError(err_msg="Listing does not exist!", status_code=404)
+
+    bids = await sync_to_async(list)(
+        Bid.objects.filter(listing_id=listing.id).select_related(
+            "user", "user__avatar"
+        )[:3]
     )
+    return trusted_response(
+        BidsResponseSchema,
+        {
+            "message": "Listing Bids fetched",
+            "data": {"listing": listing.name, "bids": bids},
+        },
+    )
+
+
+@listings_router.get(
+    "/detail/{slug}/bids/stream/",
+    summary="Stream new bids of a listing",
+    description="""
+    This endpoint is a Server-Sent Events stream of bids placed on a particular listing, for use with EventSource.
+    Each 'bids' event holds a list of the bids placed since the previous event.
+    The stream ends after a few minutes and EventSource reconnects by itself.
+    """,
+)
+async def stream_listing_bids(request, slug: str):
+    listing = await Listing.objects.only("id").get_or_none(slug=slug)
     if not listing:
         raise RequestError(err_msg="Listing does not exist!", status_code=404)
 
-    bids = listing.all_bids[:3]
-    return {
-        "message": "Listing Bids fetched",
-        "data": {"listing": listing.name, "bids": bids},
-    }
+    response = StreamingHttpResponse(
+        event_stream(bids_channel(listing.id), "bids"),
+        content_type="text/event-stream",
+    )
+    response["Cache-Control"] = "no-cache"
+    # Stops nginx from buffering the stream
+    response["X-Accel-Buffering"] = "no"
+    return response
 
 
 @listings_router.post(
@@ -250,19 +396,12 @@ async def retrieve_listing_bids(request, slug: str):
 async def create_bid(request, slug: str, data: CreateBidSchema):
     user = await request.auth
 
-    listing = (
-        await Listing.objects.select_related(
-            "auctioneer", "auctioneer__avatar", "category", "image"
-        )
-        .prefetch_related("bids")
-        .get_or_none(slug=slug)
-    )
+    listing = await Listing.objects.get_or_none(slug=slug)
     if not listing:
         raise RequestError(err_msg="Listing does not exist!", status_code=404)
 
     amount = data.amount
 
-    bids_count = listing.bids_count
     if user.id == listing.auctioneer_id:
         raise RequestError(err_msg="You cannot bid your own product!", status_code=403)
     elif not listing.active:
@@ -276,18 +415,16 @@ async def create_bid(request, slug: str, data: CreateBidSchema):
     elif amount <= listing.highest_bid:
         raise RequestError(err_msg="Bid amount must be more than the highest bid!")
 
-    bid = await Bid.objects.select_related("user", "user__avatar").get_or_none(
-        user_id=user.id, listing_id=listing.id
-    )
-    if bid:
-        # Update existing bid
-        bid.amount = amount
-        await bid.asave()
-    else:
-        # Create new bid
-        bids_count += 1
-        bid = await Bid.objects.acreate(user=user, listing=listing, amount=amount)
-    listing.bids_count = bids_count
-    listing.highest_bid = amount
-    await listing.asave()
+    # The highest bid may have moved since the listing was read, so the final
+    # check happens atomically in the database
+    try:
+        bid = await Bid.objects.aplace_bid(user, listing, amount)
+    except BidContentionError:
+        raise RequestError(
+            err_msg="Too many bids at once, please retry!", status_code=409
+        )
+    if not bid:
+        raise RequestError(err_msg="Bid amount must be more than the highest bid!")
+    await ReadYourWrites.pin(request)
+    await broker.publish(bids_channel(listing.id), BidDataSchema.trusted_dict(bid))
     return {"message": "Bid added to listing", "data": bid}
@@ -69,16 +69,34 @@ CORS_ALLOW_METHODS = ("GET", "POST", "PUT", "PATCH", "DELETE", "OPTIONS")
 AUTH_USER_MODEL = "accounts.User"
 
 MIDDLEWARE = [
+    "apps.common.metrics.MetricsMiddleware",
+    "apps.common.middleware.QueryCountMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "whitenoise.middleware.WhiteNoiseMiddleware",
     "corsheaders.middleware.CorsMiddleware",
-    "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
+    "apps.common.middleware.PathDispatchMiddleware",
+]
+
+# Run by PathDispatchMiddleware for the admin and docs, not for paths under
+# MINIMAL_STACK_PREFIXES (the API authenticates with headers)
+FULL_STACK_MIDDLEWARE = [
+    "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
 ]
+MINIMAL_STACK_PREFIXES = ["/api/"]
+
+# These checks only look for the middleware in MIDDLEWARE
+SILENCED_SYSTEM_CHECKS = [
+    "admin.E408",
+    "admin.E409",
+    "admin.E410",
+    "security.W002",
+    "security.W003",
+]
 
 ROOT_URLCONF = "bidout_auction_v5.urls"
 
@@ -149,6 +167,36 @@ MEDIA_ROOT = os.path.join(BASE_DIR, "static/media")
 
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
+# Reads of views marked with use_replica go to DATABASE_REPLICAS (set with DATABASES)
+DATABASE_ROUTERS = ["apps.common.db.routers.ReplicaRouter"]
+# Seconds a client keeps reading from the primary after a write
+REPLICA_PIN_SECONDS = config("REPLICA_PIN_SECONDS", default=5, cast=int)
+
+# Cache Settings
+# Use a shared backend (e.g Redis) when running several workers so cache
+# versions bumped by one worker are seen by all of them
+CACHES = {
+    "default": {
+        "BACKEND": config(
+            "CACHE_BACKEND", default="django.core.cache.backends.locmem.LocMemCache"
+        ),
+        "LOCATION": config("CACHE_LOCATION", default="bidout-auction-v5"),
+    }
+}
+# Caches responses of public read endpoints, requires a shared CACHE_BACKEND
+RESPONSE_CACHE = config("RESPONSE_CACHE", default=False, cast=bool)
+
+# Pub/sub backend of live events (e.g bids streams). LocalBackend only reaches
+# subscribers of the same worker, use PostgresBackend with several workers
+PUBSUB_BACKEND = config("PUBSUB_BACKEND", default="apps.common.pubsub.LocalBackend")
+
+# When set, /metrics requires "Authorization: Bearer <METRICS_TOKEN>"
+METRICS_TOKEN = config("METRICS_TOKEN", default="")
+
+# When set, logins leave merging guest watchlists to the merge_watchlists worker,
+# so login time doesn't grow with the watchlist
+WATCHLIST_MERGE_DEFERRED = config("WATCHLIST_MERGE_DEFERRED", default=False, cast=bool)
+
 # Email Settings
 EMAIL_BACKEND = "django.core.mail.backends.smtp.EmailBackend"
 EMAIL_HOST = config("EMAIL_HOST")
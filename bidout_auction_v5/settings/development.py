@@ -3,11 +3,35 @@ from .base import *
 DEBUG = True
 DATABASES = {
     "default": {
-        "ENGINE": "django.db.backends.postgresql",
+        "ENGINE": "apps.common.db.pooled_postgresql",
         "NAME": config("POSTGRES_DB"),
         "USER": config("POSTGRES_USER"),
         "PASSWORD": config("POSTGRES_PASSWORD"),
         "HOST": config("POSTGRES_SERVER"),
         "PORT": config("POSTGRES_PORT"),
+        "CONN_HEALTH_CHECKS": True,
+        "OPTIONS": {
+            # Per worker process, keep workers * max_size under max_connections
+            "pool": (
+                {
+                    "min_size": config("DB_POOL_MIN_SIZE", default=1, cast=int),
+                    "max_size": config("DB_POOL_MAX_SIZE", default=4, cast=int),
+                    # Seconds a request waits for a free connection before failing
+                    "timeout": config("DB_POOL_TIMEOUT", default=10, cast=float),
+                }
+                if config("DB_POOL", default=True, cast=bool)
+                else None
+            ),
+        },
     }
 }
+
+# Read replicas, e.g POSTGRES_REPLICA_SERVERS="replica1 replica2". Pointing one
+# at the primary's host is enough to exercise the routing locally.
+for i, host in enumerate(config("POSTGRES_REPLICA_SERVERS", default="").split()):
+    DATABASES[f"replica_{i}"] = {
+        **DATABASES["default"],
+        "HOST": host,
+        "TEST": {"MIRROR": "default"},
+    }
+DATABASE_REPLICAS = [alias for alias in DATABASES if alias != "default"]
@@ -2,6 +2,7 @@ from django.contrib import admin
 from django.http import JsonResponse
 from django.urls import path
 from apps.api import api
+from apps.common.metrics import metrics_view
 
 
 def handler404(request, exception=None):
@@ -19,4 +20,8 @@ def handler500(request, exception=None):
 handler404 = handler404
 handler500 = handler500
 
-urlpatterns = [path("admin/", admin.site.urls), path("", api.urls)]
+urlpatterns = [
+    path("admin/", admin.site.urls),
+    path("metrics", metrics_view),
+    path("", api.urls),
+]
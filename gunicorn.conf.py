@@ -0,0 +1,58 @@
+"""
+Gunicorn settings of the production server (initials/start with SETTINGS=production).
+Gunicorn manages the worker processes, each worker runs uvicorn's event loop
+(uvloop and httptools when installed).
+"""
+
+# Not "from decouple import config": gunicorn reads "config" as a setting
+import decouple, os, tempfile
+
+bind = decouple.config("BIND", default="0.0.0.0:8000")
+workers = decouple.config("WEB_CONCURRENCY", default=os.cpu_count() or 1, cast=int)
+worker_class = "uvicorn.workers.UvicornWorker"
+
+# Seconds an idle keep-alive connection is held open
+keepalive = decouple.config("KEEPALIVE", default=5, cast=int)
+# Pending connections the kernel queues before refusing new ones
+backlog = decouple.config("BACKLOG", default=2048, cast=int)
+# Workers are recycled after this many requests (with jitter) to cap memory growth
+max_requests = decouple.config("MAX_REQUESTS", default=10000, cast=int)
+max_requests_jitter = decouple.config("MAX_REQUESTS_JITTER", default=1000, cast=int)
+
+# On SIGTERM workers stop accepting and finish in-flight requests,
+# the ones still busy after graceful_timeout are killed
+graceful_timeout = decouple.config("GRACEFUL_TIMEOUT", default=30, cast=int)
+timeout = decouple.config("WORKER_TIMEOUT", default=60, cast=int)
+
+# Django is set up once in the master and forked into every worker
+preload_app = True
+
+# Workers write their metrics here for /metrics to sum them up.
+# Set before the app is preloaded, as prometheus_client reads it on import.
+metrics_dir = os.environ.setdefault(
+    "PROMETHEUS_MULTIPROC_DIR", os.path.join(tempfile.gettempdir(), "bidout_metrics")
+)
+os.makedirs(metrics_dir, exist_ok=True)
+
+accesslog = "-"
+errorlog = "-"
+
+
+def post_fork(server, worker):
+    # Connections must never be shared across processes
+    from django.db import connections
+
+    connections.close_all()
+
+
+def on_starting(server):
+    # Counts of a previous run would otherwise be added to this one's
+    for name in os.listdir(metrics_dir):
+        os.remove(os.path.join(metrics_dir, name))
+
+
+def child_exit(server, worker):
+    # Gauges of a dead worker stop counting, its counters are kept
+    from prometheus_client import multiprocess
+
+    multiprocess.mark_process_dead(worker.pid)